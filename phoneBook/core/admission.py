@@ -0,0 +1,269 @@
+# core/admission.py
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+
+from core.metrics import registry
+from django.conf import settings
+
+# Per endpoint class: concurrent requests admitted, how long a request may
+# wait for a slot (QUEUE_TIMEOUT seconds), how many may wait (MAX_WAITING),
+# and an optional per-token token bucket (RATE per second, BURST tokens).
+# Views not listed in any class's VIEWS fall into DEFAULT_CLASS.
+DEFAULT_ADMISSION = {
+    'ENABLED': True,
+    'DEFAULT_CLASS': 'default',
+    'MAX_BUCKETS': 100000,
+    'CLASSES': {
+        'search': {  # trigram/phonetic/full-text name search
+            'VIEWS': ['SearchByNameView', 'AsyncSearchByNameView'],
+            'MAX_CONCURRENT': 8,
+            'QUEUE_TIMEOUT': 0.25,
+            'MAX_WAITING': 32,
+            'RATE': 10.0,
+            'BURST': 30,
+        },
+        'lookup': {  # indexed phone lookups
+            'VIEWS': ['SearchByPhoneView', 'AsyncSearchByPhoneView', 'BatchSearchByPhoneView'],
+            'MAX_CONCURRENT': 16,
+            'QUEUE_TIMEOUT': 0.25,
+            'MAX_WAITING': 64,
+            'RATE': 20.0,
+            'BURST': 60,
+        },
+        'write': {
+            'VIEWS': ['ContactSyncView', 'SpamMarkView'],
+            'MAX_CONCURRENT': 8,
+            'QUEUE_TIMEOUT': 1.0,
+            'MAX_WAITING': 32,
+            'RATE': 2.0,
+            'BURST': 10,
+        },
+        'default': {
+            'VIEWS': [],
+            'MAX_CONCURRENT': 32,
+            'QUEUE_TIMEOUT': 1.0,
+            'MAX_WAITING': 128,
+            'RATE': None,
+            'BURST': None,
+        },
+    },
+}
+
+RATE_LIMITED = 'rate_limited'
+QUEUE_FULL = 'queue_full'
+QUEUE_TIMEOUT = 'queue_timeout'
+SHED_REASONS = (RATE_LIMITED, QUEUE_FULL, QUEUE_TIMEOUT)
+
+
+def admission_config():
+    """DEFAULT_ADMISSION with settings.ADMISSION applied; CLASSES merge per class and per key."""
+    overrides = getattr(settings, 'ADMISSION', {})
+    classes = {name: dict(endpoint) for name, endpoint in DEFAULT_ADMISSION['CLASSES'].items()}
+    for name, endpoint in overrides.get('CLASSES', {}).items():
+        classes[name] = {**classes.get(name, {}), **endpoint}
+    return {**DEFAULT_ADMISSION, **overrides, 'CLASSES': classes}
+
+
+# -------------------- Concurrency Gate --------------------
+class _AsyncWaiter:
+    """Queue entry for a coroutine; release() may run on any thread."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self._grant)
+
+    def _grant(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Gate:
+    """At most `limit` requests inside; up to `max_waiting` more wait in FIFO order for `timeout` seconds.
+
+    A released slot is handed straight to the oldest waiter, so a waiter is
+    never overtaken by a request that arrives later. Sync (thread) and async
+    (coroutine) callers share one gate.
+    """
+
+    def __init__(self, limit, timeout, max_waiting):
+        self.limit = limit
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.admitted = 0
+        self.shed = {reason: 0 for reason in SHED_REASONS}
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def _enter_or_queue(self, make_waiter):
+        """True if admitted now, False if the queue is full, else the queued waiter."""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if len(self._waiters) >= self.max_waiting:
+                self.shed[QUEUE_FULL] += 1
+                return False
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter, reason=QUEUE_TIMEOUT):
+        """Leave the queue: False if still queued (now removed), True if a slot was handed over meanwhile."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return True
+            if reason:
+                self.shed[reason] += 1
+            return False
+
+    def record_shed(self, reason):
+        with self._lock:
+            self.shed[reason] += 1
+
+    def acquire(self):
+        """Returns None once admitted, or the shed reason."""
+        waiter = self._enter_or_queue(threading.Event)
+        if waiter is True:
+            return None
+        if waiter is False:
+            return QUEUE_FULL
+        if waiter.wait(self.timeout) or self._give_up(waiter):
+            return None
+        return QUEUE_TIMEOUT
+
+    async def aacquire(self):
+        waiter = self._enter_or_queue(_AsyncWaiter)
+        if waiter is True:
+            return None
+        if waiter is False:
+            return QUEUE_FULL
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+            return None
+        except asyncio.TimeoutError:
+            return None if self._give_up(waiter) else QUEUE_TIMEOUT
+        except asyncio.CancelledError:
+            # The client went away while queued; a slot handed over meanwhile must not leak.
+            if self._give_up(waiter, reason=None):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot passes to the waiter; `active` is unchanged.
+                self.admitted += 1
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+
+
+# -------------------- Rate Limits --------------------
+class TokenBuckets:
+    """Token bucket per key: `burst` tokens, refilled at `rate` per second.
+
+    Only the most recently used `max_keys` buckets are kept; an evicted key
+    starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend one token for `key`. Returns 0.0, or the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# -------------------- Endpoint Classes --------------------
+class EndpointClass:
+    def __init__(self, name, config, max_buckets):
+        self.name = name
+        self.gate = Gate(config['MAX_CONCURRENT'], config['QUEUE_TIMEOUT'], config['MAX_WAITING'])
+        self.buckets = TokenBuckets(config['RATE'], config['BURST'], max_buckets) if config['RATE'] else None
+
+    def rate_limit(self, token):
+        """0.0 if `token` may proceed, else seconds until it may retry. Requests without a token are not limited."""
+        if self.buckets is None or not token:
+            return 0.0
+        wait = self.buckets.take(token)
+        if wait:
+            self.gate.record_shed(RATE_LIMITED)
+        return wait
+
+
+class AdmissionController:
+    def __init__(self, classes, default_class, max_buckets):
+        self.classes = {name: EndpointClass(name, config, max_buckets) for name, config in classes.items()}
+        self._by_view = {view: self.classes[name] for name, config in classes.items() for view in config['VIEWS']}
+        self._default = self.classes[default_class]
+
+    def for_view(self, view_name):
+        return self._by_view.get(view_name, self._default)
+
+
+_controller = None
+
+
+def get_admission_controller():
+    global _controller
+    if _controller is None:
+        config = admission_config()
+        _controller = AdmissionController(config['CLASSES'], config['DEFAULT_CLASS'], config['MAX_BUCKETS'])
+    return _controller
+
+
+def reset_admission_controller():
+    global _controller
+    _controller = None
+
+
+def collect_metrics():
+    controller = _controller
+    if controller is None:
+        return
+    classes = sorted(controller.classes.values(), key=lambda endpoint: endpoint.name)
+    yield ('phonebook_admission_shed_total', 'counter', "Requests refused by admission control by reason.",
+           [({'class': endpoint.name, 'reason': reason}, endpoint.gate.shed[reason])
+            for endpoint in classes for reason in SHED_REASONS])
+    yield ('phonebook_admission_admitted_total', 'counter', "Requests admitted by endpoint class.",
+           [({'class': endpoint.name}, endpoint.gate.admitted) for endpoint in classes])
+    yield ('phonebook_admission_in_flight', 'gauge', "Requests holding a slot by endpoint class.",
+           [({'class': endpoint.name}, endpoint.gate.active) for endpoint in classes])
+    yield ('phonebook_admission_waiting', 'gauge', "Requests queued for a slot by endpoint class.",
+           [({'class': endpoint.name}, endpoint.gate.waiting) for endpoint in classes])
+
+
+registry.register_collector(collect_metrics)
@@ -0,0 +1,128 @@
+# core/async_views.py
+
+from asgiref.sync import sync_to_async
+from core.authentication import aresolve_token
+from core.conditional import UNCHANGED, not_modified, read_versions, with_validators
+from core.search import FUZZY, MATCH_MODES, InvalidCursor, search_names
+from core.renderers import encode_results
+from core.replicas import achoose_replica, reads_from
+from core.validators import Validator
+from core.views import (
+    directory_entries,
+    directory_results,
+    get_bearer_token,
+    name_search_page_size,
+    name_search_result,
+    name_search_validators,
+    next_page_link,
+    phone_search_validators,
+    profile_etag
+)
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework import status
+
+# Same body bytes as DRF's JSONRenderer, so clients cannot tell the two paths apart.
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params=JSON_PARAMS)
+
+
+def results_response(rows):
+    return HttpResponse(encode_results(rows), content_type='application/json')
+
+
+def unauthorized():
+    return json_response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+async def aget_authenticated_user(request):
+    token_value = get_bearer_token(request)
+    if not token_value:
+        return None
+    return await aresolve_token(token_value)
+
+
+class AsyncProfileView(View):
+    async def get(self, request):
+        user = await aget_authenticated_user(request)
+        if not user:
+            return unauthorized()
+
+        etag = profile_etag(user)
+        response = not_modified(request, etag)
+        if response is None:
+            response = json_response({
+                "name": user.name,
+                "phone_number": user.phone_number,
+                "email": user.email
+            })
+        return with_validators(response, etag)
+
+
+class AsyncSearchByNameView(View):
+    async def get(self, request):
+        user = await aget_authenticated_user(request)
+        if not user:
+            return unauthorized()
+
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return json_response({"error": "Missing search query"}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_size = name_search_page_size(request.GET)
+        if page_size is None:
+            return json_response({"error": "page_size must be a positive integer"},
+                                 status=status.HTTP_400_BAD_REQUEST)
+
+        mode = request.GET.get('mode', FUZZY)
+        if mode not in MATCH_MODES:
+            return json_response({"error": f"mode must be one of: {', '.join(MATCH_MODES)}"},
+                                 status=status.HTTP_400_BAD_REQUEST)
+
+        with reads_from(await achoose_replica(user)):
+            versions = await sync_to_async(read_versions)([user.phone_number], latest=True)
+            etag, last_modified = name_search_validators(user, request.GET, versions)
+            response = not_modified(request, etag)
+            if response is not None:
+                return with_validators(response, etag, last_modified)
+
+            try:
+                rows, cursor = await sync_to_async(search_names)(
+                    user, query, page_size, request.GET.get('cursor'), mode,
+                    versions.get(user.phone_number, UNCHANGED)[0]
+                )
+            except InvalidCursor as exc:
+                return json_response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = results_response([name_search_result(row) for row in rows])
+        if cursor:
+            response['Link'] = next_page_link(request, cursor)
+        return with_validators(response, etag, last_modified)
+
+
+class AsyncSearchByPhoneView(View):
+    async def get(self, request):
+        user = await aget_authenticated_user(request)
+        if not user:
+            return unauthorized()
+
+        phone = request.GET.get('q', '').strip()
+        if not phone:
+            return json_response({"error": "Missing phone number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        phone = Validator.normalize_phone(phone)
+        if not Validator.validate_phone(phone):
+            return json_response({"error": "Invalid phone number format. Use +91XXXXXXXXXX."},
+                                 status=status.HTTP_400_BAD_REQUEST)
+
+        with reads_from(await achoose_replica(user)):
+            versions = await sync_to_async(read_versions)([phone, user.phone_number])
+            etag, last_modified = phone_search_validators(user, phone, versions)
+            response = not_modified(request, etag)
+            if response is None:
+                entry = await directory_entries(user, [phone]).afirst()
+                response = results_response(directory_results(entry, entry is not None and entry[-1]))
+        return with_validators(response, etag, last_modified)
@@ -0,0 +1,523 @@
+# core/authentication.py
+
+import logging
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from core.background import Refresher
+from core.metrics import registry
+from core.models import AuthToken, RevokedToken, User
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+logger = logging.getLogger(__name__)
+
+# AUTH['MODE']: opaque AuthToken rows looked up per request, or signed
+# (JWT) tokens verified in-process.
+TOKEN = 'token'
+SIGNED = 'jwt'
+AUTH_MODES = (TOKEN, SIGNED)
+
+DEFAULT_AUTH = {
+    'MODE': TOKEN,
+    'DENY_LIST_REFRESH': 30,
+}
+
+DEFAULT_TOKEN_CACHE = {
+    'BACKEND': 'local',
+    'MAX_ENTRIES': 10000,
+    'TTL': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+DEFAULT_AUTH_TOKENS = {
+    'LIFETIME': 7 * 24 * 3600,
+    'REUSE': True,
+    'REUSE_MIN_REMAINING': 24 * 3600,
+    'PURGE_BATCH_SIZE': 5000,
+}
+
+# One short transaction per batch; SKIP LOCKED steps over rows a concurrent
+# logout is deleting instead of waiting on them.
+PURGE_TOKENS_SQL = """
+    DELETE FROM {table} WHERE {key} IN (
+        SELECT {key} FROM {table}
+        WHERE expires_at <= %s
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# Tables purge_tokens keeps small, with their primary key column.
+PURGE_TABLES = {
+    'core_authtoken': 'token',
+    'core_revokedtoken': 'jti',
+}
+
+# Profile fields carried in signed access tokens, so a request never has to load the user.
+USER_CLAIMS = ('name', 'phone_number', 'email')
+
+
+# -------------------- Token Caches --------------------
+class TokenCache(ABC):
+    """Maps a token value to its user until the token expires or is invalidated."""
+
+    def __init__(self, ttl):
+        self.ttl = timedelta(seconds=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def deadline(self, expires_at):
+        return min(expires_at, timezone.now() + self.ttl)
+
+    @abstractmethod
+    def get(self, token):
+        pass
+
+    @abstractmethod
+    def set(self, token, user, expires_at):
+        pass
+
+    # In-process caches answer without I/O, so the async variants call straight through.
+    async def aget(self, token):
+        return self.get(token)
+
+    async def aset(self, token, user, expires_at):
+        self.set(token, user, expires_at)
+
+    @abstractmethod
+    def invalidate(self, token):
+        pass
+
+    @abstractmethod
+    def invalidate_user(self, user_id):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class NullTokenCache(TokenCache):
+    def get(self, token):
+        self.misses += 1
+        return None
+
+    def set(self, token, user, expires_at):
+        pass
+
+    def invalidate(self, token):
+        pass
+
+    def invalidate_user(self, user_id):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LocalTokenCache(TokenCache):
+    """In-process LRU; each entry lives until min(expires_at, now + TTL).
+
+    Invalidation only reaches this process, so other workers keep serving a
+    logged-out token for up to TTL seconds; keep TTL short.
+    """
+
+    def __init__(self, ttl, max_entries):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        now = timezone.now()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token, user, expires_at):
+        with self._lock:
+            self._entries[token] = (user, self.deadline(expires_at))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in [t for t, (user, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {**super().stats(), "size": len(self._entries)}
+
+
+class SharedTokenCache(TokenCache):
+    """Token cache stored in a Django cache backend shared by all workers.
+
+    Each entry records its user's generation, a random value replaced by
+    invalidate_user; entries from an older generation read as misses. The
+    generation is written with one set, never read-modify-written, so racing
+    logins cannot drop each other's tokens from an invalidation.
+    """
+
+    KEY_PREFIX = 'authtoken'
+
+    def __init__(self, ttl, cache_alias):
+        super().__init__(ttl)
+        self.cache = caches[cache_alias]
+
+    def _key(self, token):
+        return f"{self.KEY_PREFIX}:{token}"
+
+    def _generation_key(self, user_id):
+        return f"{self.KEY_PREFIX}:generation:{user_id}"
+
+    def get(self, token):
+        entry = self.cache.get(self._key(token))
+        # A missing generation (evicted, or never set) fails closed.
+        if entry is None or entry[1] != self.cache.get(self._generation_key(entry[0].pk)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, token, user, expires_at):
+        timeout = (self.deadline(expires_at) - timezone.now()).total_seconds()
+        if timeout <= 0:
+            return
+        key = self._generation_key(user.pk)
+        self.cache.add(key, uuid.uuid4().hex, None)
+        generation = self.cache.get(key)
+        if generation is not None:
+            self.cache.set(self._key(token), (user, generation), timeout)
+
+    async def aget(self, token):
+        return await sync_to_async(self.get)(token)
+
+    async def aset(self, token, user, expires_at):
+        await sync_to_async(self.set)(token, user, expires_at)
+
+    def invalidate(self, token):
+        self.cache.delete(self._key(token))
+
+    def invalidate_user(self, user_id):
+        self.cache.set(self._generation_key(user_id), uuid.uuid4().hex, None)
+
+    def clear(self):
+        # Entries are namespaced but the backend may be shared with other data,
+        # so only the per-process counters are reset here.
+        self.hits = 0
+        self.misses = 0
+
+
+_token_cache = None
+
+
+def build_token_cache():
+    config = {**DEFAULT_TOKEN_CACHE, **getattr(settings, 'AUTH_TOKEN_CACHE', {})}
+    backend = config['BACKEND']
+    if backend == 'local':
+        return LocalTokenCache(config['TTL'], config['MAX_ENTRIES'])
+    if backend == 'shared':
+        return SharedTokenCache(config['TTL'], config['CACHE_ALIAS'])
+    if backend is None:
+        return NullTokenCache(config['TTL'])
+    raise ValueError(f"Unknown AUTH_TOKEN_CACHE backend: {backend!r}")
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = build_token_cache()
+    return _token_cache
+
+
+def reset_token_cache():
+    global _token_cache
+    _token_cache = None
+
+
+def collect_metrics():
+    stats = get_token_cache().stats()
+    yield ('phonebook_token_cache_hits_total', 'counter', "Token lookups answered from the token cache.",
+           [({}, stats['hits'])])
+    yield ('phonebook_token_cache_misses_total', 'counter', "Token lookups that fell through to the database.",
+           [({}, stats['misses'])])
+
+
+registry.register_collector(collect_metrics)
+
+
+# -------------------- Token Resolution --------------------
+def _normalize_token(token_value):
+    try:
+        return str(uuid.UUID(token_value))
+    except ValueError:
+        return None
+
+
+def resolve_token(token_value):
+    if auth_mode() == SIGNED:
+        return resolve_signed_token(token_value)
+
+    token_value = _normalize_token(token_value)
+    if token_value is None:
+        return None
+
+    cache = get_token_cache()
+    user = cache.get(token_value)
+    if user is not None:
+        return user
+
+    try:
+        token = (
+            AuthToken.objects
+            .select_related('user')
+            .get(token=token_value, expires_at__gt=timezone.now())
+        )
+    except AuthToken.DoesNotExist:
+        return None
+
+    cache.set(token_value, token.user, token.expires_at)
+    return token.user
+
+
+async def aresolve_token(token_value):
+    """Async resolve_token for ASGI views; a cache hit never leaves the event loop."""
+    if auth_mode() == SIGNED:
+        deny_list = get_deny_list()
+        if not deny_list.loaded:
+            await sync_to_async(deny_list.refresh)()
+        return resolve_signed_token(token_value)
+
+    token_value = _normalize_token(token_value)
+    if token_value is None:
+        return None
+
+    cache = get_token_cache()
+    user = await cache.aget(token_value)
+    if user is not None:
+        return user
+
+    try:
+        token = await (
+            AuthToken.objects
+            .select_related('user')
+            .aget(token=token_value, expires_at__gt=timezone.now())
+        )
+    except AuthToken.DoesNotExist:
+        return None
+
+    await cache.aset(token_value, token.user, token.expires_at)
+    return token.user
+
+
+# -------------------- Token Lifecycle --------------------
+def auth_tokens_config():
+    return {**DEFAULT_AUTH_TOKENS, **getattr(settings, 'AUTH_TOKENS', {})}
+
+
+def issue_token(user):
+    """Token for a successful login: the user's newest token if it still has
+    REUSE_MIN_REMAINING seconds to live, otherwise a new one."""
+    config = auth_tokens_config()
+    now = timezone.now()
+    if config['REUSE']:
+        token = (
+            AuthToken.objects
+            .filter(user=user, expires_at__gt=now + timedelta(seconds=config['REUSE_MIN_REMAINING']))
+            .order_by('-expires_at')
+            .first()
+        )
+        if token is not None:
+            return token
+    return AuthToken.objects.create(user=user, expires_at=now + timedelta(seconds=config['LIFETIME']))
+
+
+def purge_expired_tokens(table, batch_size, grace=0):
+    """Delete rows of `table` (see PURGE_TABLES) that expired more than `grace` seconds ago, oldest first.
+
+    Yields the number of rows deleted per batch. Cached tokens never outlive
+    their expires_at, and revoked signed tokens stop verifying at theirs, so
+    no cache or deny-list invalidation is needed.
+    """
+    sql = PURGE_TOKENS_SQL.format(table=table, key=PURGE_TABLES[table])
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [cutoff, batch_size])
+            deleted = cursor.rowcount
+        if not deleted:
+            return
+        yield deleted
+
+
+# -------------------- Signed Tokens --------------------
+def auth_config():
+    return {**DEFAULT_AUTH, **getattr(settings, 'AUTH', {})}
+
+
+def auth_mode():
+    return auth_config()['MODE']
+
+
+def signed_access_token(user):
+    access = AccessToken.for_user(user)
+    for claim in USER_CLAIMS:
+        access[claim] = getattr(user, claim)
+    return access
+
+
+def issue_signed_tokens(user):
+    """(access, refresh) pair for a successful login in SIGNED mode."""
+    return str(signed_access_token(user)), str(RefreshToken.for_user(user))
+
+
+def user_from_claims(payload):
+    """An unsaved-looking User rebuilt from access token claims; no query is made."""
+    user = User(pk=payload['user_id'], **{claim: payload.get(claim) for claim in USER_CLAIMS})
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+    return user
+
+
+def verify_signed_token(token_class, token_value):
+    """Decoded token if its signature, type and expiry check out and it is not revoked; else None."""
+    if not isinstance(token_value, str) or not token_value:
+        # simplejwt mints a fresh token when given None.
+        return None
+    try:
+        token = token_class(token_value)
+    except TokenError:
+        return None
+    if get_deny_list().contains(token['jti']):
+        return None
+    return token
+
+
+def resolve_signed_token(token_value):
+    access = verify_signed_token(AccessToken, token_value)
+    return user_from_claims(access.payload) if access is not None else None
+
+
+def token_expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def revoke_signed_tokens(tokens):
+    """Deny the given decoded tokens until they expire, here at once and in other processes on their next refresh."""
+    rows = [RevokedToken(jti=token['jti'], expires_at=token_expiry(token)) for token in tokens]
+    RevokedToken.objects.bulk_create(rows, ignore_conflicts=True)
+    deny_list = get_deny_list()
+    for row in rows:
+        deny_list.add(row.jti)
+
+
+# -------------------- Deny List --------------------
+class DenyList:
+    """In-process copy of the unexpired RevokedToken ids.
+
+    The set is reloaded every `refresh_interval` seconds in a background
+    thread, so verifying a signed token costs one set lookup. Revocations made
+    in this process apply immediately; revocations made elsewhere apply
+    within `refresh_interval` seconds.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._jtis = frozenset()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._added_during_refresh = set()
+        self._refresher = Refresher(self._load, refresh_interval, "Signed token deny-list refresh")
+
+    @property
+    def loaded(self):
+        return self._refresher.loaded
+
+    def __len__(self):
+        return len(self._jtis)
+
+    def refresh(self):
+        self._refresher.refresh()
+
+    def _load(self):
+        with self._lock:
+            self._refreshing = True
+            self._added_during_refresh = set()
+        try:
+            jtis = set(RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('jti', flat=True))
+        except Exception:
+            with self._lock:
+                self._refreshing = False
+            raise
+        with self._lock:
+            self._jtis = frozenset(jtis | self._added_during_refresh)
+            self._refreshing = False
+
+    def contains(self, jti):
+        self._refresher.maybe_refresh()
+        return jti in self._jtis
+
+    def add(self, jti):
+        with self._lock:
+            self._jtis = self._jtis | {jti}
+            if self._refreshing:
+                self._added_during_refresh.add(jti)
+
+
+_deny_list = None
+
+
+def get_deny_list():
+    global _deny_list
+    if _deny_list is None:
+        _deny_list = DenyList(auth_config()['DENY_LIST_REFRESH'])
+    return _deny_list
+
+
+def reset_deny_list():
+    global _deny_list
+    _deny_list = None
+
+
+def collect_deny_list_metrics():
+    if _deny_list is None:
+        return
+    yield ('phonebook_token_deny_list_size', 'gauge', "Revoked signed tokens held in the in-process deny-list.",
+           [({}, len(_deny_list))])
+
+
+registry.register_collector(collect_deny_list_metrics)
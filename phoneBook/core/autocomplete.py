@@ -0,0 +1,380 @@
+# core/autocomplete.py
+
+import itertools
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from core.background import Refresher
+from core.metrics import registry
+from core.models import Contact, User
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUTOCOMPLETE = {
+    'MAX_RESULTS': 10,
+    'INDEX_CONTACTS': True,
+    'REFRESH_INTERVAL': 5,
+    'MAX_CHANGES': 5000,
+    'SCAN_FACTOR': 20,
+    'LOAD_ON_STARTUP': True,
+}
+
+SEPARATOR = '\x00'
+
+# Phone versions (migration 0011) are taken from a sequence just before commit,
+# so a version may become visible shortly after a higher one. The index only
+# moves its watermark past versions at least this many seconds old, and
+# re-applies younger changes on the next refresh.
+SETTLE_SECONDS = 5
+
+SETTLED_VERSION_SQL = """
+    SELECT version FROM core_phoneversion
+    WHERE updated_at <= clock_timestamp() - make_interval(secs => %s)
+    ORDER BY version DESC
+    LIMIT 1
+"""
+
+CHANGED_PHONES_SQL = """
+    SELECT phone_number, version, updated_at <= clock_timestamp() - make_interval(secs => %s)
+    FROM core_phoneversion
+    WHERE version > %s
+    ORDER BY version
+    LIMIT %s
+"""
+
+
+def _word_starts(name):
+    """Lowercased suffixes of `name` that begin at a word, so "Kum" completes "Vikram Kumar"."""
+    lowered = name.lower()
+    starts = [0] + [i + 1 for i, char in enumerate(lowered) if char == ' ' and i + 1 < len(lowered)]
+    return [lowered[i:] for i in starts if lowered[i] != ' ']
+
+
+# -------------------- Sorted Storage --------------------
+class SortedPairs:
+    """(key, value) pairs in key order, stored as chunks of at most 2 * LOAD.
+
+    Inserting or deleting moves the items of one chunk rather than the whole
+    array (the layout of sortedcontainers.SortedList); `maxes` holds each
+    chunk's last key, so a position is two bisects away. Equal keys are allowed.
+    """
+
+    LOAD = 1000
+
+    def __init__(self, pairs=()):
+        """`pairs` must already be sorted by key."""
+        pairs = list(pairs)
+        self._keys = [[key for key, _ in pairs[i:i + self.LOAD]] for i in range(0, len(pairs), self.LOAD)]
+        self._values = [[value for _, value in pairs[i:i + self.LOAD]] for i in range(0, len(pairs), self.LOAD)]
+        self._maxes = [keys[-1] for keys in self._keys]
+        self._len = len(pairs)
+
+    def __len__(self):
+        return self._len
+
+    def insert(self, key, value):
+        if not self._maxes:
+            self._keys.append([key])
+            self._values.append([value])
+            self._maxes.append(key)
+            self._len = 1
+            return
+        c = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        keys, values = self._keys[c], self._values[c]
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        values.insert(i, value)
+        self._maxes[c] = keys[-1]
+        self._len += 1
+        if len(keys) > 2 * self.LOAD:
+            half = self.LOAD
+            self._keys[c:c + 1] = [keys[:half], keys[half:]]
+            self._values[c:c + 1] = [values[:half], values[half:]]
+            self._maxes[c:c + 1] = [keys[half - 1], keys[-1]]
+
+    def remove(self, key, value):
+        """Remove one pair equal to (key, value). Returns whether it was found."""
+        c = bisect_left(self._maxes, key)
+        while c < len(self._keys):
+            keys, values = self._keys[c], self._values[c]
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if values[i] == value:
+                    del keys[i]
+                    del values[i]
+                    self._len -= 1
+                    if keys:
+                        self._maxes[c] = keys[-1]
+                    else:
+                        del self._keys[c], self._values[c], self._maxes[c]
+                    return True
+                i += 1
+            if i < len(keys):
+                return False
+            c += 1
+        return False
+
+    def iter_from(self, key):
+        """Pairs in order starting at the first key >= `key`."""
+        c = bisect_left(self._maxes, key)
+        i = bisect_left(self._keys[c], key) if c < len(self._keys) else 0
+        for c in range(c, len(self._keys)):
+            keys, values = self._keys[c], self._values[c]
+            for j in range(i, len(keys)):
+                yield keys[j], values[j]
+            i = 0
+
+    def __iter__(self):
+        for keys, values in zip(self._keys, self._values):
+            yield from zip(keys, values)
+
+    def memory_bytes(self):
+        """The chunk lists themselves, not the objects they hold."""
+        lists = [self._keys, self._values, self._maxes, *self._keys, *self._values]
+        return sum(sys.getsizeof(items) for items in lists)
+
+
+# -------------------- Prefix Index --------------------
+class PrefixIndex:
+    """Sorted "<lowercased name suffix>\\0<phone>" keys, each with its (name, phone, registered) value.
+
+    A completion is a bisect to the first key with the prefix followed by a
+    forward scan of at most `limit * scan_factor` keys, so lookups never touch
+    the database and a common prefix cannot walk the whole index. Registered
+    users and contact names of unregistered numbers share the index; at query
+    time a number owned by a registered user is only completed under the
+    user's name.
+
+    `version` is the phone version (migration 0011) the index is known to be
+    current with; catch_up() applies the numbers changed since.
+    """
+
+    def __init__(self, include_contacts=True, scan_factor=DEFAULT_AUTOCOMPLETE['SCAN_FACTOR']):
+        self.include_contacts = include_contacts
+        self.scan_factor = scan_factor
+        self._pairs = SortedPairs()
+        self._sources = {}  # ('user', id) or ('contact', user_id, phone) -> (name, phone)
+        self._by_phone = {}  # phone -> its sources
+        self._registered = {}  # phone -> number of user entries (normally 1)
+        self._lock = threading.Lock()
+        self.version = 0
+        self.build_seconds = 0.0
+        self.build_memory_bytes = 0
+
+    def __len__(self):
+        return len(self._pairs)
+
+    @classmethod
+    def build(cls, include_contacts=True, scan_factor=DEFAULT_AUTOCOMPLETE['SCAN_FACTOR']):
+        started = time.perf_counter()
+        index = cls(include_contacts, scan_factor)
+        # Read before the rows, so changes made during the build are applied again by catch_up().
+        with connection.cursor() as cursor:
+            cursor.execute(SETTLED_VERSION_SQL, [SETTLE_SECONDS])
+            row = cursor.fetchone()
+        index.version = row[0] if row else 0
+        entries = []
+        for pk, name, phone in User.objects.values_list('pk', 'name', 'phone_number').iterator(chunk_size=5000):
+            entries.extend(index._register(('user', pk), name, phone))
+        if include_contacts:
+            rows = Contact.objects.values_list('user_id', 'contact_name', 'contact_phone').iterator(chunk_size=5000)
+            for user_id, name, phone in rows:
+                entries.extend(index._register(('contact', user_id, phone), name, phone))
+        entries.sort()
+        index._pairs = SortedPairs(entries)
+        index.build_seconds = time.perf_counter() - started
+        index.build_memory_bytes = index.memory_bytes()
+        return index
+
+    def _register(self, source, name, phone):
+        phone = sys.intern(phone)
+        registered = source[0] == 'user'
+        self._sources[source] = (name, phone)
+        self._by_phone.setdefault(phone, set()).add(source)
+        if registered:
+            self._registered[phone] = self._registered.get(phone, 0) + 1
+        value = (name, phone, registered)
+        return [(f"{suffix}{SEPARATOR}{phone}", value) for suffix in _word_starts(name)]
+
+    def _unregister(self, source):
+        name, phone = self._sources.pop(source)
+        sources = self._by_phone[phone]
+        sources.discard(source)
+        if not sources:
+            del self._by_phone[phone]
+        registered = source[0] == 'user'
+        if registered:
+            remaining = self._registered[phone] - 1
+            if remaining:
+                self._registered[phone] = remaining
+            else:
+                del self._registered[phone]
+        value = (name, phone, registered)
+        for suffix in _word_starts(name):
+            self._pairs.remove(f"{suffix}{SEPARATOR}{phone}", value)
+
+    def _put(self, source, name, phone):
+        if source in self._sources:
+            self._unregister(source)
+        for key, value in self._register(source, name, phone):
+            self._pairs.insert(key, value)
+
+    def put(self, source, name, phone):
+        if source[0] == 'contact' and not self.include_contacts:
+            return
+        with self._lock:
+            self._put(source, name, phone)
+
+    def remove(self, source):
+        with self._lock:
+            if source in self._sources:
+                self._unregister(source)
+
+    def catch_up(self, max_changes):
+        """Re-read the numbers whose phone version moved past `version`.
+
+        Returns False, changing nothing, when more than `max_changes` numbers
+        changed; a full build is cheaper then.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(CHANGED_PHONES_SQL, [SETTLE_SECONDS, self.version, max_changes + 1])
+            changes = cursor.fetchall()
+        if len(changes) > max_changes:
+            return False
+        if not changes:
+            return True
+
+        phones = sorted({phone for phone, _, _ in changes})
+        users = list(User.objects.filter(phone_number__any=phones).values_list('pk', 'name', 'phone_number'))
+        contacts = []
+        if self.include_contacts:
+            contacts = list(Contact.objects.filter(contact_phone__any=phones)
+                            .values_list('user_id', 'contact_name', 'contact_phone'))
+        with self._lock:
+            for phone in phones:
+                for source in list(self._by_phone.get(phone, ())):
+                    self._unregister(source)
+            for pk, name, phone in users:
+                self._put(('user', pk), name, phone)
+            for user_id, name, phone in contacts:
+                self._put(('contact', user_id, phone), name, phone)
+            self.version = max([self.version] + [version for _, version, settled in changes if settled])
+        return True
+
+    def complete(self, prefix, limit):
+        prefix = prefix.lower()
+        results = []
+        seen = set()
+        with self._lock:
+            for key, (name, phone, registered) in itertools.islice(self._pairs.iter_from(prefix),
+                                                                   limit * self.scan_factor):
+                if len(results) >= limit or not key.startswith(prefix):
+                    break
+                if phone in seen or (not registered and phone in self._registered):
+                    continue
+                seen.add(phone)
+                results.append({"name": name, "phone_number": phone, "is_registered_user": registered})
+        return results
+
+    def memory_bytes(self):
+        """Approximate footprint of the chunks, keys and value tuples (shared strings counted once)."""
+        with self._lock:
+            total = self._pairs.memory_bytes()
+            strings = {}
+            for key, value in self._pairs:
+                total += sys.getsizeof(key) + sys.getsizeof(value)
+                strings[id(value[0])] = value[0]
+                strings[id(value[1])] = value[1]
+            total += sum(sys.getsizeof(s) for s in strings.values())
+        return total
+
+
+# -------------------- Process-wide Index --------------------
+_index = None
+_refresher = None
+
+
+def autocomplete_config():
+    return {**DEFAULT_AUTOCOMPLETE, **getattr(settings, 'AUTOCOMPLETE', {})}
+
+
+def load_index():
+    """Build the index and make it current."""
+    global _index
+    config = autocomplete_config()
+    index = PrefixIndex.build(include_contacts=config['INDEX_CONTACTS'], scan_factor=config['SCAN_FACTOR'])
+    _index = index
+    logger.info("Autocomplete index built: %d keys, ~%d bytes, %.3fs",
+                len(index), index.build_memory_bytes, index.build_seconds)
+    return index
+
+
+def refresh_index():
+    """Build the index, or bring it up to date with writes made anywhere, rebuilding if too much changed."""
+    index = _index
+    if index is None or not index.catch_up(autocomplete_config()['MAX_CHANGES']):
+        load_index()
+
+
+def _index_refresher():
+    global _refresher
+    if _refresher is None:
+        _refresher = Refresher(refresh_index, autocomplete_config()['REFRESH_INTERVAL'], "Autocomplete index refresh")
+    return _refresher
+
+
+def load_on_startup():
+    """Start building the index as the worker starts, so the first request does not pay for all of it.
+
+    The build runs in a background thread: ASGI servers import the application
+    inside a running event loop, where database access raises
+    SynchronousOnlyOperation. Nothing here may stop the application loading.
+    """
+    try:
+        if autocomplete_config()['LOAD_ON_STARTUP']:
+            _index_refresher().start()
+    except Exception:
+        logger.exception("Autocomplete index not built at startup; it will be built on first use")
+
+
+def get_index():
+    """Current index, building it on first use.
+
+    Signals only reach the worker that made a write, so every REFRESH_INTERVAL
+    seconds each worker also applies, in the background, the numbers whose
+    phone version changed since; it rebuilds only when more than MAX_CHANGES
+    numbers did.
+    """
+    _index_refresher().maybe_refresh()
+    return _index
+
+
+def loaded_index():
+    """The index if this process has built one; writes before that need no bookkeeping."""
+    return _index
+
+
+def reset_index():
+    global _index, _refresher
+    _index = None
+    _refresher = None
+
+
+def collect_metrics():
+    index = _index
+    if index is None:
+        return
+    yield ('phonebook_autocomplete_keys', 'gauge', "Keys in the in-process autocomplete index.",
+           [({}, len(index))])
+    yield ('phonebook_autocomplete_memory_bytes', 'gauge', "Approximate autocomplete index size at its last build.",
+           [({}, index.build_memory_bytes)])
+    yield ('phonebook_autocomplete_build_seconds', 'gauge', "Time taken by the last autocomplete index build.",
+           [({}, index.build_seconds)])
+
+
+registry.register_collector(collect_metrics)
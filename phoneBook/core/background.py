@@ -0,0 +1,81 @@
+# core/background.py
+
+import logging
+import threading
+import time
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class Refresher:
+    """Keeps in-process data loaded by `load` fresh without making requests wait for it.
+
+    The first maybe_refresh() loads inline, once even when several threads
+    ask at the same time, since there is nothing to serve yet; callers that can
+    answer without the data pass wait=False and only start the load. A caller
+    that needs the data while a background load is running waits for that
+    load instead of repeating it. Once `interval` seconds have passed since
+    the last attempt, it starts at most one daemon thread to reload while
+    callers keep the current data. A failed background load is logged and
+    retried after another `interval`; the thread closes the database
+    connections it opened.
+    """
+
+    def __init__(self, load, interval, description):
+        self.load = load
+        self.interval = interval
+        self.description = description
+        self.loaded_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._running = False
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def age(self):
+        return time.monotonic() - self.loaded_at if self.loaded_at is not None else None
+
+    def forget(self):
+        """Treat the data as never loaded: the next maybe_refresh() loads it as on first use."""
+        self.loaded_at = None
+
+    def refresh(self):
+        """Load now, in the calling thread."""
+        self._attempted_at = time.monotonic()
+        self.load()
+        self.loaded_at = time.monotonic()
+
+    def maybe_refresh(self, wait=True):
+        if self.loaded_at is None:
+            if not wait:
+                self.start()
+                return
+            with self._load_lock:
+                if self.loaded_at is None:
+                    self.refresh()
+            return
+        if not self._running and time.monotonic() - self._attempted_at > self.interval:
+            self.start()
+
+    def start(self):
+        """Load in a daemon thread now, unless a background load is already running."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            with self._load_lock:
+                self.refresh()
+        except Exception:
+            logger.exception("%s failed", self.description)
+        finally:
+            self._running = False
+            connections.close_all()
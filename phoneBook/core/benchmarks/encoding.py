@@ -0,0 +1,57 @@
+# core/benchmarks/encoding.py
+
+import random
+
+from core.benchmarks.endpoints import FIRST_NAMES, LAST_NAMES, bench_phone
+from core.benchmarks.stats import best_of
+from core.renderers import RESULT_FIELDS, encode_results
+from core.serializers import SearchResultSerializer
+from rest_framework.renderers import JSONRenderer
+
+
+def sample_rows(count, seed=0):
+    """Result tuples shaped like a mix of registered users and contact-name matches."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        registered = rng.random() < 0.5
+        visible = registered and rng.random() < 0.3
+        rows.append((
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            bench_phone(i),
+            registered,
+            rng.randrange(5),
+            visible,
+            f"user{i}@example.com" if visible else None,
+        ))
+    return rows
+
+
+def serializer_path(rows):
+    # What the views did before: a dict per row, then the serializer, then JSONRenderer.
+    data = [dict(zip(RESULT_FIELDS, row)) for row in rows]
+    return JSONRenderer().render(SearchResultSerializer(data, many=True).data)
+
+
+def run_encoding_benchmark(page_size=100, pages=200, repeat=5, seed=0):
+    """Time encoding `pages` response bodies of `page_size` rows along both paths."""
+    page_rows = [sample_rows(page_size, seed + page) for page in range(pages)]
+
+    # The fast path must be a drop-in replacement before its speed matters.
+    assert all(encode_results(rows) == serializer_path(rows) for rows in page_rows)
+
+    paths = {
+        "serializer": serializer_path,
+        "row_encoder": encode_results,
+    }
+    count = page_size * pages
+    report = {"page_size": page_size, "pages": pages, "repeat": repeat, "paths": {}}
+    for name, function in paths.items():
+        seconds = best_of(lambda pages_: [function(rows) for rows in pages_], page_rows, repeat)
+        report["paths"][name] = {
+            "seconds": round(seconds, 4),
+            "us_per_row": round(seconds / count * 1e6, 3),
+            "rows_per_second": round(count / seconds),
+        }
+    report["speedup"] = round(report["paths"]["serializer"]["seconds"] / report["paths"]["row_encoder"]["seconds"], 2)
+    return report
@@ -0,0 +1,429 @@
+# core/benchmarks/endpoints.py
+
+import asyncio
+import io
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from core.admission import admission_config, reset_admission_controller
+from core.authentication import SIGNED, auth_mode, issue_signed_tokens
+from core.benchmarks.stats import summarize
+from core.metrics import QueryTimer
+from core.models import AuthToken, Contact, SpamReport, User
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+BENCH_PREFIX = '+9180'
+BENCH_PASSWORD = 'benchpass'
+FIRST_NAMES = ['Aman', 'Riya', 'Vikram', 'Neha', 'Rahul', 'Divya', 'Kabir', 'Ananya', 'Arjun', 'Priya']
+LAST_NAMES = ['Singh', 'Sharma', 'Kumar', 'Kapoor', 'Raj', 'Iyer', 'Patel', 'Gupta']
+
+
+# Numbers written by a run (registrations, spam marks) take the 8 digits after
+# their prefix from i * RUN_PHONE_MULTIPLIER + run_id, a bijection modulo
+# 10**8: distinct for every request of a run and always a valid length.
+RUN_PHONE_SPACE = 10 ** 8
+RUN_PHONE_MULTIPLIER = 2_654_435_761  # coprime to RUN_PHONE_SPACE
+
+
+def bench_phone(index):
+    return f"{BENCH_PREFIX}{index:08d}"
+
+
+def run_phone(prefix, run_id, index):
+    return f"{prefix}{(index * RUN_PHONE_MULTIPLIER + run_id) % RUN_PHONE_SPACE:08d}"
+
+
+# -------------------- Fixture --------------------
+def seed_fixture(users=500, contacts_per_user=20, spam_reports=500, seed=0):
+    """Create the benchmark users, contacts and spam reports once; later calls are no-ops."""
+    existing = User.objects.filter(phone_number__startswith=BENCH_PREFIX).count()
+    if existing >= users:
+        return existing
+
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create([
+        User(
+            phone_number=bench_phone(i),
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            password=password,
+        )
+        for i in range(existing, users)
+    ], batch_size=1000)
+
+    new_users = User.objects.filter(phone_number__gte=bench_phone(existing),
+                                    phone_number__startswith=BENCH_PREFIX)
+    searcher_phone = bench_phone(0)
+    contacts = []
+    for user in new_users.iterator(chunk_size=1000):
+        phones = {bench_phone(rng.randrange(users)) for _ in range(contacts_per_user)}
+        if rng.random() < 0.3:
+            phones.add(searcher_phone)
+        phones.discard(user.phone_number)
+        contacts.extend(
+            Contact(user=user, contact_phone=phone,
+                    contact_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+            for phone in phones
+        )
+    Contact.objects.bulk_create(contacts, batch_size=1000, ignore_conflicts=True)
+
+    reporter_ids = list(new_users.values_list('id', flat=True))
+    SpamReport.objects.bulk_create([
+        SpamReport(reporter_id=rng.choice(reporter_ids), target_phone=bench_phone(rng.randrange(users)))
+        for _ in range(spam_reports)
+    ], batch_size=1000, ignore_conflicts=True)
+    return users
+
+
+@dataclass
+class BenchmarkContext:
+    users: int
+    token: str
+    searcher_phone: str
+    run_id: int = field(default_factory=lambda: random.randrange(RUN_PHONE_SPACE))
+    logout_tokens: list = field(default_factory=list)
+    refresh_token: str = None
+
+
+def build_context(users, requests):
+    """Tokens for the configured AUTH['MODE'], so runs in each mode can be compared."""
+    searcher = User.objects.get(phone_number=bench_phone(0))
+    logout_user = User.objects.get(phone_number=bench_phone(2))
+    if auth_mode() == SIGNED:
+        token, refresh_token = issue_signed_tokens(searcher)
+        logout_tokens = [issue_signed_tokens(logout_user)[0] for _ in range(requests)]
+    else:
+        expires_at = timezone.now() + timedelta(days=1)
+        token = str(AuthToken.objects.create(user=searcher, expires_at=expires_at).token)
+        refresh_token = None
+        logout_tokens = [str(t.token) for t in AuthToken.objects.bulk_create([
+            AuthToken(user=logout_user, expires_at=expires_at) for _ in range(requests)
+        ])]
+    return BenchmarkContext(
+        users=users,
+        token=token,
+        searcher_phone=searcher.phone_number,
+        logout_tokens=logout_tokens,
+        refresh_token=refresh_token,
+    )
+
+
+# -------------------- Scenarios --------------------
+@dataclass
+class BenchRequest:
+    method: str
+    path: str
+    query: dict = None
+    body: bytes = b''
+    content_type: str = 'application/json'
+    token: str = None
+
+
+def _json(data):
+    return json.dumps(data).encode()
+
+
+def _register(ctx, i):
+    return BenchRequest('POST', 'register/', body=_json({
+        "name": f"Bench {i}",
+        "phone_number": run_phone('+9181', ctx.run_id, i),
+        "password": BENCH_PASSWORD,
+    }))
+
+
+def _login(ctx, i):
+    return BenchRequest('POST', 'login/', body=_json({
+        "phone_number": ctx.searcher_phone,
+        "password": BENCH_PASSWORD,
+    }))
+
+
+def _logout(ctx, i):
+    return BenchRequest('POST', 'logout/', token=ctx.logout_tokens[i % len(ctx.logout_tokens)])
+
+
+def _token_refresh(ctx, i):
+    # Only meaningful with AUTH['MODE'] = 'jwt'; token mode answers 400.
+    return BenchRequest('POST', 'token/refresh/', body=_json({"refresh": ctx.refresh_token}))
+
+
+def _profile(ctx, i):
+    return BenchRequest('GET', 'profile/', token=ctx.token)
+
+
+def _spam_mark(ctx, i):
+    return BenchRequest('POST', 'spam/mark/', body=_json({"target_phone": run_phone('+9182', ctx.run_id, i)}),
+                        token=ctx.token)
+
+
+def _spam_status(ctx, i):
+    return BenchRequest('GET', 'spam/stats/status/', token=ctx.token)
+
+
+def _spam_top(ctx, i):
+    return BenchRequest('GET', 'spam/top/', query={"limit": 10 + i % 40}, token=ctx.token)
+
+
+def _contact_sync(ctx, i):
+    lines = [
+        json.dumps({"name": f"Synced {n} v{i % 2}", "phone_number": bench_phone((n * 7) % ctx.users)})
+        for n in range(100)
+    ]
+    return BenchRequest('POST', 'contacts/sync/', query={"mode": "merge"}, body="\n".join(lines).encode(),
+                        content_type='application/x-ndjson', token=ctx.token)
+
+
+def _contact_export(ctx, i):
+    return BenchRequest('GET', 'contacts/export/', query={"output": ("ndjson", "csv")[i % 2]}, token=ctx.token)
+
+
+def _search_name(ctx, i):
+    return BenchRequest('GET', 'search/name/', query={"q": FIRST_NAMES[i % len(FIRST_NAMES)]}, token=ctx.token)
+
+
+def _search_autocomplete(ctx, i):
+    name = FIRST_NAMES[i % len(FIRST_NAMES)]
+    return BenchRequest('GET', 'search/autocomplete/', query={"q": name[:1 + i % 3]}, token=ctx.token)
+
+
+def _search_phone(ctx, i):
+    return BenchRequest('GET', 'search/phone/', query={"q": bench_phone((i * 31) % ctx.users)}, token=ctx.token)
+
+
+def _search_phone_batch(ctx, i):
+    numbers = [bench_phone((i + n * 13) % ctx.users) for n in range(100)]
+    return BenchRequest('POST', 'search/phone/batch/', body=_json({"numbers": numbers}), token=ctx.token)
+
+
+SCENARIOS = {
+    'register/': _register,
+    'login/': _login,
+    'logout/': _logout,
+    'token/refresh/': _token_refresh,
+    'profile/': _profile,
+    'spam/mark/': _spam_mark,
+    'spam/stats/status/': _spam_status,
+    'spam/top/': _spam_top,
+    'contacts/sync/': _contact_sync,
+    'contacts/export/': _contact_export,
+    'search/name/': _search_name,
+    'search/autocomplete/': _search_autocomplete,
+    'search/phone/': _search_phone,
+    'search/phone/batch/': _search_phone_batch,
+}
+
+
+def uncovered_routes():
+    from core.urls import urlpatterns
+    return sorted(str(p.pattern) for p in urlpatterns if str(p.pattern) not in SCENARIOS)
+
+
+# -------------------- Drivers --------------------
+def wsgi_environ(request):
+    body = request.body or b''
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'PATH_INFO': '/api/' + request.path,
+        'QUERY_STRING': urlencode(request.query or {}),
+        'CONTENT_TYPE': request.content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'HTTP_HOST': 'localhost',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'wsgi.input': io.BytesIO(body),
+    }
+    if request.token:
+        environ['HTTP_AUTHORIZATION'] = f"Bearer {request.token}"
+    setup_testing_defaults(environ)
+    return environ
+
+
+class WSGIDriver:
+    """Calls the WSGI application from a pool of `concurrency` threads."""
+    name = 'wsgi'
+
+    def __init__(self):
+        self.application = get_wsgi_application()
+
+    def __call__(self, request):
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split(' ', 1)[0]))
+
+        result = self.application(wsgi_environ(request), start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return statuses[0]
+
+    def run(self, make_request, requests, concurrency):
+        def worker(i):
+            try:
+                request = make_request(i)
+                with QueryTimer() as counter:
+                    started = time.perf_counter()
+                    status = self(request)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                return elapsed_ms, counter.count, status >= 400
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(worker, range(requests)))
+
+
+def asgi_scope(request):
+    headers = [
+        (b'host', b'localhost'),
+        (b'content-type', request.content_type.encode()),
+        (b'content-length', str(len(request.body or b'')).encode()),
+    ]
+    if request.token:
+        headers.append((b'authorization', f"Bearer {request.token}".encode()))
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': request.method,
+        'scheme': 'http',
+        'path': '/api/' + request.path,
+        'raw_path': ('/api/' + request.path).encode(),
+        'query_string': urlencode(request.query or {}).encode(),
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+
+
+class ASGIDriver:
+    """Drives the ASGI application on one event loop with `concurrency` requests in flight.
+
+    Set PHONEBOOK_ASYNC_VIEWS=1 to route the lookups to core.async_views;
+    otherwise sync views run through Django's sync_to_async adapter.
+    """
+    name = 'asgi'
+
+    def __init__(self):
+        self.application = get_asgi_application()
+
+    async def __call__(self, request):
+        body = request.body or b''
+        statuses = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                # Keeps the handler's disconnect listener waiting until the response is sent.
+                await asyncio.Event().wait()
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await self.application(asgi_scope(request), receive, send)
+        return statuses[0]
+
+    def run(self, make_request, requests, concurrency):
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def worker(i):
+                request = make_request(i)
+                async with semaphore:
+                    with QueryTimer() as counter:
+                        started = time.perf_counter()
+                        status = await self(request)
+                        elapsed_ms = (time.perf_counter() - started) * 1000
+                return elapsed_ms, counter.count, status >= 400
+
+            return await asyncio.gather(*(worker(i) for i in range(requests)))
+
+        try:
+            return asyncio.run(main())
+        finally:
+            connections.close_all()
+
+
+DRIVERS = {
+    'wsgi': WSGIDriver,
+    'asgi': ASGIDriver,
+}
+
+
+def run_route(driver, scenario, ctx, requests, concurrency, warmup=0):
+    if warmup:
+        driver.run(lambda i: scenario(ctx, requests + i), warmup, concurrency)
+
+    started = time.perf_counter()
+    results = driver.run(lambda i: scenario(ctx, i), requests, concurrency)
+    elapsed_s = time.perf_counter() - started
+    return summarize(
+        [r[0] for r in results],
+        [r[1] for r in results],
+        sum(1 for r in results if r[2]),
+        elapsed_s,
+    )
+
+
+def without_rate_limits():
+    """Every scenario sends one bearer token, so per-token buckets would only measure the limit itself.
+
+    Admission concurrency limits stay on.
+    """
+    config = admission_config()
+    classes = {name: {**endpoint, 'RATE': None} for name, endpoint in config['CLASSES'].items()}
+    return override_settings(ADMISSION={**config, 'CLASSES': classes})
+
+
+def run_benchmark(routes=None, interface='wsgi', requests=200, concurrency=8, warmup=10, users=500):
+    with without_rate_limits():
+        reset_admission_controller()
+        try:
+            return _run_benchmark(routes, interface, requests, concurrency, warmup, users)
+        finally:
+            reset_admission_controller()
+
+
+def _run_benchmark(routes, interface, requests, concurrency, warmup, users):
+    users = seed_fixture(users=users)
+    ctx = build_context(users, requests + warmup)
+    driver = DRIVERS[interface]()
+    routes = routes or list(SCENARIOS)
+
+    report = {
+        "meta": {
+            "interface": interface,
+            "async_views": settings.ASYNC_VIEWS,
+            "auth": auth_mode(),
+            "rate_limits": False,
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "fixture_users": users,
+            "started_at": timezone.now().isoformat(),
+        },
+        "routes": {},
+    }
+    for route in routes:
+        report["routes"][route] = run_route(driver, SCENARIOS[route], ctx, requests, concurrency, warmup)
+    return report
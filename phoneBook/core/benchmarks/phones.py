@@ -0,0 +1,54 @@
+# core/benchmarks/phones.py
+
+import random
+
+from core.benchmarks.stats import best_of
+from core.validators import PhoneNormalizer, Validator
+
+SHAPES = (
+    lambda rng: f"+91{rng.randrange(10 ** 9, 10 ** 10)}",
+    lambda rng: f"{rng.randrange(6 * 10 ** 9, 10 ** 10)}",
+    lambda rng: f"91{rng.randrange(6 * 10 ** 9, 10 ** 10)}",
+    lambda rng: f" {rng.randrange(60000, 100000)} {rng.randrange(10000, 100000)} ",
+    lambda rng: f"+1 415 {rng.randrange(1000000, 10000000)}",
+    lambda rng: "not a number",
+)
+
+
+def sample_numbers(count, seed=0):
+    """Address-book shaped input: mostly valid Indian numbers in mixed formats plus some junk."""
+    rng = random.Random(seed)
+    return [rng.choice(SHAPES)(rng) for _ in range(count)]
+
+
+def per_item(numbers):
+    normalized = []
+    for number in numbers:
+        phone = Validator.normalize_phone(number)
+        normalized.append(phone if Validator.validate_phone(phone) else None)
+    return normalized
+
+
+def run_phone_benchmark(count=200000, repeat=5, seed=0):
+    numbers = sample_numbers(count, seed)
+    batch = PhoneNormalizer()
+    world = PhoneNormalizer(countries=None)
+
+    # The batch path must be a drop-in replacement before its speed matters.
+    assert batch.normalize(numbers)[0] == per_item(numbers)
+
+    paths = {
+        "per_item": per_item,
+        "batch": lambda values: batch.normalize(values),
+        "batch_all_countries": lambda values: world.normalize(values),
+    }
+    report = {"numbers": count, "repeat": repeat, "paths": {}}
+    for name, function in paths.items():
+        seconds = best_of(function, numbers, repeat)
+        report["paths"][name] = {
+            "seconds": round(seconds, 4),
+            "ns_per_number": round(seconds / count * 1e9, 1),
+            "numbers_per_second": round(count / seconds),
+        }
+    report["speedup"] = round(report["paths"]["per_item"]["seconds"] / report["paths"]["batch"]["seconds"], 2)
+    return report
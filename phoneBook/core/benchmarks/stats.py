@@ -0,0 +1,76 @@
+# core/benchmarks/stats.py
+
+import math
+import time
+
+LATENCY_KEYS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an ascending list; `pct` is in [0, 100]."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def best_of(function, argument, repeat):
+    """Fastest of `repeat` timed calls of function(argument), in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def summarize(latencies_ms, query_counts, errors, elapsed_s):
+    latencies = sorted(latencies_ms)
+    count = len(latencies)
+    return {
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / count, 3) if count else 0.0,
+        "max_ms": round(latencies[-1], 3) if count else 0.0,
+        "rps": round(count / elapsed_s, 2) if elapsed_s else 0.0,
+        "queries_per_request": round(sum(query_counts) / count, 2) if count else 0.0,
+    }
+
+
+def compare(baseline, current, threshold_pct=10.0):
+    """Flag routes whose latency, throughput or query count regressed beyond the threshold."""
+    regressions = []
+    rows = []
+    for route, base in baseline["routes"].items():
+        cur = current["routes"].get(route)
+        if cur is None:
+            continue
+        row = {"route": route}
+        for key in LATENCY_KEYS:
+            row[key] = _change(base[key], cur[key])
+            if row[key] > threshold_pct:
+                regressions.append(f"{route}: {key} {base[key]} -> {cur[key]} (+{row[key]:.1f}%)")
+        row["rps"] = _change(base["rps"], cur["rps"])
+        if row["rps"] < -threshold_pct:
+            regressions.append(f"{route}: rps {base['rps']} -> {cur['rps']} ({row['rps']:.1f}%)")
+        row["queries_per_request"] = cur["queries_per_request"] - base["queries_per_request"]
+        if row["queries_per_request"] > 0:
+            regressions.append(
+                f"{route}: queries/request {base['queries_per_request']} -> {cur['queries_per_request']}"
+            )
+        rows.append(row)
+    return rows, regressions
+
+
+def _change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
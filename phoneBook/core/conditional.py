@@ -0,0 +1,67 @@
+# core/conditional.py
+
+import hashlib
+
+from core.replicas import read_connection
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+# Part of every ETag; bump it when a response body changes shape so old ETags stop matching.
+ETAG_FORMAT = 1
+
+# Key under which read_versions returns the latest change to any number.
+LATEST = None
+UNCHANGED = (0, None)
+
+VERSIONS_SQL = """
+    SELECT phone_number, version, updated_at FROM core_phoneversion WHERE phone_number = ANY(%s)
+"""
+
+# Index scan on idx_phoneversion_version.
+LATEST_VERSION_SQL = """
+    UNION ALL
+    (SELECT NULL, version, updated_at FROM core_phoneversion ORDER BY version DESC LIMIT 1)
+"""
+
+
+def read_versions(phones, latest=False):
+    """{phone: (version, updated_at)} for the numbers that have changed, in one query.
+
+    With `latest`, the most recent change to any number is included under LATEST.
+    """
+    with read_connection().cursor() as cursor:
+        cursor.execute(VERSIONS_SQL + (LATEST_VERSION_SQL if latest else ''), [list(phones)])
+        return {phone: (version, updated_at) for phone, version, updated_at in cursor.fetchall()}
+
+
+def make_etag(*parts):
+    """Strong ETag over whatever selects a response body: the searcher, parameters and versions."""
+    key = '\x1f'.join(str(part) for part in (ETAG_FORMAT,) + parts)
+    return '"%s"' % hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def version_validators(versions, phones, *key):
+    """(ETag, Last-Modified) for a body built from the numbers in `phones` and the request `key`."""
+    seen = [versions.get(phone, UNCHANGED) for phone in phones]
+    etag = make_etag(*key, *(version for version, _ in seen))
+    last_modified = max((updated_at for _, updated_at in seen if updated_at is not None), default=None)
+    return etag, last_modified
+
+
+def not_modified(request, etag):
+    """A 304 response if the client's If-None-Match still holds, else None.
+
+    Only the ETag decides: Last-Modified has one-second resolution, so two
+    writes in the same second would leave If-Modified-Since matching stale
+    data. A request with only If-Modified-Since gets the full body.
+    """
+    return get_conditional_response(request, etag=etag)
+
+
+def with_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Bodies are per searcher: clients may keep them but must revalidate, and shared caches must not.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
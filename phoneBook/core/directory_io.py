@@ -0,0 +1,285 @@
+# core/directory_io.py
+
+import csv
+import io
+import itertools
+import json
+
+from core.models import Contact, SpamReport, User
+from core.sync import iter_ndjson
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import DatabaseError, connection, transaction
+
+DEFAULT_DIRECTORY_IO = {
+    'CHUNK_SIZE': 5000,
+}
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+
+
+class TransferError(ValueError):
+    pass
+
+
+def directory_io_config():
+    return {**DEFAULT_DIRECTORY_IO, **getattr(settings, 'DIRECTORY_IO', {})}
+
+
+# -------------------- Datasets --------------------
+class Dataset:
+    """A table as it appears in a dump: named columns, exported through the ORM
+    (NDJSON) or COPY (CSV), and merged back from a staging table on import.
+
+    `columns` are (name, ORM lookup, SQL expression over `source`, staging type).
+    """
+
+    def __init__(self, name, model, columns, source, merge_sql, merge_params=()):
+        self.name = name
+        self.model = model
+        self.columns = tuple(column for column, _, _, _ in columns)
+        self.lookups = tuple(lookup for _, lookup, _, _ in columns)
+        self.expressions = tuple(expression for _, _, expression, _ in columns)
+        self.types = tuple(sql_type for _, _, _, sql_type in columns)
+        self.source = source
+        self.merge_sql = merge_sql
+        self.merge_params = list(merge_params)
+
+    def filename(self, fmt):
+        return f"{self.name}.{fmt}"
+
+    @property
+    def staging_table(self):
+        return f"directory_import_{self.name}"
+
+
+# Contacts and spam reports name users by phone number rather than id, so a
+# dump loads into a database whose ids differ. Rows that already exist, and
+# rows naming a user the database does not have, are skipped on import.
+DATASETS = {
+    dataset.name: dataset for dataset in (
+        Dataset(
+            'users', User,
+            (
+                ('phone_number', 'phone_number', 'phone_number', 'text'),
+                ('name', 'name', 'name', 'text'),
+                ('email', 'email', 'email', 'text'),
+                ('password', 'password', 'password', 'text'),
+                ('created_at', 'created_at', 'created_at', 'timestamptz'),
+            ),
+            'core_user',
+            """
+                INSERT INTO core_user (phone_number, name, email, password, created_at)
+                SELECT phone_number, name, NULLIF(email, ''), COALESCE(NULLIF(password, ''), %s),
+                       COALESCE(created_at, now())
+                FROM directory_import_users
+                ON CONFLICT DO NOTHING
+            """,
+            # Users exported without passwords cannot log in until they reset it.
+            merge_params=[UNUSABLE_PASSWORD_PREFIX],
+        ),
+        Dataset(
+            'contacts', Contact,
+            (
+                ('owner_phone', 'user__phone_number', 'u.phone_number', 'text'),
+                ('contact_phone', 'contact_phone', 'c.contact_phone', 'text'),
+                ('contact_name', 'contact_name', 'c.contact_name', 'text'),
+                ('created_at', 'created_at', 'c.created_at', 'timestamptz'),
+            ),
+            'core_contact c JOIN core_user u ON u.id = c.user_id',
+            """
+                INSERT INTO core_contact (user_id, contact_phone, contact_name, created_at)
+                SELECT u.id, s.contact_phone, s.contact_name, COALESCE(s.created_at, now())
+                FROM directory_import_contacts s
+                JOIN core_user u ON u.phone_number = s.owner_phone
+                ON CONFLICT DO NOTHING
+            """,
+        ),
+        Dataset(
+            'spam_reports', SpamReport,
+            (
+                ('reporter_phone', 'reporter__phone_number', 'u.phone_number', 'text'),
+                ('target_phone', 'target_phone', 'r.target_phone', 'text'),
+                ('reported_at', 'reported_at', 'r.reported_at', 'timestamptz'),
+            ),
+            'core_spamreport r JOIN core_user u ON u.id = r.reporter_id',
+            """
+                INSERT INTO core_spamreport (reporter_id, target_phone, reported_at)
+                SELECT u.id, s.target_phone, COALESCE(s.reported_at, now())
+                FROM directory_import_spam_reports s
+                JOIN core_user u ON u.phone_number = s.reporter_phone
+                ON CONFLICT DO NOTHING
+            """,
+        ),
+    )
+}
+
+# Left empty by `export_directory --exclude-passwords`.
+SECRET_COLUMNS = ('password',)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _json_default(value):
+    # Full precision; DjangoJSONEncoder would cut timestamps to milliseconds.
+    return value.isoformat()
+
+
+def ndjson_lines(columns, rows):
+    """Encode each row as one JSON object per line."""
+    return (json.dumps(dict(zip(columns, row)), default=_json_default).encode() + b'\n' for row in rows)
+
+
+def csv_lines(columns, rows, header=True):
+    """Encode rows as CSV, header first; None becomes an empty field."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if header and buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+# -------------------- Export --------------------
+def export_dataset(dataset, out, fmt, chunk_size, omit=()):
+    """Write every row of `dataset` to the binary file `out` in `fmt`. Returns the number of rows.
+
+    NDJSON is read through a server-side cursor `chunk_size` rows at a time;
+    CSV is produced by COPY ... TO STDOUT, which streams as the server
+    writes it. Columns in `omit` are exported empty.
+    """
+    if fmt == CSV:
+        expressions = [
+            f"NULL AS {column}" if column in omit else f"{expression} AS {column}"
+            for column, expression in zip(dataset.columns, dataset.expressions)
+        ]
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.copy_expert(
+                f"COPY (SELECT {', '.join(expressions)} FROM {dataset.source}) TO STDOUT WITH (FORMAT csv, HEADER)",
+                out,
+            )
+            return cursor.rowcount
+
+    omitted = [dataset.columns.index(column) for column in omit if column in dataset.columns]
+    rows = dataset.model.objects.values_list(*dataset.lookups).iterator(chunk_size=chunk_size)
+    written = 0
+    for chunk in _chunks(rows, chunk_size):
+        if omitted:
+            chunk = [tuple(None if i in omitted else value for i, value in enumerate(row)) for row in chunk]
+        out.writelines(ndjson_lines(dataset.columns, chunk))
+        written += len(chunk)
+    return written
+
+
+# -------------------- Import --------------------
+class CopyReader:
+    """Read-only binary file over CSV-encoded rows, so COPY FROM STDIN can pull them as it goes.
+
+    psycopg2 reports an exception raised by read() as a cancelled COPY;
+    `error` keeps the original.
+    """
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._pending = b''
+        self.error = None
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            try:
+                line = next(self._lines, None)
+            except Exception as exc:
+                self.error = exc
+                raise
+            if line is None:
+                break
+            self._pending += line
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def copy_from(cursor, table, columns, source):
+    """COPY the headerless CSV file `source` into `table`'s `columns`. Returns the number of rows."""
+    try:
+        # copy_expert bypasses Django's cursor wrapper, so its errors need translating here.
+        with connection.wrap_database_errors:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", source)
+    except DatabaseError:
+        if getattr(source, 'error', None):
+            raise source.error from None
+        raise
+    return cursor.rowcount
+
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY `rows` into `table` as they are generated. Returns the number of rows."""
+    return copy_from(cursor, table, columns, CopyReader(csv_lines(columns, rows, header=False)))
+
+
+def _ndjson_rows(dataset, stream):
+    for line_number, entry in enumerate(iter_ndjson(stream), start=1):
+        if not isinstance(entry, dict):
+            raise TransferError(f"{dataset.name}: line {line_number} is not a JSON object.")
+        yield [entry.get(column) for column in dataset.columns]
+
+
+def _check_csv_header(dataset, stream):
+    header = next(csv.reader([stream.readline().decode('utf-8-sig')]), [])
+    if tuple(header) != dataset.columns:
+        raise TransferError(f"{dataset.name}: expected the CSV header {','.join(dataset.columns)}.")
+
+
+def import_dataset(dataset, stream, fmt):
+    """Load `dataset` from the binary file `stream` in one transaction. Returns (rows read, rows inserted).
+
+    Rows are streamed into a temporary staging table with COPY, then merged
+    with one INSERT ... SELECT that skips rows already present. Insert
+    triggers (search keys, spam aggregation, the phone directory) fire as
+    for any other write.
+    """
+    if fmt == CSV:
+        _check_csv_header(dataset, stream)
+        source = stream
+    else:
+        source = CopyReader(csv_lines(dataset.columns, _ndjson_rows(dataset, stream), header=False))
+
+    definition = ', '.join(f"{column} {sql_type}" for column, sql_type in zip(dataset.columns, dataset.types))
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Dropped at commit; an import earlier in the same transaction may have left one.
+        cursor.execute(f"DROP TABLE IF EXISTS {dataset.staging_table}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {dataset.staging_table} ({definition}) ON COMMIT DROP")
+        read = copy_from(cursor, dataset.staging_table, dataset.columns, source)
+        cursor.execute(dataset.merge_sql, dataset.merge_params)
+        return read, cursor.rowcount
+
+
+# -------------------- Per-user Contact Export --------------------
+CONTACT_EXPORT_COLUMNS = ('name', 'phone_number')
+
+
+def iter_contact_export(user, fmt, chunk_size):
+    """Yield `user`'s contacts as NDJSON or CSV in chunks of `chunk_size` rows.
+
+    The fields are those contacts/sync/ accepts, so an export can be synced
+    back unchanged.
+    """
+    # Ordered by the (user, contact_phone) unique index, so rows stream without a sort.
+    rows = (Contact.objects.filter(user=user).order_by('contact_phone')
+            .values_list('contact_name', 'contact_phone').iterator(chunk_size=chunk_size))
+    encode = csv_lines if fmt == CSV else ndjson_lines
+    lines = encode(CONTACT_EXPORT_COLUMNS, rows)
+    for chunk in _chunks(lines, chunk_size):
+        yield b''.join(chunk)
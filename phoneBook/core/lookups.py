@@ -0,0 +1,24 @@
+# core/lookups.py
+
+from django.db.models import CharField, Lookup
+
+
+@CharField.register_lookup
+class AnyLookup(Lookup):
+    """`field__any=[...]` compiles to `field = ANY(%s)` with the list bound as a single array.
+
+    Unlike `__in`, the SQL text does not change with the number of values, so
+    large batches neither bloat the statement nor defeat plan caching.
+    Registered on CharField only, which covers the phone-number columns it
+    serves, so other fields (and other apps' models) do not gain `__any`.
+    """
+    lookup_name = 'any'
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [list(value)]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} = ANY({rhs})", [*lhs_params, *rhs_params]
@@ -0,0 +1,36 @@
+import time
+
+from core.spam import fold_pending_reports
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Fold queued spam reports into SpamStats in batched upserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.SPAM_AGGREGATION['INTERVAL'],
+                            help="Seconds between aggregation passes.")
+        parser.add_argument('--batch-size', type=int, default=settings.SPAM_AGGREGATION['BATCH_SIZE'])
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        batch_size = options['batch_size']
+
+        while True:
+            started = time.monotonic()
+            reports = phones = 0
+            while True:
+                folded_reports, folded_phones = fold_pending_reports(batch_size)
+                reports += folded_reports
+                phones += folded_phones
+                if folded_reports < batch_size:
+                    break
+            if reports:
+                self.stdout.write(f"Folded {reports} reports into {phones} numbers "
+                                  f"in {time.monotonic() - started:.3f}s")
+
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
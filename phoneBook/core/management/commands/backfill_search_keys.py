@@ -0,0 +1,27 @@
+import time
+
+from core.search import BACKFILL_TABLES, backfill_search_keys
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Compute phonetic keys and tsvectors for users and contacts created before the "
+            "search-key triggers existed, in id-ordered batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--table', choices=sorted(BACKFILL_TABLES),
+                            help="Only backfill this table; defaults to all.")
+
+    def handle(self, *args, **options):
+        tables = [options['table']] if options['table'] else list(BACKFILL_TABLES)
+        for table in tables:
+            started = time.monotonic()
+            updated = batches = 0
+            for rows in backfill_search_keys(table, options['batch_size']):
+                updated += rows
+                batches += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{table}: batch {batches}, {rows} rows")
+            self.stdout.write(f"Backfilled {updated} rows of {table} in {batches} batches "
+                              f"in {time.monotonic() - started:.3f}s")
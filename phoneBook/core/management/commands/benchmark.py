@@ -0,0 +1,69 @@
+import json
+
+from core.benchmarks.endpoints import DRIVERS, SCENARIOS, run_benchmark, uncovered_routes
+from core.benchmarks.stats import LATENCY_KEYS, compare
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ("Benchmark every API route through the real request stack against the configured database, "
+            "or compare two benchmark reports. Writes fixture rows prefixed +9180 and should not be run "
+            "against production.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes', help="Comma-separated routes, e.g. 'search/name/,search/phone/'.")
+        parser.add_argument('--interface', choices=sorted(DRIVERS), default='wsgi')
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per route.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per route.")
+        parser.add_argument('--users', type=int, default=500, help="Size of the seeded fixture.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                            help="Compare two reports and fail on regressions.")
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help="Allowed regression in percent for --compare.")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'])
+
+        routes = options['routes'].split(',') if options['routes'] else None
+        unknown = set(routes or []) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"No benchmark scenario for: {', '.join(sorted(unknown))}")
+        for route in uncovered_routes():
+            self.stderr.write(f"Warning: route {route} has no benchmark scenario")
+
+        report = run_benchmark(
+            routes=routes,
+            interface=options['interface'],
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+            users=options['users'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+            self.stdout.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def compare(self, baseline_path, current_path, threshold):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        with open(current_path) as f:
+            current = json.load(f)
+
+        rows, regressions = compare(baseline, current, threshold)
+        self.stdout.write(f"{'route':<24}" + "".join(f"{key:>10}" for key in LATENCY_KEYS) + f"{'rps':>10}{'queries':>10}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['route']:<24}"
+                + "".join(f"{row[key]:>+9.1f}%" for key in LATENCY_KEYS)
+                + f"{row['rps']:>+9.1f}%{row['queries_per_request']:>+10.2f}"
+            )
+        if regressions:
+            raise CommandError("Regressions beyond {:.0f}%:\n  {}".format(threshold, "\n  ".join(regressions)))
+        self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,18 @@
+import json
+
+from core.benchmarks.encoding import run_encoding_benchmark
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark encoding search results with SearchResultSerializer against the row encoder."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100, help="Rows per response body.")
+        parser.add_argument('--pages', type=int, default=200, help="Response bodies per run.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per path; the best is reported.")
+
+    def handle(self, *args, **options):
+        report = run_encoding_benchmark(page_size=options['page_size'], pages=options['pages'],
+                                        repeat=options['repeat'])
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,16 @@
+import json
+
+from core.benchmarks.phones import run_phone_benchmark
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark per-item Validator phone normalization against the batch PhoneNormalizer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200000, help="Numbers per run.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per path; the best is reported.")
+
+    def handle(self, *args, **options):
+        report = run_phone_benchmark(count=options['count'], repeat=options['repeat'])
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,48 @@
+import time
+from pathlib import Path
+
+from core.directory_io import DATASETS, FORMATS, TransferError, import_dataset
+from core.sync import SyncError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+
+class Command(BaseCommand):
+    help = ("Load the files written by export_directory through COPY, users first. Rows that already exist "
+            "are skipped, so an interrupted import can be rerun.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('input_dir', help="Directory holding <dataset>.ndjson or <dataset>.csv files.")
+        parser.add_argument('--datasets', default=','.join(DATASETS),
+                            help=f"Comma-separated subset of: {', '.join(DATASETS)}.")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['datasets'].split(',') if name.strip()]
+        unknown = sorted(set(names) - set(DATASETS))
+        if unknown:
+            raise CommandError(f"Unknown datasets: {', '.join(unknown)}")
+        input_dir = Path(options['input_dir'])
+
+        # Users first: contacts and spam reports refer to them by phone number.
+        for dataset in DATASETS.values():
+            if dataset.name not in names:
+                continue
+            found = [(fmt, input_dir / dataset.filename(fmt)) for fmt in FORMATS
+                     if (input_dir / dataset.filename(fmt)).exists()]
+            if not found:
+                self.stdout.write(f"Skipped {dataset.name}: no {dataset.name}.ndjson or {dataset.name}.csv")
+                continue
+            if len(found) > 1:
+                raise CommandError(f"Both {dataset.name}.ndjson and {dataset.name}.csv exist; remove one.")
+            fmt, path = found[0]
+
+            started = time.monotonic()
+            try:
+                with open(path, 'rb') as stream:
+                    read, inserted = import_dataset(dataset, stream, fmt)
+            except (TransferError, SyncError, DatabaseError) as exc:
+                raise CommandError(f"{path}: {exc}")
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Imported {dataset.name} from {path}: {read} read, {inserted} inserted, "
+                              f"{read - inserted} skipped in {elapsed:.3f}s "
+                              f"({read / elapsed if elapsed else 0:.0f} rows/s)")
@@ -0,0 +1,72 @@
+import time
+
+from core.partitioning import (
+    PARTITION_KEYS,
+    PARTITIONED,
+    PLAIN,
+    copy_to_shadow,
+    create_shadow_table,
+    drop_retired_table,
+    partition_state,
+    partitioning_config,
+    swap_shadow_table
+)
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Hash-partition contacts and spam reports online: mirror writes into a partitioned copy, "
+            "copy existing rows in id-ordered batches, then swap the tables in one short transaction. "
+            "Safe to interrupt and run again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=sorted(PARTITION_KEYS),
+                            help="Only partition this table; defaults to all.")
+        parser.add_argument('--partitions', type=int, default=None,
+                            help="Hash partitions per table; defaults to PARTITIONING['PARTITIONS'].")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per copy transaction; defaults to PARTITIONING['BATCH_SIZE'].")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches to limit load on the primary.")
+        parser.add_argument('--no-swap', action='store_true',
+                            help="Stop after copying; writes keep being mirrored until the next run swaps.")
+        parser.add_argument('--drop-old', action='store_true',
+                            help="Drop the unpartitioned tables left behind by an earlier swap.")
+
+    def handle(self, *args, **options):
+        config = partitioning_config()
+        partitions = options['partitions'] or config['PARTITIONS']
+        batch_size = options['batch_size'] or config['BATCH_SIZE']
+        tables = [options['table']] if options['table'] else list(PARTITION_KEYS)
+        for table in tables:
+            state = partition_state(table)
+            if state == PARTITIONED:
+                if options['drop_old'] and drop_retired_table(table):
+                    self.stdout.write(f"Dropped the unpartitioned copy of {table}")
+                else:
+                    self.stdout.write(f"{table} is already partitioned")
+                continue
+
+            started = time.monotonic()
+            if state == PLAIN:
+                create_shadow_table(table, partitions)
+                self.stdout.write(f"{table}: created {partitions} hash partitions on {PARTITION_KEYS[table]}")
+            copied = batches = 0
+            for rows in copy_to_shadow(table, batch_size):
+                copied += rows
+                batches += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{table}: batch {batches}, {rows} rows")
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            self.stdout.write(f"Copied {copied} rows of {table} in {batches} batches "
+                              f"in {time.monotonic() - started:.3f}s")
+
+            if options['no_swap']:
+                continue
+            started = time.monotonic()
+            swap_shadow_table(table)
+            self.stdout.write(f"Swapped in partitioned {table} in {time.monotonic() - started:.3f}s")
+            if options['drop_old']:
+                drop_retired_table(table)
+                self.stdout.write(f"Dropped the unpartitioned copy of {table}")
@@ -0,0 +1,29 @@
+import time
+
+from core.spam import prune_hourly_counts
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Delete hourly spam report counts older than SPAM_SCORING['RETENTION_HOURS'] in small batches, "
+            "oldest first. Safe to run from cron while serving.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-hours', type=int, default=settings.SPAM_SCORING['RETENTION_HOURS'])
+        parser.add_argument('--batch-size', type=int, default=settings.SPAM_AGGREGATION['BATCH_SIZE'])
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches to limit load on the primary.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        deleted = batches = 0
+        for rows in prune_hourly_counts(options['retention_hours'], options['batch_size']):
+            deleted += rows
+            batches += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Batch {batches}: {rows} rows")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(f"Pruned {deleted} hourly spam counts in {batches} batches "
+                          f"in {time.monotonic() - started:.3f}s")
@@ -0,0 +1,32 @@
+import time
+
+from core.authentication import PURGE_TABLES, auth_tokens_config, purge_expired_tokens
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Delete expired auth tokens and expired signed-token revocations in small batches, oldest first. "
+            "Safe to run from cron while serving.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per transaction; defaults to AUTH_TOKENS['PURGE_BATCH_SIZE'].")
+        parser.add_argument('--grace', type=int, default=0,
+                            help="Keep rows that expired less than this many seconds ago.")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches to limit load on the primary.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or auth_tokens_config()['PURGE_BATCH_SIZE']
+        for table in PURGE_TABLES:
+            started = time.monotonic()
+            deleted = batches = 0
+            for rows in purge_expired_tokens(table, batch_size, options['grace']):
+                deleted += rows
+                batches += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{table}: batch {batches}, {rows} rows")
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            self.stdout.write(f"Purged {deleted} expired rows of {table} in {batches} batches "
+                              f"in {time.monotonic() - started:.3f}s")
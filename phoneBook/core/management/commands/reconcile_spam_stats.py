@@ -0,0 +1,10 @@
+from core.spam import reconcile_spam_stats
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Rebuild SpamStats and hourly spam counts from SpamReport and clear the pending queue."
+
+    def handle(self, *args, **options):
+        upserted, removed = reconcile_spam_stats()
+        self.stdout.write(f"Reconciled spam stats: {upserted} numbers corrected, {removed} removed")
@@ -0,0 +1,69 @@
+import os
+import time
+
+from core.models import User
+from core.seeding import DEFAULT_SHARD_SIZE, SeedPlan, bulk_load, seed_directory, seeded_phone
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+SEEDED_TABLES = ('core_user', 'core_contact', 'core_spamreport')
+
+
+class Command(BaseCommand):
+    help = ("Load a deterministic synthetic directory of users, contacts and spam reports with COPY, "
+            "in parallel. Meant for a database that is not serving; every user shares one password.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--contacts-per-user', type=float, default=50,
+                            help="Average address book size; sizes are log-normally distributed.")
+        parser.add_argument('--reports-per-user', type=float, default=0.5,
+                            help="Average spam reports filed per user.")
+        parser.add_argument('--seed', type=int, default=0, help="Same seed, same data.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Loader processes; 1 loads in this process.")
+        parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                            help="Users generated and committed per unit of work.")
+        parser.add_argument('--password', default='password', help="Password of every seeded user.")
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0 or options['shard_size'] <= 0:
+            raise CommandError("--users and --shard-size must be positive.")
+        if User.objects.filter(phone_number=seeded_phone(options['seed'], 0)).exists():
+            raise CommandError(f"Seed {options['seed']} is already loaded; use another database.")
+
+        plan = SeedPlan(
+            seed=options['seed'],
+            users=options['users'],
+            contacts_per_user=options['contacts_per_user'],
+            reports_per_user=options['reports_per_user'],
+            # Hashing is deliberately slow; one hash serves every user.
+            password=make_password(options['password']),
+            anchor=timezone.now(),
+            shard_size=options['shard_size'],
+        )
+        totals = {table: [0, 0.0] for table in SEEDED_TABLES}
+        started = time.monotonic()
+        with bulk_load():
+            for done, (shard, loaded) in enumerate(seed_directory(plan, options['workers']), start=1):
+                for table, (rows, seconds) in loaded.items():
+                    totals[table][0] += rows
+                    totals[table][1] += seconds
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"Shard {shard} ({done}/{plan.shards}): " + ", ".join(
+                        f"{rows} {table}" for table, (rows, _) in loaded.items()))
+            loaded_at = time.monotonic()
+        rebuilt = time.monotonic() - loaded_at
+        elapsed = time.monotonic() - started
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {', '.join(SEEDED_TABLES)}, core_spamstats, core_phonedirectory")
+
+        self.stdout.write(f"Rebuilt spam stats, the phone directory and versions in {rebuilt:.3f}s")
+        for table, (rows, seconds) in totals.items():
+            self.stdout.write(f"{table}: {rows} rows, {rows / seconds if seconds else 0:.0f} rows/s per worker")
+        rows = sum(rows for rows, _ in totals.values())
+        self.stdout.write(f"Seeded {rows} rows in {plan.shards} shards with {options['workers']} workers "
+                          f"in {elapsed:.3f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
@@ -0,0 +1,17 @@
+from core.spam import DEFERRED, IMMEDIATE, get_aggregation_mode, set_aggregation_mode
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Show or switch how spam reports are folded into SpamStats."
+
+    def add_arguments(self, parser):
+        parser.add_argument('mode', nargs='?', choices=[IMMEDIATE, DEFERRED],
+                            help="'immediate' updates SpamStats per report via trigger; "
+                                 "'deferred' queues reports for the aggregate_spam command.")
+
+    def handle(self, *args, **options):
+        mode = options['mode']
+        if mode:
+            set_aggregation_mode(mode)
+        self.stdout.write(f"Spam aggregation mode: {get_aggregation_mode()}")
@@ -0,0 +1,252 @@
+# core/metrics.py
+
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Who may read /metrics: nobody unless PUBLIC, a scraper presenting TOKEN as
+# a bearer token, or a client whose address is in ALLOWED_IPS.
+DEFAULT_METRICS = {
+    'PUBLIC': False,
+    'TOKEN': None,
+    'ALLOWED_IPS': [],
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+# -------------------- Accumulators --------------------
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+
+class ViewStats:
+    __slots__ = ('latency', 'queries', 'db_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.queries.merge(other.queries)
+        self.db_seconds += other.db_seconds
+        self.response_bytes += other.response_bytes
+        for status, n in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + n
+
+
+class MetricsRegistry:
+    """Per-process request metrics.
+
+    Each thread writes only to its own shard, so recording a request takes no
+    lock; a scrape merges the shards. Reads may be off by the requests still in
+    flight, which is fine for monitoring. Shards of threads that have exited
+    are folded into one retired shard whenever a thread creates its shard or
+    a scrape runs, so thread-per-request servers do not accumulate them.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []  # (thread, shard)
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._collectors = []
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._prune()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _prune(self):
+        # A thread that has exited no longer writes its shard, so merging it is safe. Caller holds the lock.
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge_shard(self._retired, shard)
+        self._shards = live
+
+    def observe(self, view, status, duration, queries, db_seconds, response_bytes):
+        shard = self._shard()
+        stats = shard.get(view)
+        if stats is None:
+            stats = shard[view] = ViewStats()
+        stats.latency.observe(duration)
+        stats.queries.observe(queries)
+        stats.db_seconds += db_seconds
+        stats.response_bytes += response_bytes
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def snapshot(self):
+        merged = {}
+        with self._lock:
+            self._prune()
+            _merge_shard(merged, self._retired)
+            for _, shard in self._shards:
+                _merge_shard(merged, shard)
+        return merged
+
+    def register_collector(self, collector):
+        """`collector()` returns an iterable of (name, type, help, [(labels, value), ...])."""
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._retired.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+    def render(self):
+        lines = []
+        snapshot = self.snapshot()
+        views = sorted(snapshot)
+
+        _histogram(lines, 'phonebook_request_duration_seconds', "Request latency by view.",
+                   [(view, snapshot[view].latency) for view in views])
+        _histogram(lines, 'phonebook_db_queries_per_request', "Database queries per request by view.",
+                   [(view, snapshot[view].queries) for view in views])
+        _family(lines, 'phonebook_db_queries_total', 'counter', "Database queries by view.",
+                [({'view': view}, snapshot[view].queries.sum) for view in views])
+        _family(lines, 'phonebook_db_duration_seconds_total', 'counter', "Time spent in database calls by view.",
+                [({'view': view}, snapshot[view].db_seconds) for view in views])
+        _family(lines, 'phonebook_response_bytes_total', 'counter', "Response body bytes by view.",
+                [({'view': view}, snapshot[view].response_bytes) for view in views])
+        _family(lines, 'phonebook_responses_total', 'counter', "Responses by view and status code.",
+                [({'view': view, 'status': str(status)}, n)
+                 for view in views for status, n in sorted(snapshot[view].statuses.items())])
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                _family(lines, name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+
+def _merge_shard(into, shard):
+    for view, stats in list(shard.items()):
+        into.setdefault(view, ViewStats()).merge(stats)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _family(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+def _histogram(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for view, histogram in series:
+        cumulative = 0
+        for bound, n in zip(histogram.bounds, histogram.counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels({'view': view, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_bucket{_labels({'view': view, 'le': '+Inf'})} {histogram.count}")
+        lines.append(f"{name}_sum{_labels({'view': view})} {histogram.sum}")
+        lines.append(f"{name}_count{_labels({'view': view})} {histogram.count}")
+
+
+registry = MetricsRegistry()
+
+
+# -------------------- Database Timing --------------------
+_current_timer = ContextVar('phonebook_query_timer', default=None)
+
+
+class QueryTimer:
+    """Counts queries and their wall time for the code run inside `with QueryTimer():`.
+
+    The active timer lives in a context variable, so queries the async ORM runs
+    in sync_to_async worker threads are attributed to the request that issued
+    them. Timers nest; an outer timer also sees its inner timers' queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.parent = None
+        self._token = None
+
+    def __enter__(self):
+        self.parent = _current_timer.get()
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_timer.reset(self._token)
+
+
+def record_query(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        while timer is not None:
+            timer.count += 1
+            timer.seconds += elapsed
+            timer = timer.parent
+
+
+def install_query_recorder(connection):
+    """Attach record_query to a database connection; safe to call on every reconnect."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# -------------------- Access --------------------
+def metrics_config():
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+def may_read_metrics(request):
+    config = metrics_config()
+    if config['PUBLIC'] or request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS']:
+        return True
+    auth = request.headers.get('Authorization', '')
+    return bool(config['TOKEN']) and auth.startswith('Bearer ') and hmac.compare_digest(auth[7:], config['TOKEN'])
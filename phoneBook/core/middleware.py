@@ -0,0 +1,140 @@
+# core/middleware.py
+
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from core.admission import admission_config, get_admission_controller
+from core.metrics import QueryTimer, registry
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+
+class RequestMetricsMiddleware:
+    """Records latency, DB queries, DB time, response size and status per view into core.metrics.
+
+    Supports both sync and async stacks so async views are not forced through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with QueryTimer() as timer:
+            response = self.get_response(request)
+        self.record(request, response, timer, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with QueryTimer() as timer:
+            response = await self.get_response(request)
+        self.record(request, response, timer, started)
+        return response
+
+    def record(self, request, response, timer, started):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = getattr(match.func, 'view_class', match.func).__name__ if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(view, response.status_code, duration, timer.count, timer.seconds, size)
+
+
+class AdmissionControlMiddleware:
+    """Sheds load per endpoint class (see core.admission) before the view runs.
+
+    A request first spends a token from its bearer token's bucket (429 when
+    empty), then waits at most QUEUE_TIMEOUT for one of the class's slots (503
+    when the queue is full or the wait runs out). Both carry Retry-After, so a
+    burst of expensive searches is refused in microseconds instead of holding
+    database connections that logins and profile reads need. Limits are per
+    process.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not admission_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        endpoint, response = self.admit(request)
+        if response is not None:
+            return response
+        if endpoint.gate.acquire() is not None:
+            return self.busy(endpoint)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            endpoint.gate.release()
+            raise
+        return self.hold_until_sent(response, endpoint)
+
+    async def __acall__(self, request):
+        endpoint, response = self.admit(request)
+        if response is not None:
+            return response
+        if await endpoint.gate.aacquire() is not None:
+            return self.busy(endpoint)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            endpoint.gate.release()
+            raise
+        return self.hold_until_sent(response, endpoint)
+
+    @staticmethod
+    def hold_until_sent(response, endpoint):
+        """Release the slot now, or for a streaming response once its body is sent.
+
+        A StreamingHttpResponse (contacts/export/) does its work while the
+        server iterates the body, after the view has returned; the server
+        calls close() when it is done or the client goes away.
+        """
+        if response.streaming:
+            response._resource_closers.append(endpoint.gate.release)
+        else:
+            endpoint.gate.release()
+        return response
+
+    def admit(self, request):
+        """(endpoint class, None) to go on queueing, or (class, 429 response)."""
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            match = None
+        # Also lets RequestMetricsMiddleware attribute shed responses to their view.
+        request.resolver_match = match
+        view = getattr(match.func, 'view_class', match.func).__name__ if match else ''
+        endpoint = get_admission_controller().for_view(view)
+
+        auth = request.headers.get('Authorization', '')
+        wait = endpoint.rate_limit(auth[7:] if auth.startswith('Bearer ') else None)
+        if wait:
+            return endpoint, self.refuse(status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait)
+        return endpoint, None
+
+    def busy(self, endpoint):
+        return self.refuse(status.HTTP_503_SERVICE_UNAVAILABLE, "Server busy, retry later", endpoint.gate.timeout)
+
+    @staticmethod
+    def refuse(status_code, message, retry_after):
+        response = JsonResponse({"error": message}, status=status_code)
+        response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        # Counted in phonebook_admission_shed_total; a log line per refusal would add I/O under overload.
+        response._has_been_logged = True
+        return response
@@ -0,0 +1,152 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:14
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_user_created_at_alter_authtoken_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneDirectory',
+            fields=[
+                ('phone_number', models.CharField(max_length=15, primary_key=True, serialize=False)),
+                ('spam_report_count', models.IntegerField(default=0)),
+                ('contact_names', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, default=list, size=None)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='directory_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION refresh_phone_directory(p_phone varchar, p_names boolean)
+                RETURNS void AS $$
+                DECLARE
+                    v_user_id bigint;
+                    v_spam integer;
+                    v_names varchar[];
+                BEGIN
+                    SELECT id INTO v_user_id FROM core_user WHERE phone_number = p_phone;
+                    SELECT report_count INTO v_spam FROM core_spamstats WHERE target_phone = p_phone;
+
+                    IF NOT p_names THEN
+                        SELECT contact_names INTO v_names FROM core_phonedirectory WHERE phone_number = p_phone;
+                    END IF;
+                    IF p_names OR v_names IS NULL THEN
+                        SELECT COALESCE(array_agg(contact_name ORDER BY n DESC, contact_name), '{}')
+                        INTO v_names
+                        FROM (
+                            SELECT contact_name, count(*) AS n
+                            FROM core_contact
+                            WHERE contact_phone = p_phone
+                            GROUP BY contact_name
+                            ORDER BY n DESC, contact_name
+                            LIMIT 10
+                        ) top_names;
+                    END IF;
+
+                    IF v_user_id IS NULL AND COALESCE(v_spam, 0) = 0 AND cardinality(v_names) = 0 THEN
+                        DELETE FROM core_phonedirectory WHERE phone_number = p_phone;
+                    ELSE
+                        INSERT INTO core_phonedirectory (phone_number, user_id, spam_report_count, contact_names)
+                        VALUES (p_phone, v_user_id, COALESCE(v_spam, 0), v_names)
+                        ON CONFLICT (phone_number)
+                        DO UPDATE SET
+                            user_id = EXCLUDED.user_id,
+                            spam_report_count = EXCLUDED.spam_report_count,
+                            contact_names = EXCLUDED.contact_names;
+                    END IF;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_directory_user_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP <> 'INSERT' THEN
+                        PERFORM refresh_phone_directory(OLD.phone_number, false);
+                    END IF;
+                    IF TG_OP <> 'DELETE' THEN
+                        PERFORM refresh_phone_directory(NEW.phone_number, false);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_directory_spam_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        PERFORM refresh_phone_directory(OLD.target_phone, false);
+                    ELSE
+                        PERFORM refresh_phone_directory(NEW.target_phone, false);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_directory_contact_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP <> 'INSERT' THEN
+                        PERFORM refresh_phone_directory(OLD.contact_phone, true);
+                    END IF;
+                    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.contact_phone <> OLD.contact_phone) THEN
+                        PERFORM refresh_phone_directory(NEW.contact_phone, true);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER trigger_phone_directory_user
+                AFTER INSERT OR DELETE OR UPDATE OF phone_number ON core_user
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_directory_user_changed();
+
+                CREATE TRIGGER trigger_phone_directory_spam
+                AFTER INSERT OR UPDATE OR DELETE ON core_spamstats
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_directory_spam_changed();
+
+                CREATE TRIGGER trigger_phone_directory_contact
+                AFTER INSERT OR DELETE OR UPDATE OF contact_phone, contact_name ON core_contact
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_directory_contact_changed();
+
+                INSERT INTO core_phonedirectory (phone_number, user_id, spam_report_count, contact_names)
+                SELECT phones.phone_number, u.id, COALESCE(s.report_count, 0), COALESCE(n.names, '{}')
+                FROM (
+                    SELECT phone_number FROM core_user
+                    UNION SELECT target_phone FROM core_spamstats
+                    UNION SELECT contact_phone FROM core_contact
+                ) phones
+                LEFT JOIN core_user u ON u.phone_number = phones.phone_number
+                LEFT JOIN core_spamstats s ON s.target_phone = phones.phone_number
+                LEFT JOIN LATERAL (
+                    SELECT array_agg(contact_name ORDER BY cnt DESC, contact_name) AS names
+                    FROM (
+                        SELECT contact_name, count(*) AS cnt
+                        FROM core_contact c
+                        WHERE c.contact_phone = phones.phone_number
+                        GROUP BY contact_name
+                        ORDER BY cnt DESC, contact_name
+                        LIMIT 10
+                    ) top_names
+                ) n ON true
+                WHERE u.id IS NOT NULL OR COALESCE(s.report_count, 0) > 0 OR n.names IS NOT NULL;
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS trigger_phone_directory_contact ON core_contact;
+                DROP TRIGGER IF EXISTS trigger_phone_directory_spam ON core_spamstats;
+                DROP TRIGGER IF EXISTS trigger_phone_directory_user ON core_user;
+                DROP FUNCTION IF EXISTS phone_directory_contact_changed;
+                DROP FUNCTION IF EXISTS phone_directory_spam_changed;
+                DROP FUNCTION IF EXISTS phone_directory_user_changed;
+                DROP FUNCTION IF EXISTS refresh_phone_directory;
+            """
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_phone_directory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSpamReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_phone', models.CharField(max_length=15)),
+                ('reported_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION queue_spam_report()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    INSERT INTO core_pendingspamreport (target_phone, reported_at)
+                    VALUES (NEW.target_phone, NEW.reported_at);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER trigger_queue_spam_report
+                AFTER INSERT ON core_spamreport
+                FOR EACH ROW
+                EXECUTE PROCEDURE queue_spam_report();
+
+                -- Immediate aggregation (trigger_update_spam_stats) stays the default;
+                -- `manage.py spam_aggregation_mode deferred` swaps the two triggers.
+                ALTER TABLE core_spamreport DISABLE TRIGGER trigger_queue_spam_report;
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS trigger_queue_spam_report ON core_spamreport;
+                DROP FUNCTION IF EXISTS queue_spam_report;
+                ALTER TABLE core_spamreport ENABLE TRIGGER trigger_update_spam_stats;
+            """
+        ),
+    ]
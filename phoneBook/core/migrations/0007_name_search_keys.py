@@ -0,0 +1,122 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:39
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_deferred_spam_aggregation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='contact_name_keys',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), blank=True, editable=False, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='contact_name_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='name_keys',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), blank=True, editable=False, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='name_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['contact_name_keys'], name='idx_contact_name_keys'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['contact_name_vector'], name='idx_contact_name_vector'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_keys'], name='idx_user_name_keys'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_vector'], name='idx_user_name_vector'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                -- One phonetic code per word: aspirated digraphs and doubled
+                -- letters collapse and vowels after the first letter drop, so
+                -- "Vickram"/"Vikram" and "Dhivya"/"Divya" share a code.
+                CREATE OR REPLACE FUNCTION phonetic_key(p_word text)
+                RETURNS text AS $$
+                    SELECT regexp_replace(
+                        left(s, 1) || regexp_replace(substr(s, 2), '[aeiou]', '', 'g'),
+                        '(.)\\1+', '\\1', 'g'
+                    )
+                    FROM (
+                        SELECT regexp_replace(
+                            translate(
+                                replace(replace(regexp_replace(p_word, '([bcdgjkpst])h', '\\1', 'g'), 'ck', 'k'), 'x', 'ks'),
+                                'cqzwy', 'kkjvi'
+                            ),
+                            '(.)\\1+', '\\1', 'g'
+                        ) AS s
+                    ) t
+                $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+                CREATE OR REPLACE FUNCTION phonetic_keys(p_name text)
+                RETURNS varchar[] AS $$
+                    SELECT coalesce(array_agg(DISTINCT k ORDER BY k), '{}')
+                    FROM (
+                        SELECT phonetic_key(w) AS k
+                        FROM regexp_split_to_table(lower(p_name), '[^a-z]+') AS w
+                        WHERE w <> ''
+                    ) s
+                $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+                CREATE OR REPLACE FUNCTION user_name_search_keys()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.name_keys := phonetic_keys(NEW.name);
+                    NEW.name_vector := to_tsvector('simple', NEW.name);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION contact_name_search_keys()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.contact_name_keys := phonetic_keys(NEW.contact_name);
+                    NEW.contact_name_vector := to_tsvector('simple', NEW.contact_name);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER trigger_user_name_search_keys
+                BEFORE INSERT OR UPDATE OF name ON core_user
+                FOR EACH ROW EXECUTE FUNCTION user_name_search_keys();
+
+                CREATE TRIGGER trigger_contact_name_search_keys
+                BEFORE INSERT OR UPDATE OF contact_name ON core_contact
+                FOR EACH ROW EXECUTE FUNCTION contact_name_search_keys();
+
+                -- Existing rows keep NULL keys until `manage.py backfill_search_keys` runs,
+                -- so this migration does not rewrite either table under lock.
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS trigger_contact_name_search_keys ON core_contact;
+                DROP TRIGGER IF EXISTS trigger_user_name_search_keys ON core_user;
+                DROP FUNCTION IF EXISTS contact_name_search_keys();
+                DROP FUNCTION IF EXISTS user_name_search_keys();
+                DROP FUNCTION IF EXISTS phonetic_keys(text);
+                DROP FUNCTION IF EXISTS phonetic_key(text);
+            """,
+        ),
+    ]
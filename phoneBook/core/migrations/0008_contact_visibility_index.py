@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_name_search_keys'),
+    ]
+
+    # The composite index serves every lookup the single-column one did, so it
+    # replaces it; it is created first so contact_phone lookups stay indexed.
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['contact_phone', 'user'], name='idx_contact_phone_user'),
+        ),
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='core_contac_contact_abdc72_idx',
+        ),
+    ]
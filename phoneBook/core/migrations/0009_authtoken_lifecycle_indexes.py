@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_contact_visibility_index'),
+    ]
+
+    # The composite index replaces both single-column user indexes; it is built
+    # before they are dropped so token lookups by user stay indexed.
+    operations = [
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['user', '-expires_at'], name='idx_authtoken_user_expiry'),
+        ),
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['expires_at'], name='idx_authtoken_expires_at'),
+        ),
+        migrations.RemoveIndex(
+            model_name='authtoken',
+            name='core_authto_user_id_0bbce6_idx',
+        ),
+        migrations.AlterField(
+            model_name='authtoken',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_revoked_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneVersion',
+            fields=[
+                ('phone_number', models.CharField(max_length=15, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-version'], name='idx_phoneversion_version')],
+            },
+        ),
+        # Constraint triggers are deferred to commit, so versions are drawn in
+        # (nearly) commit order and a reader that sees the highest version has
+        # seen every change before it.
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE core_phoneversion_seq;
+
+                CREATE OR REPLACE FUNCTION bump_phone_version(p_phone varchar)
+                RETURNS void AS $$
+                BEGIN
+                    INSERT INTO core_phoneversion (phone_number, version, updated_at)
+                    VALUES (p_phone, nextval('core_phoneversion_seq'), clock_timestamp())
+                    ON CONFLICT (phone_number)
+                    DO UPDATE SET
+                        version = EXCLUDED.version,
+                        updated_at = EXCLUDED.updated_at;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_version_user_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP = 'UPDATE'
+                       AND NEW.phone_number = OLD.phone_number
+                       AND NEW.name = OLD.name
+                       AND NEW.email IS NOT DISTINCT FROM OLD.email THEN
+                        RETURN NULL;
+                    END IF;
+                    IF TG_OP <> 'INSERT' THEN
+                        PERFORM bump_phone_version(OLD.phone_number);
+                    END IF;
+                    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.phone_number <> OLD.phone_number) THEN
+                        PERFORM bump_phone_version(NEW.phone_number);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_version_spam_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        PERFORM bump_phone_version(OLD.target_phone);
+                    ELSE
+                        PERFORM bump_phone_version(NEW.target_phone);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_version_contact_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP = 'UPDATE'
+                       AND NEW.contact_phone = OLD.contact_phone
+                       AND NEW.contact_name = OLD.contact_name THEN
+                        RETURN NULL;
+                    END IF;
+                    IF TG_OP <> 'INSERT' THEN
+                        PERFORM bump_phone_version(OLD.contact_phone);
+                    END IF;
+                    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.contact_phone <> OLD.contact_phone) THEN
+                        PERFORM bump_phone_version(NEW.contact_phone);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE CONSTRAINT TRIGGER trigger_phone_version_user
+                AFTER INSERT OR DELETE OR UPDATE OF phone_number, name, email ON core_user
+                DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_version_user_changed();
+
+                CREATE CONSTRAINT TRIGGER trigger_phone_version_spam
+                AFTER INSERT OR UPDATE OR DELETE ON core_spamstats
+                DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_version_spam_changed();
+
+                CREATE CONSTRAINT TRIGGER trigger_phone_version_contact
+                AFTER INSERT OR DELETE OR UPDATE OF contact_phone, contact_name ON core_contact
+                DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_version_contact_changed();
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS trigger_phone_version_contact ON core_contact;
+                DROP TRIGGER IF EXISTS trigger_phone_version_spam ON core_spamstats;
+                DROP TRIGGER IF EXISTS trigger_phone_version_user ON core_user;
+                DROP FUNCTION IF EXISTS phone_version_contact_changed;
+                DROP FUNCTION IF EXISTS phone_version_spam_changed;
+                DROP FUNCTION IF EXISTS phone_version_user_changed;
+                DROP FUNCTION IF EXISTS bump_phone_version;
+                DROP SEQUENCE IF EXISTS core_phoneversion_seq;
+            """
+        ),
+    ]
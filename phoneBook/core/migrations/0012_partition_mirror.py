@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_phone_versions'),
+    ]
+
+    # Used by core.partitioning while a table is copied into its hash-partitioned
+    # replacement: replays each row change on the shadow table named by the
+    # first argument, whose partition key column is the second.
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION partition_mirror()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP <> 'INSERT' THEN
+                        EXECUTE format('DELETE FROM %I WHERE id = ($1).id AND %I = ($1).%I',
+                                       TG_ARGV[0], TG_ARGV[1], TG_ARGV[1])
+                        USING OLD;
+                    END IF;
+                    IF TG_OP <> 'DELETE' THEN
+                        EXECUTE format('INSERT INTO %I SELECT ($1).* ON CONFLICT DO NOTHING', TG_ARGV[0])
+                        USING NEW;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """,
+            reverse_sql="DROP FUNCTION IF EXISTS partition_mirror;"
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:42
+
+from core.spam import REBUILD_HOURLY_SQL, RECONCILE_SQL
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_partition_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamHourlyCount',
+            fields=[
+                ('pk', models.CompositePrimaryKey('target_phone', 'hour', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('target_phone', models.CharField(max_length=15)),
+                ('hour', models.DateTimeField()),
+                ('report_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='spamstats',
+            name='score_key',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='spamstats',
+            index=models.Index(fields=['-score_key'], name='idx_spamstats_score_key'),
+        ),
+        migrations.AddIndex(
+            model_name='spamhourlycount',
+            index=models.Index(fields=['hour'], name='idx_spamhourlycount_hour'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                -- Forward decay: a report made at t weighs 2^((t - epoch) / half-life), and
+                -- a number's score_key is the natural log of the sum of its weights. The
+                -- key only grows, so ordering by it is ordering by the current score
+                -- exp(score_key - spam_decay_exponent(now())) without ever rewriting old
+                -- rows; keeping the log means the weights never overflow. The half-life
+                -- is 24 hours.
+                CREATE OR REPLACE FUNCTION spam_decay_exponent(ts timestamptz)
+                RETURNS float8 AS $$
+                    SELECT EXTRACT(EPOCH FROM ts - timestamptz '2026-01-01 00:00:00+00')::float8
+                           / 86400 * ln(2::float8);
+                $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+                -- ln(e^a + e^b); NULL stands for "no reports yet".
+                CREATE OR REPLACE FUNCTION spam_log_add(a float8, b float8)
+                RETURNS float8 AS $$
+                    SELECT CASE
+                        WHEN a IS NULL THEN b
+                        WHEN b IS NULL THEN a
+                        ELSE GREATEST(a, b) + ln(1 + exp(-abs(a - b)))
+                    END;
+                $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+                CREATE AGGREGATE spam_log_sum(float8) (SFUNC = spam_log_add, STYPE = float8);
+
+                CREATE OR REPLACE FUNCTION update_spam_stats()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    INSERT INTO core_spamstats (target_phone, report_count, last_reported_at, score_key)
+                    VALUES (NEW.target_phone, 1, NEW.reported_at, spam_decay_exponent(NEW.reported_at))
+                    ON CONFLICT (target_phone)
+                    DO UPDATE SET
+                        report_count = core_spamstats.report_count + 1,
+                        -- As in the deferred fold, so reconcile_spam_stats agrees with both modes.
+                        last_reported_at = GREATEST(core_spamstats.last_reported_at, NEW.reported_at),
+                        score_key = spam_log_add(core_spamstats.score_key, EXCLUDED.score_key);
+
+                    INSERT INTO core_spamhourlycount (target_phone, hour, report_count)
+                    VALUES (NEW.target_phone, date_trunc('hour', NEW.reported_at, 'UTC'), 1)
+                    ON CONFLICT (target_phone, hour)
+                    DO UPDATE SET report_count = core_spamhourlycount.report_count + 1;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """,
+            reverse_sql="""
+                CREATE OR REPLACE FUNCTION update_spam_stats()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    INSERT INTO core_spamstats (target_phone, report_count, last_reported_at)
+                    VALUES (NEW.target_phone, 1, NOW())
+                    ON CONFLICT (target_phone)
+                    DO UPDATE SET
+                        report_count = core_spamstats.report_count + 1,
+                        last_reported_at = NOW();
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP AGGREGATE IF EXISTS spam_log_sum(float8);
+                DROP FUNCTION IF EXISTS spam_log_add;
+                DROP FUNCTION IF EXISTS spam_decay_exponent;
+            """
+        ),
+        # Score and bucket the reports made before this migration, as
+        # reconcile_spam_stats does; otherwise those numbers are missing from
+        # spam/top/ and the next report on one starts its score_key afresh.
+        # Queued reports are counted here, so the queue is emptied first.
+        migrations.RunSQL(
+            sql=[
+                "DELETE FROM core_pendingspamreport",
+                RECONCILE_SQL,
+                (REBUILD_HOURLY_SQL, [settings.SPAM_SCORING['RETENTION_HOURS']]),
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,186 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_spam_scoring'),
+    ]
+
+    operations = [
+        # refresh_phone_directory used to read the current contact_names, rebuild
+        # and upsert them without a lock, so of two transactions adding contacts
+        # for one number the later commit dropped the earlier one's names. It now
+        # locks the directory row first (creating it if needed) and reads after
+        # the lock is granted, which under READ COMMITTED sees every write that
+        # committed while it waited.
+        #
+        # The contact trigger fired per row, re-aggregating the top names once
+        # per inserted contact. It is replaced by statement-level triggers over
+        # the transition tables, which refresh each distinct number once per
+        # statement, in phone order so concurrent statements lock rows in the
+        # same order. Transition tables rule out a multi-event trigger or an
+        # UPDATE OF column list, hence three triggers and the explicit change check.
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION refresh_phone_directory(p_phone varchar, p_names boolean)
+                RETURNS void AS $$
+                DECLARE
+                    v_created boolean;
+                    v_user_id bigint;
+                    v_spam integer;
+                    v_names varchar[];
+                BEGIN
+                    INSERT INTO core_phonedirectory (phone_number, user_id, spam_report_count, contact_names)
+                    VALUES (p_phone, NULL, 0, '{}')
+                    ON CONFLICT (phone_number) DO NOTHING;
+                    v_created := FOUND;
+                    SELECT contact_names INTO v_names
+                    FROM core_phonedirectory WHERE phone_number = p_phone
+                    FOR UPDATE;
+
+                    SELECT id INTO v_user_id FROM core_user WHERE phone_number = p_phone;
+                    SELECT report_count INTO v_spam FROM core_spamstats WHERE target_phone = p_phone;
+                    IF p_names OR v_created THEN
+                        SELECT COALESCE(array_agg(contact_name ORDER BY n DESC, contact_name), '{}')
+                        INTO v_names
+                        FROM (
+                            SELECT contact_name, count(*) AS n
+                            FROM core_contact
+                            WHERE contact_phone = p_phone
+                            GROUP BY contact_name
+                            ORDER BY n DESC, contact_name
+                            LIMIT 10
+                        ) top_names;
+                    END IF;
+
+                    IF v_user_id IS NULL AND COALESCE(v_spam, 0) = 0 AND cardinality(v_names) = 0 THEN
+                        DELETE FROM core_phonedirectory WHERE phone_number = p_phone;
+                    ELSE
+                        UPDATE core_phonedirectory
+                        SET user_id = v_user_id,
+                            spam_report_count = COALESCE(v_spam, 0),
+                            contact_names = v_names
+                        WHERE phone_number = p_phone;
+                    END IF;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION phone_directory_contacts_changed()
+                RETURNS TRIGGER AS $$
+                DECLARE
+                    v_phone varchar;
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        FOR v_phone IN SELECT DISTINCT contact_phone FROM new_contacts ORDER BY 1 LOOP
+                            PERFORM refresh_phone_directory(v_phone, true);
+                        END LOOP;
+                    ELSIF TG_OP = 'DELETE' THEN
+                        FOR v_phone IN SELECT DISTINCT contact_phone FROM old_contacts ORDER BY 1 LOOP
+                            PERFORM refresh_phone_directory(v_phone, true);
+                        END LOOP;
+                    ELSE
+                        FOR v_phone IN
+                            SELECT o.contact_phone
+                            FROM old_contacts o JOIN new_contacts n ON n.id = o.id
+                            WHERE o.contact_phone <> n.contact_phone OR o.contact_name <> n.contact_name
+                            UNION
+                            SELECT n.contact_phone
+                            FROM old_contacts o JOIN new_contacts n ON n.id = o.id
+                            WHERE o.contact_phone <> n.contact_phone OR o.contact_name <> n.contact_name
+                            ORDER BY 1
+                        LOOP
+                            PERFORM refresh_phone_directory(v_phone, true);
+                        END LOOP;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS trigger_phone_directory_contact ON core_contact;
+                DROP FUNCTION IF EXISTS phone_directory_contact_changed;
+
+                CREATE TRIGGER trigger_phone_directory_contact_insert
+                AFTER INSERT ON core_contact
+                REFERENCING NEW TABLE AS new_contacts
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE phone_directory_contacts_changed();
+
+                CREATE TRIGGER trigger_phone_directory_contact_update
+                AFTER UPDATE ON core_contact
+                REFERENCING OLD TABLE AS old_contacts NEW TABLE AS new_contacts
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE phone_directory_contacts_changed();
+
+                CREATE TRIGGER trigger_phone_directory_contact_delete
+                AFTER DELETE ON core_contact
+                REFERENCING OLD TABLE AS old_contacts
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE phone_directory_contacts_changed();
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS trigger_phone_directory_contact_delete ON core_contact;
+                DROP TRIGGER IF EXISTS trigger_phone_directory_contact_update ON core_contact;
+                DROP TRIGGER IF EXISTS trigger_phone_directory_contact_insert ON core_contact;
+                DROP FUNCTION IF EXISTS phone_directory_contacts_changed;
+
+                CREATE OR REPLACE FUNCTION phone_directory_contact_changed()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP <> 'INSERT' THEN
+                        PERFORM refresh_phone_directory(OLD.contact_phone, true);
+                    END IF;
+                    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.contact_phone <> OLD.contact_phone) THEN
+                        PERFORM refresh_phone_directory(NEW.contact_phone, true);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER trigger_phone_directory_contact
+                AFTER INSERT OR DELETE OR UPDATE OF contact_phone, contact_name ON core_contact
+                FOR EACH ROW
+                EXECUTE PROCEDURE phone_directory_contact_changed();
+
+                CREATE OR REPLACE FUNCTION refresh_phone_directory(p_phone varchar, p_names boolean)
+                RETURNS void AS $$
+                DECLARE
+                    v_user_id bigint;
+                    v_spam integer;
+                    v_names varchar[];
+                BEGIN
+                    SELECT id INTO v_user_id FROM core_user WHERE phone_number = p_phone;
+                    SELECT report_count INTO v_spam FROM core_spamstats WHERE target_phone = p_phone;
+
+                    IF NOT p_names THEN
+                        SELECT contact_names INTO v_names FROM core_phonedirectory WHERE phone_number = p_phone;
+                    END IF;
+                    IF p_names OR v_names IS NULL THEN
+                        SELECT COALESCE(array_agg(contact_name ORDER BY n DESC, contact_name), '{}')
+                        INTO v_names
+                        FROM (
+                            SELECT contact_name, count(*) AS n
+                            FROM core_contact
+                            WHERE contact_phone = p_phone
+                            GROUP BY contact_name
+                            ORDER BY n DESC, contact_name
+                            LIMIT 10
+                        ) top_names;
+                    END IF;
+
+                    IF v_user_id IS NULL AND COALESCE(v_spam, 0) = 0 AND cardinality(v_names) = 0 THEN
+                        DELETE FROM core_phonedirectory WHERE phone_number = p_phone;
+                    ELSE
+                        INSERT INTO core_phonedirectory (phone_number, user_id, spam_report_count, contact_names)
+                        VALUES (p_phone, v_user_id, COALESCE(v_spam, 0), v_names)
+                        ON CONFLICT (phone_number)
+                        DO UPDATE SET
+                            user_id = EXCLUDED.user_id,
+                            spam_report_count = EXCLUDED.spam_report_count,
+                            contact_names = EXCLUDED.contact_names;
+                    END IF;
+                END;
+                $$ LANGUAGE plpgsql;
+            """
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 import uuid
 from django.utils import timezone
+from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 
 
@@ -22,6 +24,9 @@ class User(AbstractBaseUser):
     name = models.CharField(max_length=100)
     email = models.EmailField(max_length=255, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    # Maintained by a database trigger from `name`; see core.search.
+    name_keys = ArrayField(models.CharField(max_length=32), null=True, blank=True, editable=False)
+    name_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     USERNAME_FIELD = 'phone_number'
     REQUIRED_FIELDS = ['name']
@@ -33,6 +38,8 @@ class User(AbstractBaseUser):
             models.Index(fields=['phone_number']),
             models.Index(name='idx_user_name_prefix', fields=['name']),
             GinIndex(name='idx_user_name_trgm', fields=['name'], opclasses=['gin_trgm_ops']),
+            GinIndex(name='idx_user_name_keys', fields=['name_keys']),
+            GinIndex(name='idx_user_name_vector', fields=['name_vector']),
         ]
 
     def __str__(self):
@@ -45,13 +52,20 @@ class Contact(models.Model):
     contact_phone = models.CharField(max_length=15)
     contact_name = models.CharField(max_length=100)
     created_at = models.DateTimeField(default=timezone.now)
+    # Maintained by a database trigger from `contact_name`; see core.search.
+    contact_name_keys = ArrayField(models.CharField(max_length=32), null=True, blank=True, editable=False)
+    contact_name_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     class Meta:
+        # Once hash-partitioned on user_id (core.partitioning), the database primary key is (id, user_id).
         unique_together = ('user', 'contact_phone')
         indexes = [
-            models.Index(fields=['contact_phone']),
+            # "Which of these users have this number as a contact", answered by an index-only scan.
+            models.Index(name='idx_contact_phone_user', fields=['contact_phone', 'user']),
             models.Index(name='idx_contact_name_prefix', fields=['contact_name']),
             GinIndex(name='idx_contact_name_trgm', fields=['contact_name'], opclasses=['gin_trgm_ops']),
+            GinIndex(name='idx_contact_name_keys', fields=['contact_name_keys']),
+            GinIndex(name='idx_contact_name_vector', fields=['contact_name_vector']),
         ]
 
     def __str__(self):
@@ -65,6 +79,7 @@ class SpamReport(models.Model):
     reported_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
+        # Once hash-partitioned on target_phone (core.partitioning), the database primary key is (id, target_phone).
         unique_together = ('reporter', 'target_phone')
         indexes = [
             models.Index(fields=['target_phone']),
@@ -79,22 +94,108 @@ class SpamStats(models.Model):
     target_phone = models.CharField(max_length=15, primary_key=True)
     report_count = models.IntegerField(default=0)
     last_reported_at = models.DateTimeField(null=True, blank=True)
+    # ln of the sum of 2^(reported_at / half-life) over the number's reports,
+    # kept up to date by the aggregation SQL (see core.spam). Ordering by it is
+    # ordering by the current time-decayed spam score.
+    score_key = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(name='idx_spamstats_score_key', fields=['-score_key']),
+        ]
 
     def __str__(self):
         return f"{self.target_phone}: {self.report_count} spam reports"
 
 
+# -------------------- Spam Hourly Count Model --------------------
+class SpamHourlyCount(models.Model):
+    """Reports per number per UTC hour, for rolling-window counts; old hours are pruned."""
+    pk = models.CompositePrimaryKey('target_phone', 'hour')
+    target_phone = models.CharField(max_length=15)
+    hour = models.DateTimeField()
+    report_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(name='idx_spamhourlycount_hour', fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.target_phone}: {self.report_count} reports in the hour from {self.hour}"
+
+
+# -------------------- Pending Spam Report Model --------------------
+class PendingSpamReport(models.Model):
+    """Append-only queue of reports not yet folded into SpamStats (deferred aggregation mode)."""
+    target_phone = models.CharField(max_length=15)
+    reported_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.target_phone} pending since {self.reported_at}"
+
+
+# -------------------- Phone Directory Model --------------------
+class PhoneDirectory(models.Model):
+    """Denormalized caller-ID row per phone number, maintained by triggers (see migration 0005)."""
+    phone_number = models.CharField(max_length=15, primary_key=True)
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='directory_entry')
+    spam_report_count = models.IntegerField(default=0)
+    contact_names = ArrayField(models.CharField(max_length=100), default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.phone_number}: {self.spam_report_count} spam reports"
+
+
+# -------------------- Phone Version Model --------------------
+class PhoneVersion(models.Model):
+    """Change counter per phone number, bumped by triggers (see migration 0011) whenever
+    anything shown for the number changes. Versions come from one sequence, so the
+    highest version also marks the latest change anywhere."""
+    phone_number = models.CharField(max_length=15, primary_key=True)
+    version = models.BigIntegerField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(name='idx_phoneversion_version', fields=['-version']),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number}: version {self.version}"
+
+
 # -------------------- Auth Token Model --------------------
 class AuthToken(models.Model):
     token = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
+    # Indexed through idx_authtoken_user_expiry.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(default=timezone.now)
     expires_at = models.DateTimeField()
 
     class Meta:
         indexes = [
-            models.Index(fields=['user']),
+            # A user's newest live token, for reuse on login.
+            models.Index(name='idx_authtoken_user_expiry', fields=['user', '-expires_at']),
+            # Oldest expired tokens first, for purge_tokens.
+            models.Index(name='idx_authtoken_expires_at', fields=['expires_at']),
         ]
 
     def __str__(self):
         return f"Token for {self.user.phone_number}"
+
+
+# -------------------- Revoked Signed Token Model --------------------
+class RevokedToken(models.Model):
+    """A signed token revoked before its expiry; rows are kept only until then."""
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(name='idx_revokedtoken_expires_at', fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Revoked {self.jti}"
@@ -0,0 +1,212 @@
+# core/partitioning.py
+
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+DEFAULT_PARTITIONING = {
+    'PARTITIONS': 16,
+    'BATCH_SIZE': 5000,
+    'LOCK_TIMEOUT': '5s',
+}
+
+# Table -> hash partition key. Postgres requires every unique constraint of a
+# partitioned table to include the key, so the key is one of the unique_together
+# columns and the primary key becomes (id, key):
+#  core_contact:    (user_id, contact_phone); a user's contacts share a partition,
+#                   so contact sync touches one partition per user.
+#  core_spamreport: (reporter_id, target_phone); a number's reports share a
+#                   partition, as do the count/prune queries of core.spam.
+PARTITION_KEYS = {
+    'core_contact': 'user_id',
+    'core_spamreport': 'target_phone',
+}
+
+SHADOW_SUFFIX = '_partitioned'
+RETIRED_SUFFIX = '_unpartitioned'
+MIRROR_TRIGGER = 'partition_mirror'
+
+PLAIN = 'plain'
+COPYING = 'copying'
+PARTITIONED = 'partitioned'
+
+RELKIND_SQL = "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)"
+
+# Indexes that do not back a constraint; constraint indexes come with the constraints.
+INDEXES_SQL = """
+    SELECT c.relname, pg_get_indexdef(i.indexrelid)
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = %s::regclass
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid AND k.conrelid = i.indrelid)
+    ORDER BY c.relname
+"""
+
+CONSTRAINTS_SQL = """
+    SELECT conname, contype, pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE conrelid = %s::regclass AND contype IN ('u', 'f', 'c')
+    ORDER BY conname
+"""
+
+TRIGGERS_SQL = """
+    SELECT tgname, tgenabled, pg_get_triggerdef(oid)
+    FROM pg_trigger
+    WHERE tgrelid = %s::regclass AND NOT tgisinternal AND tgname <> %s
+    ORDER BY tgname
+"""
+
+INDEX_NAMES_SQL = "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass"
+
+
+def partitioning_config():
+    return {**DEFAULT_PARTITIONING, **getattr(settings, 'PARTITIONING', {})}
+
+
+def _renamed(name, suffix):
+    # Index names share the 63-byte relation namespace; the old and new tables coexist until the swap.
+    return name[:63 - len(suffix)] + suffix
+
+
+def partition_state(table):
+    """PLAIN, COPYING (shadow table exists and is being filled) or PARTITIONED."""
+    with connection.cursor() as cursor:
+        cursor.execute(RELKIND_SQL, [table])
+        relkind = cursor.fetchone()[0]
+        if relkind == 'p':
+            return PARTITIONED
+        cursor.execute(RELKIND_SQL, [table + SHADOW_SUFFIX])
+        return COPYING if cursor.fetchone() else PLAIN
+
+
+# -------------------- Prepare --------------------
+def create_shadow_table(table, partitions):
+    """Create `<table>_partitioned`, hash-partitioned `partitions` ways, and start mirroring writes into it.
+
+    The shadow gets the table's columns, constraints and indexes up front, so
+    they are built on empty partitions and maintained as rows arrive. Triggers
+    stay on the old table until the swap; the shadow only receives copies.
+    """
+    key = PARTITION_KEYS[table]
+    shadow = table + SHADOW_SUFFIX
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY HASH ({key})")
+        for remainder in range(partitions):
+            cursor.execute(f"CREATE TABLE {table}_p{remainder} PARTITION OF {shadow} "
+                           f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})")
+        # The identity sequence cannot move between tables; the swap carries its position over.
+        cursor.execute(f"CREATE SEQUENCE {shadow}_id_seq OWNED BY {shadow}.id")
+        cursor.execute(f"ALTER TABLE {shadow} ALTER COLUMN id SET DEFAULT nextval('{shadow}_id_seq')")
+        cursor.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY (id, {key})")
+
+        cursor.execute(CONSTRAINTS_SQL, [table])
+        for name, kind, definition in cursor.fetchall():
+            if kind == 'u':
+                name = _renamed(name, '_new')
+            cursor.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {name} {definition}")
+        cursor.execute(INDEXES_SQL, [table])
+        for name, definition in cursor.fetchall():
+            if name == f"{table}_pkey":
+                continue
+            definition = re.sub(rf"INDEX {name} ON (ONLY )?(\S+\.)?{table} ",
+                                f"INDEX {_renamed(name, '_new')} ON {shadow} ", definition)
+            cursor.execute(definition)
+
+        cursor.execute(f"CREATE TRIGGER {MIRROR_TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                       f"FOR EACH ROW EXECUTE FUNCTION partition_mirror('{shadow}', '{key}')")
+
+
+# -------------------- Copy --------------------
+def copy_to_shadow(table, batch_size):
+    """Copy existing rows into the shadow table in id order, one transaction per batch.
+
+    Yields the number of rows copied per batch. Each batch share-locks the rows
+    it reads, so a concurrent update or delete either commits first (and the
+    row is copied as it is then, or not at all) or waits for the batch and is
+    then mirrored. Rows the mirror already wrote are skipped, so an interrupted
+    copy can simply be run again.
+    """
+    shadow = table + SHADOW_SUFFIX
+    last_id = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s", [last_id, batch_size])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return
+            cursor.execute(
+                f"INSERT INTO {shadow} SELECT * FROM {table} WHERE id BETWEEN %s AND %s FOR SHARE "
+                f"ON CONFLICT DO NOTHING",
+                [ids[0], ids[-1]],
+            )
+            copied = cursor.rowcount
+        yield copied
+        last_id = ids[-1]
+
+
+# -------------------- Swap --------------------
+def swap_shadow_table(table):
+    """Replace `table` with its filled shadow in one short transaction.
+
+    The old table is kept as `<table>_unpartitioned` (without triggers) until
+    drop_retired_table(); the shadow takes over the table's name, index and
+    constraint names, triggers (with their enabled state) and id sequence.
+    """
+    shadow = table + SHADOW_SUFFIX
+    retired = table + RETIRED_SUFFIX
+    lock_timeout = partitioning_config()['LOCK_TIMEOUT']
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [lock_timeout])
+        # Fire pending deferred triggers now; ALTER TABLE refuses to run with any queued.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {table}, {shadow} IN ACCESS EXCLUSIVE MODE")
+
+        cursor.execute(f"SELECT pg_get_serial_sequence('{table}', 'id')")
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT setval('{shadow}_id_seq', nextval('{sequence}'))")
+        cursor.execute(TRIGGERS_SQL, [table, MIRROR_TRIGGER])
+        triggers = cursor.fetchall()
+        cursor.execute(f"DROP TRIGGER {MIRROR_TRIGGER} ON {table}")
+        for name, _, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {name} ON {table}")
+
+        cursor.execute(INDEX_NAMES_SQL, [table])
+        old_indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'u'",
+                       [table])
+        unique = [row[0] for row in cursor.fetchall()]
+        for name in old_indexes:
+            cursor.execute(f"ALTER INDEX {name} RENAME TO {_renamed(name, '_old')}")
+        for name in old_indexes:
+            if name == f"{table}_pkey":
+                cursor.execute(f"ALTER INDEX {shadow}_pkey RENAME TO {name}")
+            elif name in unique:
+                cursor.execute(f"ALTER TABLE {shadow} RENAME CONSTRAINT {_renamed(name, '_new')} TO {name}")
+            else:
+                cursor.execute(f"ALTER INDEX {_renamed(name, '_new')} RENAME TO {name}")
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {retired}")
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {retired}_id_seq")
+        cursor.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+        cursor.execute(f"ALTER SEQUENCE {shadow}_id_seq RENAME TO {table}_id_seq")
+
+        # The definitions name `table`, which is now the partitioned table.
+        for name, enabled, definition in triggers:
+            cursor.execute(definition)
+            if enabled == 'D':
+                cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER {name}")
+    # Autovacuum analyzes partitions but never the partitioned parent.
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {table}")
+
+
+def drop_retired_table(table):
+    """Drop `<table>_unpartitioned` once the partitioned table has been verified. Returns whether it existed."""
+    retired = table + RETIRED_SUFFIX
+    with connection.cursor() as cursor:
+        cursor.execute(RELKIND_SQL, [retired])
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute(f"DROP TABLE {retired}")
+    return True
@@ -0,0 +1,69 @@
+# core/renderers.py
+
+import json
+from json.encoder import encode_basestring
+
+from rest_framework.renderers import JSONRenderer
+
+# Search results are tuples in this order, matching SearchResultSerializer's
+# field order, so they can be encoded without building a dict per row.
+RESULT_FIELDS = ('name', 'phone_number', 'is_registered_user', 'spam_report_count', 'show_email', 'email')
+
+RESULT_TEMPLATE = '{"name":%s,"phone_number":%s,"is_registered_user":%s,"spam_report_count":%s,' \
+                  '"show_email":%s,"email":%s}'
+
+BATCH_ITEM_TEMPLATE = '{"query":%s,"phone_number":%s,"valid":%s,"results":%s}'
+
+# Same settings as DRF's JSONRenderer (compact, UTF-8, strict), for values of unknown type.
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode
+
+
+def _string(value):
+    return 'null' if value is None else encode_basestring(str(value))
+
+
+def _boolean(value):
+    return 'null' if value is None else ('true' if value else 'false')
+
+
+def _integer(value):
+    return 'null' if value is None else str(int(value))
+
+
+def _finish(text):
+    # JSONRenderer escapes these for embedding in JavaScript; so must we.
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+def encode_rows(rows):
+    """JSON text of a list of result tuples, byte for byte what SearchResultSerializer + JSONRenderer produce."""
+    return '[' + ','.join([
+        RESULT_TEMPLATE % (_string(name), _string(phone), _boolean(registered), _integer(spam_report_count),
+                           _boolean(show_email), _string(email))
+        for name, phone, registered, spam_report_count, show_email, email in rows
+    ]) + ']'
+
+
+def encode_results(rows):
+    return EncodedJSON(_finish(encode_rows(rows)))
+
+
+def encode_batch_results(items):
+    """`items` are (query, phone_number, result rows); encodes the batch lookup body."""
+    return EncodedJSON(_finish('{"results":[' + ','.join([
+        BATCH_ITEM_TEMPLATE % (_dumps(query), _string(phone), _boolean(phone is not None), encode_rows(rows))
+        for query, phone, rows in items
+    ]) + ']}'))
+
+
+class EncodedJSON(bytes):
+    """A response body that is already JSON; SearchResultRenderer passes it through."""
+
+
+class SearchResultRenderer(JSONRenderer):
+    """JSONRenderer that skips re-encoding bodies produced by encode_results / encode_batch_results."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, EncodedJSON):
+            return bytes(data)
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,203 @@
+# core/replicas.py
+
+import logging
+import math
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from core.background import Refresher
+from core.metrics import registry
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLICAS = {
+    'ALIASES': None,  # None: every DATABASES alias other than default
+    'MAX_LAG': 3.0,
+    'LAG_CHECK_INTERVAL': 2.0,
+    'STICKY_SECONDS': 10,
+    'CACHE_ALIAS': 'default',
+}
+
+# Seconds the replica's data is behind the primary. A standby that has
+# replayed everything it received reports 0 even when the primary is idle
+# (pg_last_xact_replay_timestamp alone would keep growing), but only while its
+# WAL receiver is streaming: a disconnected standby has also replayed all it
+# received and would otherwise look current forever. A server that is not in
+# recovery is the primary, or a test mirror of it.
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 'Infinity'
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+    END::float8
+"""
+
+PIN_KEY_PREFIX = 'replicapin'
+
+# Alias the current request reads from; None reads from the primary.
+_read_alias = ContextVar('phonebook_read_alias', default=None)
+
+
+def replicas_config():
+    return {**DEFAULT_REPLICAS, **getattr(settings, 'REPLICAS', {})}
+
+
+# -------------------- Lag Monitor --------------------
+class ReplicaMonitor:
+    """Replication lag per replica alias, measured every `interval` seconds.
+
+    The first measurement runs inline; later ones run in a background thread,
+    so a request never waits on a replica to decide where to read. A replica
+    that cannot be reached counts as infinitely behind.
+    """
+
+    def __init__(self, aliases, max_lag, interval):
+        self.aliases = tuple(aliases)
+        self.max_lag = max_lag
+        self.interval = interval
+        self.reads = {alias: 0 for alias in (DEFAULT_DB_ALIAS, *self.aliases)}
+        self._lags = {}
+        self._refresher = Refresher(self._measure, interval, "Replica lag check")
+
+    def measure(self):
+        self._refresher.refresh()
+
+    def _measure(self):
+        lags = {}
+        for alias in self.aliases:
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(REPLICA_LAG_SQL)
+                    lags[alias] = cursor.fetchone()[0]
+            except DatabaseError:
+                logger.warning("Replica %s is unreachable; reading from the primary", alias, exc_info=True)
+                lags[alias] = math.inf
+        self._lags = lags
+
+    def lags(self):
+        return dict(self._lags)
+
+    def healthy(self):
+        """Replicas at most `max_lag` seconds behind as of the last measurement."""
+        self._refresher.maybe_refresh()
+        return [alias for alias, lag in self._lags.items() if lag <= self.max_lag]
+
+    def record(self, alias):
+        self.reads[alias or DEFAULT_DB_ALIAS] += 1
+
+
+_monitor = None
+
+
+def get_replica_monitor():
+    global _monitor
+    if _monitor is None:
+        config = replicas_config()
+        aliases = config['ALIASES']
+        if aliases is None:
+            aliases = [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+        _monitor = ReplicaMonitor(aliases, config['MAX_LAG'], config['LAG_CHECK_INTERVAL'])
+    return _monitor
+
+
+def reset_replica_monitor():
+    global _monitor
+    _monitor = None
+
+
+# -------------------- Read-your-writes --------------------
+def _pin_key(user_id):
+    return f"{PIN_KEY_PREFIX}:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Send `user_id`'s reads to the primary for STICKY_SECONDS, so they see their own write.
+
+    STICKY_SECONDS should exceed MAX_LAG + LAG_CHECK_INTERVAL, the most a
+    replica that is still being read from can be behind. Pins live in the
+    CACHE_ALIAS cache; use a shared backend when several workers serve a user.
+    """
+    if not get_replica_monitor().aliases:
+        return
+    config = replicas_config()
+    caches[config['CACHE_ALIAS']].set(_pin_key(user_id), True, config['STICKY_SECONDS'])
+
+
+def is_pinned(user_id):
+    return caches[replicas_config()['CACHE_ALIAS']].get(_pin_key(user_id)) is not None
+
+
+# -------------------- Routing --------------------
+def choose_replica(user):
+    """Alias `user`'s reads should go to: a replica within MAX_LAG, or None for the primary."""
+    monitor = get_replica_monitor()
+    if not monitor.aliases:
+        return None
+    alias = None
+    if not is_pinned(user.pk):
+        healthy = monitor.healthy()
+        alias = random.choice(healthy) if healthy else None
+    monitor.record(alias)
+    return alias
+
+
+async def achoose_replica(user):
+    if not get_replica_monitor().aliases:
+        return None
+    return await sync_to_async(choose_replica)(user)
+
+
+@contextmanager
+def reads_from(alias):
+    """Run the block's ORM and read_connection() reads against `alias` (None: the primary).
+
+    Every read in the block goes to the same server, so a response is built
+    from one consistent, if slightly older, state.
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def read_connection():
+    """Connection for raw-SQL reads: the current request's replica, or the primary."""
+    return connections[_read_alias.get() or DEFAULT_DB_ALIAS]
+
+
+class ReplicaRouter:
+    """Routes reads inside reads_from() to the chosen replica; everything else uses the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Also covers saving an instance that was loaded from a replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in get_replica_monitor().aliases else None
+
+
+def collect_metrics():
+    monitor = _monitor
+    if monitor is None or not monitor.aliases:
+        return
+    yield ('phonebook_replica_lag_seconds', 'gauge', "Replication lag at the last check.",
+           [({'database': alias}, lag) for alias, lag in sorted(monitor.lags().items())])
+    yield ('phonebook_replica_routed_requests_total', 'counter', "Replica-eligible requests by database served.",
+           [({'database': alias}, n) for alias, n in sorted(monitor.reads.items())])
+
+
+registry.register_collector(collect_metrics)
@@ -0,0 +1,169 @@
+# core/search.py
+
+import base64
+import binascii
+import json
+
+from core.replicas import read_connection
+from core.visibility import get_visibility_cache
+from django.db import connection, transaction
+
+# Rows are ordered by (is_prefix DESC, score DESC, phone_number ASC) and
+# phone_number is unique in the result, so the ranking is total and the page
+# after a cursor is stable. Contact names only contribute numbers no
+# registered user owns; each such number appears once, under its best-ranked
+# matching name. `score` is trigram similarity, computed only for the rows the
+# mode's indexed predicate selected. Email visibility is resolved afterwards
+# for the page's registered users only (see core.visibility).
+NAME_SEARCH_SQL = """
+    WITH registered AS (
+        SELECT u.name, u.phone_number, u.email, true AS is_registered_user,
+               u.name ILIKE %(prefix)s AS is_prefix,
+               similarity(u.name, %(query)s)::float8 AS score,
+               u.id AS user_id
+        FROM core_user u
+        WHERE {registered_match}
+    ), unregistered AS (
+        SELECT DISTINCT ON (c.contact_phone)
+               c.contact_name AS name, c.contact_phone AS phone_number, NULL AS email,
+               false AS is_registered_user,
+               c.contact_name ILIKE %(prefix)s AS is_prefix,
+               similarity(c.contact_name, %(query)s)::float8 AS score,
+               NULL::bigint AS user_id
+        FROM core_contact c
+        WHERE ({contact_match})
+          AND NOT EXISTS (SELECT 1 FROM core_user u WHERE u.phone_number = c.contact_phone)
+        ORDER BY c.contact_phone, is_prefix DESC, score DESC, c.contact_name
+    ), ranked AS (
+        SELECT * FROM registered
+        UNION ALL
+        SELECT * FROM unregistered
+    )
+    SELECT r.name, r.phone_number, r.email, r.is_registered_user, r.is_prefix, r.score, r.user_id,
+           COALESCE(s.report_count, 0) AS spam_report_count
+    FROM ranked r
+    LEFT JOIN core_spamstats s ON s.target_phone = r.phone_number
+    WHERE %(after_prefix)s::int IS NULL
+       OR (-r.is_prefix::int, -r.score, r.phone_number)
+          > (-%(after_prefix)s::int, -%(after_score)s::float8, %(after_phone)s::varchar)
+    ORDER BY r.is_prefix DESC, r.score DESC, r.phone_number
+    LIMIT %(limit)s
+"""
+
+FUZZY = 'fuzzy'
+PHONETIC = 'phonetic'
+FULLTEXT = 'fulltext'
+
+# Per mode, a predicate over (name, phonetic keys, tsvector) columns.
+#  fuzzy:    `ILIKE 'q%'` or pg_trgm `%`, served by the gin_trgm_ops indexes.
+#            `UPPER(name) LIKE` and `similarity() > 0.3` could not use them.
+#  phonetic: every word of the query has a phonetic code in the name's keys;
+#            GIN array containment on name_keys / contact_name_keys.
+#  fulltext: every word of the query appears in the name, in any order;
+#            GIN on name_vector / contact_name_vector.
+MATCH_PREDICATES = {
+    FUZZY: "{name} ILIKE %(prefix)s OR {name} %% %(query)s",
+    PHONETIC: "cardinality(phonetic_keys(%(query)s)) > 0 AND {keys} @> phonetic_keys(%(query)s)",
+    FULLTEXT: "{vector} @@ plainto_tsquery('simple', %(query)s)",
+}
+MATCH_MODES = tuple(MATCH_PREDICATES)
+
+BACKFILL_TABLES = {
+    'core_user': ('name_keys', "name_keys = phonetic_keys(name), name_vector = to_tsvector('simple', name)"),
+    'core_contact': ('contact_name_keys', "contact_name_keys = phonetic_keys(contact_name), "
+                                          "contact_name_vector = to_tsvector('simple', contact_name)"),
+}
+
+COLUMNS = ('name', 'phone_number', 'email', 'is_registered_user', 'is_prefix', 'score', 'user_id',
+           'spam_report_count')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    position = [int(row['is_prefix']), row['score'], row['phone_number']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        is_prefix, score, phone = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor.")
+    if is_prefix not in (0, 1) or not isinstance(score, (int, float)) or not isinstance(phone, str):
+        raise InvalidCursor("Invalid cursor.")
+    return is_prefix, float(score), phone
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def name_search_sql(mode):
+    predicate = MATCH_PREDICATES[mode]
+    return NAME_SEARCH_SQL.format(
+        registered_match=predicate.format(name='u.name', keys='u.name_keys', vector='u.name_vector'),
+        contact_match=predicate.format(name='c.contact_name', keys='c.contact_name_keys',
+                                       vector='c.contact_name_vector'),
+    )
+
+
+def search_names(searcher, query, limit, cursor=None, mode=FUZZY, searcher_version=None):
+    """One page of name matches for `searcher`. Returns (rows, next_cursor or None).
+
+    `searcher_version` is the PhoneVersion of the searcher's number, when the
+    caller has read it; cached email visibility older than it is not used.
+    Raises InvalidCursor for a cursor this function did not produce.
+    """
+    after_prefix, after_score, after_phone = decode_cursor(cursor) if cursor else (None, None, None)
+    params = {
+        'query': query,
+        'prefix': _escape_like(query) + '%',
+        'after_prefix': after_prefix,
+        'after_score': after_score,
+        'after_phone': after_phone,
+        # One extra row tells us whether another page exists.
+        'limit': limit + 1,
+    }
+    with read_connection().cursor() as db_cursor:
+        db_cursor.execute(name_search_sql(mode), params)
+        rows = [dict(zip(COLUMNS, row)) for row in db_cursor.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+
+    visible = get_visibility_cache().visible_owners(
+        searcher.phone_number, [row['user_id'] for row in rows if row['user_id'] is not None], searcher_version
+    )
+    for row in rows:
+        row['is_contact'] = row['user_id'] in visible
+    return rows, next_cursor
+
+
+# -------------------- Backfill --------------------
+def backfill_search_keys(table, batch_size):
+    """Fill NULL search keys in `table` in id order, one transaction per batch.
+
+    Yields the number of rows updated per batch. New writes are covered by the
+    triggers, so rows behind the scan never need a second pass.
+    """
+    null_column, assignments = BACKFILL_TABLES[table]
+    last_id = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s", [last_id, batch_size])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} WHERE id BETWEEN %s AND %s AND {null_column} IS NULL",
+                [ids[0], ids[-1]],
+            )
+            updated = cursor.rowcount
+        yield updated
+        last_id = ids[-1]
@@ -0,0 +1,363 @@
+# core/seeding.py
+
+import bisect
+import math
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from core.directory_io import copy_rows
+from core.spam import DEFERRED_TRIGGER, IMMEDIATE_TRIGGER, reconcile_spam_stats
+from django.db import connection, connections, transaction
+
+DEFAULT_SHARD_SIZE = 5000
+
+# Index i maps to +91 and ten digits starting 6-9 through a bijection on
+# PHONE_SPACE, so numbers are unique, spread over every prefix, and the same
+# however the work is split. The +9180 block is left out; the benchmark
+# fixture (core.benchmarks) uses it.
+PHONE_SPACE = 3_900_000_000
+PHONE_MULTIPLIER = 2_654_435_761  # coprime to PHONE_SPACE
+SKIPPED_BLOCK = (8_000_000_000, 100_000_000)  # (start, size) of +9180xxxxxxxx
+
+# Unregistered numbers people keep in their address books, per registered user.
+UNREGISTERED_PER_USER = 2
+# Share of unregistered numbers that are spammers.
+SPAMMER_SHARE = 0.01
+
+FIRST_NAMES = [
+    'Rahul', 'Priya', 'Amit', 'Neha', 'Rohit', 'Pooja', 'Vikram', 'Anjali', 'Suresh', 'Divya',
+    'Ravi', 'Sneha', 'Arjun', 'Kavya', 'Sanjay', 'Riya', 'Rajesh', 'Ananya', 'Manoj', 'Meera',
+    'Deepak', 'Lakshmi', 'Anil', 'Sunita', 'Aditya', 'Geeta', 'Ramesh', 'Aishwarya', 'Kabir', 'Diya',
+    'Aarav', 'Saanvi', 'Vivaan', 'Aadhya', 'Ishaan', 'Fatima', 'Mohammed', 'Ayesha', 'Imran', 'Zoya',
+    'Harpreet', 'Gurpreet', 'Simran', 'Manpreet', 'John', 'Mary', 'Joseph', 'Thomas', 'Venkatesh', 'Srinivas',
+    'Karthik', 'Lavanya', 'Naveen', 'Bhavana', 'Prakash', 'Shalini', 'Abhishek', 'Swati', 'Nikhil', 'Rekha',
+]
+LAST_NAMES = [
+    'Sharma', 'Singh', 'Kumar', 'Patel', 'Gupta', 'Reddy', 'Rao', 'Verma', 'Yadav', 'Iyer',
+    'Nair', 'Das', 'Joshi', 'Shah', 'Mehta', 'Jain', 'Agarwal', 'Khan', 'Mishra', 'Pandey',
+    'Kulkarni', 'Deshmukh', 'Patil', 'Menon', 'Pillai', 'Banerjee', 'Chatterjee', 'Mukherjee', 'Kapoor', 'Malhotra',
+    'Chopra', 'Gill', 'Sandhu', 'Naidu', 'Chauhan', 'Thakur', 'Tiwari', 'Dubey', 'Ansari', 'Sheikh',
+    "D'Souza", 'Fernandes', 'Thomas', 'Bhat', 'Hegde', 'Saxena', 'Srivastava', 'Bose', 'Ghosh', 'Krishnan',
+]
+# How people label numbers in their address books, besides the plain name.
+CONTACT_LABELS = ['Office', 'Work', 'Home', 'Gym', 'College', 'Bhaiya', 'Didi', 'Uncle', 'New', '2']
+SERVICES = ['Plumber', 'Electrician', 'Driver', 'Maid', 'Milkman', 'Carpenter', 'Tailor', 'Doctor', 'Courier',
+            'Delivery']
+
+
+def _zipf_weights(count, exponent=1.0):
+    """Cumulative weights for picking item k with probability proportional to 1 / (k + 1) ** exponent."""
+    weights = [1 / (rank + 1) ** exponent for rank in range(count)]
+    total = 0.0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+FIRST_WEIGHTS = _zipf_weights(len(FIRST_NAMES))
+LAST_WEIGHTS = _zipf_weights(len(LAST_NAMES), exponent=0.8)
+
+
+def _mix(value):
+    """splitmix64 finaliser: a fast, well-spread 64-bit hash of an integer."""
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+
+def _pick(items, cumulative, fraction):
+    return items[bisect.bisect_right(cumulative, fraction * cumulative[-1])]
+
+
+def seeded_phone(seed, index):
+    number = 6_000_000_000 + (index * PHONE_MULTIPLIER + _mix(seed)) % PHONE_SPACE
+    start, size = SKIPPED_BLOCK
+    return f"+91{number + size if number >= start else number}"
+
+
+def seeded_name(seed, index):
+    """The registered name of user `index`; a pure function, so any shard can name any user."""
+    h = _mix(_mix(seed) ^ index)
+    return (f"{_pick(FIRST_NAMES, FIRST_WEIGHTS, (h & 0xFFFFFFFF) / 2 ** 32)} "
+            f"{_pick(LAST_NAMES, LAST_WEIGHTS, (h >> 32) / 2 ** 32)}")
+
+
+@dataclass(frozen=True)
+class SeedPlan:
+    seed: int
+    users: int
+    contacts_per_user: float
+    reports_per_user: float
+    password: str
+    anchor: datetime
+    shard_size: int = DEFAULT_SHARD_SIZE
+
+    @property
+    def shards(self):
+        return math.ceil(self.users / self.shard_size)
+
+    @property
+    def unregistered(self):
+        return self.users * UNREGISTERED_PER_USER
+
+    @property
+    def spammers(self):
+        return max(1, int(self.unregistered * SPAMMER_SHARE))
+
+
+# -------------------- Generation --------------------
+def _contact_name(rng, seed, target, plan):
+    """What an address book calls `target`: its owner's name for registered users, in the usual variations."""
+    if target < plan.users:
+        first, _, last = seeded_name(seed, target).partition(' ')
+    else:
+        first = _pick(FIRST_NAMES, FIRST_WEIGHTS, rng.random())
+        last = _pick(LAST_NAMES, LAST_WEIGHTS, rng.random())
+    style = rng.random()
+    if style < 0.45:
+        return f"{first} {last}"
+    if style < 0.65:
+        return first
+    if style < 0.75:
+        return f"{first} {rng.choice(CONTACT_LABELS)}"
+    if style < 0.85 and target >= plan.users:
+        return f"{rng.choice(SERVICES)} {first}"
+    if style < 0.9:
+        return f"{first[0]}. {last}"
+    if style < 0.95:
+        return f"{first} {last}".lower()
+    return f"{first} {last[0]}"
+
+
+def _contact_target(rng, plan):
+    """A number someone keeps: half registered users, half not; a few of each appear in many books."""
+    if rng.random() < 0.5:
+        return int(plan.users * rng.random() ** 2)
+    return plan.users + int(plan.unregistered * rng.random() ** 1.5)
+
+
+def shard_rows(plan, shard):
+    """Users, contacts and spam reports of shard `shard`, generated from (seed, shard) alone.
+
+    Contacts are (owner index, phone, name, created_at) and spam reports
+    (reporter index, phone, reported_at).
+    """
+    rng = random.Random(f"{plan.seed}:{shard}")
+    start = shard * plan.shard_size
+    end = min(plan.users, start + plan.shard_size)
+    three_years = timedelta(days=3 * 365).total_seconds()
+    # Address book sizes are log-normal with mean contacts_per_user; reports
+    # per user are geometric with mean reports_per_user (most file none).
+    sigma = 1.0
+    mu = math.log(max(plan.contacts_per_user, 1e-9)) - sigma ** 2 / 2
+    report_rate = math.log1p(1 / plan.reports_per_user) if plan.reports_per_user else None
+
+    users, contacts, reports = [], [], []
+    for index in range(start, end):
+        phone = seeded_phone(plan.seed, index)
+        name = seeded_name(plan.seed, index)
+        email = None
+        if rng.random() < 0.4:
+            email = f"{name.replace(' ', '.').replace(chr(39), '').lower()}.{phone[3:]}@example.com"
+        joined = plan.anchor - timedelta(seconds=three_years * rng.random() ** 2)
+        users.append((phone, name, email, plan.password, joined))
+
+        if plan.contacts_per_user:
+            wanted = min(round(rng.lognormvariate(mu, sigma)), int(plan.contacts_per_user * 20))
+            targets = {_contact_target(rng, plan) for _ in range(wanted)}
+            targets.discard(index)
+            for target in targets:
+                added = joined + (plan.anchor - joined) * rng.random()
+                contacts.append((index, seeded_phone(plan.seed, target), _contact_name(rng, plan.seed, target, plan),
+                                 added))
+
+        if report_rate:
+            wanted = int(rng.expovariate(report_rate))
+            targets = {plan.users + int(plan.spammers * rng.random() ** 2) for _ in range(wanted)}
+            for target in targets:
+                reported = plan.anchor - timedelta(seconds=30 * 86400 * rng.random())
+                reports.append((index, seeded_phone(plan.seed, target), reported))
+    return users, contacts, reports
+
+
+# -------------------- Bulk Load --------------------
+# Per-row triggers that keep derived tables current. Each one touches rows
+# shared across many inserts (a popular number's directory entry, a spammer's
+# SpamStats), so during a bulk load they serialise the workers; bulk_load()
+# turns them off and rebuilds the tables once instead. The search-key
+# triggers only touch their own row and stay on.
+DERIVED_TRIGGERS = {
+    'core_user': ('trigger_phone_directory_user', 'trigger_phone_version_user'),
+    'core_contact': (
+        'trigger_phone_directory_contact_insert',
+        'trigger_phone_directory_contact_update',
+        'trigger_phone_directory_contact_delete',
+        'trigger_phone_version_contact',
+    ),
+    'core_spamreport': (IMMEDIATE_TRIGGER, DEFERRED_TRIGGER),
+    'core_spamstats': ('trigger_phone_directory_spam', 'trigger_phone_version_spam'),
+}
+
+TRIGGER_STATES_SQL = """
+    SELECT tgname, tgenabled <> 'D'
+    FROM pg_trigger
+    WHERE tgrelid = %s::regclass AND tgname = ANY(%s) AND NOT tgisinternal AND tgparentid = 0
+"""
+
+# As migration 0005 first filled the table.
+REBUILD_DIRECTORY_SQL = """
+    INSERT INTO core_phonedirectory (phone_number, user_id, spam_report_count, contact_names)
+    SELECT phones.phone_number, u.id, COALESCE(s.report_count, 0), COALESCE(n.names, '{}')
+    FROM (
+        SELECT phone_number FROM core_user
+        UNION SELECT target_phone FROM core_spamstats
+        UNION SELECT contact_phone FROM core_contact
+    ) phones
+    LEFT JOIN core_user u ON u.phone_number = phones.phone_number
+    LEFT JOIN core_spamstats s ON s.target_phone = phones.phone_number
+    LEFT JOIN LATERAL (
+        SELECT array_agg(contact_name ORDER BY cnt DESC, contact_name) AS names
+        FROM (
+            SELECT contact_name, count(*) AS cnt
+            FROM core_contact c
+            WHERE c.contact_phone = phones.phone_number
+            GROUP BY contact_name
+            ORDER BY cnt DESC, contact_name
+            LIMIT 10
+        ) top_names
+    ) n ON true
+    WHERE u.id IS NOT NULL OR COALESCE(s.report_count, 0) > 0 OR n.names IS NOT NULL
+"""
+
+# Every listed number may have changed, so cached lookups of any of them must revalidate.
+BUMP_VERSIONS_SQL = """
+    INSERT INTO core_phoneversion (phone_number, version, updated_at)
+    SELECT phone_number, nextval('core_phoneversion_seq'), clock_timestamp()
+    FROM core_phonedirectory
+    ORDER BY phone_number
+    ON CONFLICT (phone_number)
+    DO UPDATE SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at
+"""
+
+
+def _trigger_states():
+    states = {}
+    with connection.cursor() as cursor:
+        for table, names in DERIVED_TRIGGERS.items():
+            cursor.execute(TRIGGER_STATES_SQL, [table, list(names)])
+            states[table] = dict(cursor.fetchall())
+    return states
+
+
+def _set_triggers(states, enabled):
+    """Disable every trigger in `states`, or with `enabled` re-enable the ones that were enabled."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        # ALTER TABLE refuses while deferred foreign key checks are pending in an enclosing transaction.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        for table, triggers in states.items():
+            for name, was_enabled in triggers.items():
+                if was_enabled:
+                    cursor.execute(f"ALTER TABLE {table} {'ENABLE' if enabled else 'DISABLE'} TRIGGER {name}")
+
+
+def rebuild_derived_tables():
+    """Recompute SpamStats, SpamHourlyCount and PhoneDirectory from the base tables and bump every version."""
+    reconcile_spam_stats()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE core_phonedirectory IN EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM core_phonedirectory")
+        cursor.execute(REBUILD_DIRECTORY_SQL)
+        cursor.execute(BUMP_VERSIONS_SQL)
+
+
+@contextmanager
+def bulk_load():
+    """Run a bulk load with the derived-table triggers off, then rebuild the derived tables.
+
+    The triggers are switched back to their previous state even if the load
+    fails. Writes made by the application meanwhile are covered by the
+    rebuild, but the database should not be serving during a load.
+    """
+    states = _trigger_states()
+    _set_triggers(states, enabled=False)
+    try:
+        yield
+    finally:
+        try:
+            rebuild_derived_tables()
+        finally:
+            _set_triggers(states, enabled=True)
+
+
+# -------------------- Loading --------------------
+USER_COLUMNS = ('phone_number', 'name', 'email', 'password', 'created_at')
+CONTACT_COLUMNS = ('user_id', 'contact_phone', 'contact_name', 'created_at')
+REPORT_COLUMNS = ('reporter_id', 'target_phone', 'reported_at')
+
+
+def load_shard(plan, shard):
+    """Generate and COPY one shard. Returns {table: (rows, seconds)}.
+
+    Each table is loaded in its own transaction with rows in phone order, so
+    that any rows the remaining insert triggers lock are taken in the same
+    order by every shard. Run inside bulk_load() for the derived tables.
+    """
+    users, contacts, reports = shard_rows(plan, shard)
+    loaded = {}
+
+    started = time.monotonic()
+    with transaction.atomic(), connection.cursor() as cursor:
+        copy_rows(cursor, 'core_user', USER_COLUMNS, sorted(users))
+        cursor.execute("SELECT phone_number, id FROM core_user WHERE phone_number = ANY(%s)",
+                       [[row[0] for row in users]])
+        ids = dict(cursor.fetchall())
+    loaded['core_user'] = (len(users), time.monotonic() - started)
+    first = shard * plan.shard_size
+    user_ids = [ids[row[0]] for row in users]  # by index - first
+
+    started = time.monotonic()
+    rows = sorted(((user_ids[owner - first], phone, name, added) for owner, phone, name, added in contacts),
+                  key=lambda row: row[1])
+    with transaction.atomic(), connection.cursor() as cursor:
+        copy_rows(cursor, 'core_contact', CONTACT_COLUMNS, rows)
+    loaded['core_contact'] = (len(rows), time.monotonic() - started)
+
+    started = time.monotonic()
+    rows = sorted(((user_ids[reporter - first], phone, reported) for reporter, phone, reported in reports),
+                  key=lambda row: row[1])
+    with transaction.atomic(), connection.cursor() as cursor:
+        copy_rows(cursor, 'core_spamreport', REPORT_COLUMNS, rows)
+    loaded['core_spamreport'] = (len(rows), time.monotonic() - started)
+    return loaded
+
+
+def _load_in_worker(args):
+    plan, shard = args
+    try:
+        return shard, load_shard(plan, shard)
+    finally:
+        connection.close()
+
+
+def seed_directory(plan, workers):
+    """Load every shard of `plan` across `workers` processes. Yields (shard, {table: (rows, seconds)}) as shards finish.
+
+    With one worker, shards load in this process. Workers are forked, so
+    database connections are closed first and each worker opens its own.
+    """
+    shards = range(plan.shards)
+    if workers <= 1:
+        for shard in shards:
+            yield shard, load_shard(plan, shard)
+        return
+
+    connections.close_all()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        yield from pool.imap_unordered(_load_in_worker, [(plan, shard) for shard in shards])
@@ -1,7 +1,6 @@
 
-from core.models import User, AuthToken
-from django.utils import timezone
-from datetime import timedelta
+from core.authentication import SIGNED, auth_mode, issue_signed_tokens, issue_token
+from core.models import User
 from core.models import SpamReport
 from rest_framework import serializers
 
@@ -30,11 +29,12 @@ class LoginSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError("Invalid credentials")
 
-        # Create and return AuthToken
-        token = AuthToken.objects.create(
-            user=user,
-            expires_at=timezone.now() + timedelta(days=7)
-        )
+        if auth_mode() == SIGNED:
+            access, refresh = issue_signed_tokens(user)
+            return {'token': access, 'refresh': refresh, 'user_id': user.id, 'name': user.name}
+
+        # Reuse a live AuthToken or create one
+        token = issue_token(user)
         return {'token': str(token.token), 'user_id': user.id, 'name': user.name}
 
 class SpamReportSerializer(serializers.ModelSerializer):
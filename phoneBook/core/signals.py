@@ -0,0 +1,122 @@
+# core/signals.py
+
+from core.authentication import get_token_cache
+from core.autocomplete import loaded_index
+from core.metrics import install_query_recorder
+from core.spam_cache import get_spam_cache
+from core.models import AuthToken, Contact, SpamReport, User
+from core.replicas import pin_to_primary
+from core.sync import contacts_synced
+from core.visibility import get_visibility_cache
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+# -------------------- Token Cache Invalidation --------------------
+@receiver(post_save, sender=AuthToken)
+@receiver(post_delete, sender=AuthToken)
+def invalidate_cached_token(sender, instance, **kwargs):
+    get_token_cache().invalidate(str(instance.token))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    get_token_cache().invalidate_user(instance.pk)
+
+
+# -------------------- Autocomplete Index --------------------
+@receiver(post_save, sender=User)
+def index_user(sender, instance, **kwargs):
+    index = loaded_index()
+    if index is not None:
+        transaction.on_commit(lambda: index.put(('user', instance.pk), instance.name, instance.phone_number))
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    index = loaded_index()
+    if index is not None:
+        transaction.on_commit(lambda: index.remove(('user', instance.pk)))
+
+
+@receiver(post_save, sender=Contact)
+def index_contact(sender, instance, **kwargs):
+    index = loaded_index()
+    if index is not None:
+        source = ('contact', instance.user_id, instance.contact_phone)
+        transaction.on_commit(lambda: index.put(source, instance.contact_name, instance.contact_phone))
+
+
+@receiver(post_delete, sender=Contact)
+def unindex_contact(sender, instance, **kwargs):
+    index = loaded_index()
+    if index is not None:
+        transaction.on_commit(lambda: index.remove(('contact', instance.user_id, instance.contact_phone)))
+
+
+@receiver(contacts_synced)
+def index_synced_contacts(sender, user, upserted, deleted, **kwargs):
+    index = loaded_index()
+    if index is None:
+        return
+    for phone, name in upserted.items():
+        index.put(('contact', user.pk, phone), name, phone)
+    for phone in deleted:
+        index.remove(('contact', user.pk, phone))
+
+
+# -------------------- Spam Count Cache --------------------
+@receiver(post_save, sender=SpamReport)
+def cache_spam_report(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: get_spam_cache().reported(instance.target_phone))
+
+
+@receiver(post_delete, sender=SpamReport)
+def invalidate_spam_count(sender, instance, **kwargs):
+    transaction.on_commit(lambda: get_spam_cache().invalidate(instance.target_phone))
+
+
+# -------------------- Email Visibility Cache --------------------
+# A contact entry decides whether its owner's email is visible to the person
+# whose number it saves, so it invalidates that searcher's cached answers.
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def invalidate_contact_visibility(sender, instance, **kwargs):
+    transaction.on_commit(lambda: get_visibility_cache().invalidate(instance.contact_phone))
+
+
+@receiver(contacts_synced)
+def invalidate_synced_visibility(sender, user, upserted, deleted, **kwargs):
+    cache = get_visibility_cache()
+    for phone in [*upserted, *deleted]:
+        cache.invalidate(phone)
+
+
+# -------------------- Replica Stickiness --------------------
+# A user's own spam reports and contact writes pin their reads to the primary
+# until every replica still in rotation has replayed them.
+@receiver(post_save, sender=SpamReport)
+def pin_reporter(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: pin_to_primary(instance.reporter_id))
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def pin_contact_owner(sender, instance, **kwargs):
+    transaction.on_commit(lambda: pin_to_primary(instance.user_id))
+
+
+@receiver(contacts_synced)
+def pin_synced_user(sender, user, **kwargs):
+    pin_to_primary(user.pk)
+
+
+# -------------------- Query Metrics --------------------
+@receiver(connection_created)
+def attach_query_recorder(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -0,0 +1,210 @@
+# core/spam.py
+
+from core.models import PendingSpamReport
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+IMMEDIATE = 'immediate'
+DEFERRED = 'deferred'
+
+IMMEDIATE_TRIGGER = 'trigger_update_spam_stats'
+DEFERRED_TRIGGER = 'trigger_queue_spam_report'
+
+FOLD_SQL = """
+    WITH batch AS (
+        DELETE FROM core_pendingspamreport
+        WHERE id IN (
+            SELECT id FROM core_pendingspamreport
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING target_phone, reported_at
+    ), upserted AS (
+        INSERT INTO core_spamstats (target_phone, report_count, last_reported_at, score_key)
+        SELECT target_phone, count(*), max(reported_at), spam_log_sum(spam_decay_exponent(reported_at))
+        FROM batch
+        GROUP BY target_phone
+        ON CONFLICT (target_phone)
+        DO UPDATE SET
+            report_count = core_spamstats.report_count + EXCLUDED.report_count,
+            last_reported_at = GREATEST(core_spamstats.last_reported_at, EXCLUDED.last_reported_at),
+            score_key = spam_log_add(core_spamstats.score_key, EXCLUDED.score_key)
+        RETURNING 1
+    ), bucketed AS (
+        INSERT INTO core_spamhourlycount (target_phone, hour, report_count)
+        SELECT target_phone, date_trunc('hour', reported_at, 'UTC'), count(*)
+        FROM batch
+        GROUP BY 1, 2
+        ON CONFLICT (target_phone, hour)
+        DO UPDATE SET report_count = core_spamhourlycount.report_count + EXCLUDED.report_count
+    )
+    SELECT (SELECT count(*) FROM batch), (SELECT count(*) FROM upserted)
+"""
+
+RECONCILE_SQL = """
+    INSERT INTO core_spamstats (target_phone, report_count, last_reported_at, score_key)
+    SELECT target_phone, count(*), max(reported_at), spam_log_sum(spam_decay_exponent(reported_at))
+    FROM core_spamreport
+    GROUP BY target_phone
+    ON CONFLICT (target_phone)
+    DO UPDATE SET
+        report_count = EXCLUDED.report_count,
+        last_reported_at = EXCLUDED.last_reported_at,
+        score_key = EXCLUDED.score_key
+    WHERE core_spamstats.report_count IS DISTINCT FROM EXCLUDED.report_count
+       OR core_spamstats.last_reported_at IS DISTINCT FROM EXCLUDED.last_reported_at
+       -- Summing the same weights in another order may differ in the last bits.
+       OR core_spamstats.score_key IS NULL
+       OR abs(core_spamstats.score_key - EXCLUDED.score_key) > 1e-9
+"""
+
+REBUILD_HOURLY_SQL = """
+    INSERT INTO core_spamhourlycount (target_phone, hour, report_count)
+    SELECT target_phone, date_trunc('hour', reported_at, 'UTC'), count(*)
+    FROM core_spamreport
+    WHERE reported_at >= date_trunc('hour', now(), 'UTC') - make_interval(hours => %s)
+    GROUP BY 1, 2
+"""
+
+PRUNE_SQL = """
+    DELETE FROM core_spamstats s
+    WHERE NOT EXISTS (SELECT 1 FROM core_spamreport r WHERE r.target_phone = s.target_phone)
+"""
+
+PRUNE_HOURLY_SQL = """
+    DELETE FROM core_spamhourlycount WHERE (target_phone, hour) IN (
+        SELECT target_phone, hour FROM core_spamhourlycount
+        WHERE hour < date_trunc('hour', now(), 'UTC') - make_interval(hours => %s)
+        ORDER BY hour
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# score_key only grows, so the index on it yields numbers in current-score order.
+TOP_SPAMMERS_SQL = """
+    SELECT target_phone, exp(score_key - spam_decay_exponent(now())), report_count, last_reported_at
+    FROM core_spamstats
+    WHERE score_key IS NOT NULL
+    ORDER BY score_key DESC
+    LIMIT %s
+"""
+
+# The current, partial hour counts as one of the `hours`.
+WINDOW_COUNTS_SQL = """
+    SELECT target_phone, sum(report_count)
+    FROM core_spamhourlycount
+    WHERE target_phone = ANY(%s)
+      AND hour > date_trunc('hour', now(), 'UTC') - make_interval(hours => %s)
+    GROUP BY target_phone
+"""
+
+
+# -------------------- Aggregation Mode --------------------
+def get_aggregation_mode():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            # tgparentid = 0 skips the per-partition clones of a partitioned table's triggers.
+            "SELECT tgenabled FROM pg_trigger WHERE tgname = %s AND NOT tgisinternal AND tgparentid = 0",
+            [DEFERRED_TRIGGER],
+        )
+        row = cursor.fetchone()
+    return DEFERRED if row and row[0] != 'D' else IMMEDIATE
+
+
+def set_aggregation_mode(mode):
+    if mode == DEFERRED:
+        enable, disable = DEFERRED_TRIGGER, IMMEDIATE_TRIGGER
+    else:
+        enable, disable = IMMEDIATE_TRIGGER, DEFERRED_TRIGGER
+    with transaction.atomic(), connection.cursor() as cursor:
+        # ALTER TABLE refuses to run while deferred FK checks from this transaction are pending.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"ALTER TABLE core_spamreport ENABLE TRIGGER {enable}")
+        cursor.execute(f"ALTER TABLE core_spamreport DISABLE TRIGGER {disable}")
+    if mode == IMMEDIATE:
+        # Reports queued before the switch still have to be counted.
+        drain_pending_reports()
+
+
+# -------------------- Write-behind Aggregation --------------------
+def fold_pending_reports(batch_size):
+    """Fold up to `batch_size` queued reports into SpamStats. Returns (reports, phones) folded."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(FOLD_SQL, [batch_size])
+        return cursor.fetchone()
+
+
+def drain_pending_reports(batch_size=None):
+    batch_size = batch_size or settings.SPAM_AGGREGATION['BATCH_SIZE']
+    total = 0
+    while True:
+        reports, _ = fold_pending_reports(batch_size)
+        total += reports
+        if reports < batch_size:
+            return total
+
+
+def aggregation_status():
+    mode = get_aggregation_mode()
+    oldest = PendingSpamReport.objects.order_by('id').values_list('reported_at', flat=True).first()
+    return {
+        "mode": mode,
+        # Counts are at most this old while the aggregator keeps up with its interval.
+        "staleness_bound_seconds": settings.SPAM_AGGREGATION['INTERVAL'] if mode == DEFERRED else 0,
+        "staleness_seconds": (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+        "pending_reports": PendingSpamReport.objects.count() if oldest else 0,
+    }
+
+
+def reconcile_spam_stats():
+    """Rebuild SpamStats and the retained SpamHourlyCount rows from SpamReport.
+
+    Returns (SpamStats rows upserted, SpamStats rows removed).
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Block new reports so the rebuild and the queue reset see the same set of rows.
+        cursor.execute("LOCK TABLE core_spamreport IN SHARE MODE")
+        cursor.execute("DELETE FROM core_pendingspamreport")
+        cursor.execute(RECONCILE_SQL)
+        upserted = cursor.rowcount
+        cursor.execute(PRUNE_SQL)
+        removed = cursor.rowcount
+        cursor.execute("DELETE FROM core_spamhourlycount")
+        cursor.execute(REBUILD_HOURLY_SQL, [settings.SPAM_SCORING['RETENTION_HOURS']])
+        return upserted, removed
+
+
+# -------------------- Scores and Windows --------------------
+def top_spammers(limit):
+    """The `limit` numbers with the highest decayed score right now, highest first.
+
+    Returns (phone, score, report_count, last_reported_at) tuples. A report
+    counts 1 when made and half as much for every 24 hours since (the
+    half-life built into spam_decay_exponent, migration 0013).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TOP_SPAMMERS_SQL, [limit])
+        return cursor.fetchall()
+
+
+def window_report_counts(phones, hours):
+    """Reports per number over the last `hours` whole hours (including the current one), from SpamHourlyCount."""
+    if not phones:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(WINDOW_COUNTS_SQL, [list(phones), hours])
+        return dict(cursor.fetchall())
+
+
+def prune_hourly_counts(retention_hours, batch_size):
+    """Delete SpamHourlyCount rows older than `retention_hours`, oldest first. Yields rows deleted per batch."""
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(PRUNE_HOURLY_SQL, [retention_hours, batch_size])
+            deleted = cursor.rowcount
+        if not deleted:
+            return
+        yield deleted
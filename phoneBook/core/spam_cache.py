@@ -0,0 +1,211 @@
+# core/spam_cache.py
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from core.background import Refresher
+from core.metrics import registry
+from core.models import SpamStats
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPAM_CACHE = {
+    'MAX_ENTRIES': 50000,
+    'TTL': 60,
+    'REBUILD_INTERVAL': 300,
+    'FALSE_POSITIVE_RATE': 0.01,
+}
+
+
+# -------------------- Bloom Filter --------------------
+class BloomFilter:
+    """Fixed-size set membership with no false negatives, using double hashing over one blake2b digest."""
+
+    def __init__(self, capacity, false_positive_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+# -------------------- Spam Count Cache --------------------
+class SpamCountCache:
+    """Read-through cache of SpamStats.report_count per phone.
+
+    A Bloom filter of every reported number answers "never reported" (count 0)
+    without a query; counts for reported numbers live in a bounded LRU for TTL
+    seconds. Reports made through this process update both at once; reports
+    made elsewhere show up after at most TTL (known counts) or REBUILD_INTERVAL
+    (first report of a number) seconds.
+
+    Building the filter reads every SpamStats row, so it always runs in a
+    background thread; until the first build finishes, every number is looked
+    up (and cached) as if the filter had matched it.
+    """
+
+    def __init__(self, ttl, max_entries, rebuild_interval, false_positive_rate):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.rebuild_interval = rebuild_interval
+        self.false_positive_rate = false_positive_rate
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._filter = None
+        self._rebuilding = False
+        self._reported_during_rebuild = set()
+        self._refresher = Refresher(self._build_filter, rebuild_interval, "Spam Bloom filter rebuild")
+
+    # ---- Bloom filter lifecycle ----
+    def rebuild(self):
+        self._refresher.refresh()
+
+    def _build_filter(self):
+        with self._lock:
+            self._rebuilding = True
+            self._reported_during_rebuild = set()
+        try:
+            phones = list(SpamStats.objects.values_list('target_phone', flat=True).iterator(chunk_size=10000))
+            bloom = BloomFilter(len(phones) * 2, self.false_positive_rate)
+            for phone in phones:
+                bloom.add(phone)
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+            raise
+        with self._lock:
+            # Reports recorded while the table was being read may be missing from it.
+            for phone in self._reported_during_rebuild:
+                bloom.add(phone)
+            self._filter = bloom
+            self._rebuilding = False
+        logger.info("Spam Bloom filter rebuilt: %d numbers, %d bytes", len(phones), len(bloom.bits))
+
+    # ---- Lookups ----
+    def counts(self, phones):
+        """Map each phone to its spam report count, querying only numbers the cache cannot answer."""
+        self._refresher.maybe_refresh(wait=False)
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self._lock:
+            bloom = self._filter
+            for phone in phones:
+                if phone in result:
+                    continue
+                if bloom is not None and phone not in bloom:
+                    self.negative_hits += 1
+                    result[phone] = 0
+                    continue
+                entry = self._entries.get(phone)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(phone)
+                    self.hits += 1
+                    result[phone] = entry[0]
+                else:
+                    self.misses += 1
+                    missing.append(phone)
+
+        if missing:
+            found = dict(
+                SpamStats.objects.filter(target_phone__any=missing).values_list('target_phone', 'report_count')
+            )
+            with self._lock:
+                for phone in missing:
+                    # Bloom false positives are cached as 0 too.
+                    result[phone] = found.get(phone, 0)
+                    self._entries[phone] = (result[phone], now + self.ttl)
+                    self._entries.move_to_end(phone)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def count(self, phone):
+        return self.counts([phone])[phone]
+
+    # ---- Invalidation ----
+    def reported(self, phone):
+        """A new SpamReport for `phone`: make the number visible to the filter and drop its stale count."""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(phone)
+            if self._rebuilding:
+                self._reported_during_rebuild.add(phone)
+            self._entries.pop(phone, None)
+
+    def invalidate(self, phone):
+        with self._lock:
+            self._entries.pop(phone, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._filter = None
+            self._refresher.forget()
+            self.hits = self.negative_hits = self.misses = 0
+
+    def stats(self):
+        answered = self.hits + self.negative_hits
+        lookups = answered + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": answered / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "filter_bytes": len(self._filter.bits) if self._filter is not None else 0,
+        }
+
+
+_spam_cache = None
+
+
+def get_spam_cache():
+    global _spam_cache
+    if _spam_cache is None:
+        config = {**DEFAULT_SPAM_CACHE, **getattr(settings, 'SPAM_CACHE', {})}
+        _spam_cache = SpamCountCache(config['TTL'], config['MAX_ENTRIES'], config['REBUILD_INTERVAL'],
+                                     config['FALSE_POSITIVE_RATE'])
+    return _spam_cache
+
+
+def reset_spam_cache():
+    global _spam_cache
+    _spam_cache = None
+
+
+def collect_metrics():
+    if _spam_cache is None:
+        return
+    stats = _spam_cache.stats()
+    yield ('phonebook_spam_cache_hits_total', 'counter', "Spam counts answered from the LRU.",
+           [({}, stats['hits'])])
+    yield ('phonebook_spam_cache_negative_hits_total', 'counter',
+           "Spam counts answered as zero by the Bloom filter.", [({}, stats['negative_hits'])])
+    yield ('phonebook_spam_cache_misses_total', 'counter', "Spam counts read from the database.",
+           [({}, stats['misses'])])
+    yield ('phonebook_spam_cache_hit_ratio', 'gauge', "Share of spam count lookups answered without a query.",
+           [({}, stats['hit_ratio'])])
+
+
+registry.register_collector(collect_metrics)
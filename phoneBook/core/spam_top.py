@@ -0,0 +1,79 @@
+# core/spam_top.py
+
+from core.background import Refresher
+from core.metrics import registry
+from core.spam import top_spammers, window_report_counts
+from django.conf import settings
+from django.utils import timezone
+
+
+class SpamLeaderboard:
+    """In-process copy of the `size` numbers with the highest decayed spam score.
+
+    Recomputing it is one index scan of `size` SpamStats rows plus one
+    SpamHourlyCount lookup for their `window_hours` counts. It runs inline the
+    first time and every `refresh_interval` seconds afterwards in a background
+    thread, so serving the top N is a slice of a prebuilt tuple. Entries are
+    as of `computed_at`.
+    """
+
+    def __init__(self, size, window_hours, refresh_interval):
+        self.size = size
+        self.window_hours = window_hours
+        self.refresh_interval = refresh_interval
+        self.computed_at = None
+        self._entries = ()
+        self._refresher = Refresher(self._load, refresh_interval, "Spam leaderboard refresh")
+
+    def refresh(self):
+        self._refresher.refresh()
+
+    def _load(self):
+        computed_at = timezone.now()
+        rows = top_spammers(self.size)
+        recent = window_report_counts([row[0] for row in rows], self.window_hours)
+        entries = tuple(
+            {
+                "phone_number": phone,
+                "spam_score": round(score, 3),
+                "report_count": report_count,
+                "recent_report_count": recent.get(phone, 0),
+                "last_reported_at": last_reported_at,
+            }
+            for phone, score, report_count, last_reported_at in rows
+        )
+        self._entries, self.computed_at = entries, computed_at
+
+    def top(self, limit):
+        self._refresher.maybe_refresh()
+        return self._entries[:limit]
+
+    def age(self):
+        return self._refresher.age()
+
+
+_leaderboard = None
+
+
+def get_spam_leaderboard():
+    global _leaderboard
+    if _leaderboard is None:
+        config = settings.SPAM_SCORING
+        _leaderboard = SpamLeaderboard(config['TOP_SIZE'], config['WINDOW_HOURS'], config['TOP_REFRESH'])
+    return _leaderboard
+
+
+def reset_spam_leaderboard():
+    global _leaderboard
+    _leaderboard = None
+
+
+def collect_metrics():
+    age = _leaderboard.age() if _leaderboard is not None else None
+    if age is None:
+        return
+    yield ('phonebook_spam_leaderboard_age_seconds', 'gauge', "Seconds since the spam leaderboard was recomputed.",
+           [({}, age)])
+
+
+registry.register_collector(collect_metrics)
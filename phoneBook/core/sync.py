@@ -0,0 +1,274 @@
+# core/sync.py
+
+import codecs
+import itertools
+import json
+import time
+
+from core.models import Contact
+from core.validators import Validator
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Longest single entry (array element or NDJSON line) a parser buffers while
+# waiting for its end. Counted in decoded characters, so at most four times as
+# many UTF-8 bytes.
+DEFAULT_MAX_ITEM_BYTES = 4096
+
+# Sent after a sync commits with `user`, `upserted` ({phone: name}) and `deleted` ([phone]).
+# The sync writes with raw SQL, so Contact's post_save/post_delete do not fire.
+contacts_synced = Signal()
+
+
+class SyncError(ValueError):
+    pass
+
+
+# -------------------- Streaming Parsers --------------------
+def _iter_text(stream, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(chunk)
+
+
+def _entry_too_large(max_item_bytes):
+    return SyncError(f"A contact entry is longer than {max_item_bytes} bytes.")
+
+
+def iter_json_array(stream, chunk_size=DEFAULT_CHUNK_SIZE, max_item_bytes=DEFAULT_MAX_ITEM_BYTES):
+    """Yield the elements of a top-level JSON array without reading the whole body.
+
+    The consumed prefix is dropped once per chunk, and at most
+    `max_item_bytes` of an unfinished element are kept, so an incomplete
+    element is re-parsed over a bounded buffer.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    state = 'start'  # start -> item -> separator -> item ... -> done
+
+    for text in _iter_text(stream, chunk_size):
+        buffer = buffer[pos:] + text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos == len(buffer):
+                break
+
+            if state == 'start':
+                if buffer[pos] != '[':
+                    raise SyncError("Expected a JSON array of contacts.")
+                pos += 1
+                state = 'first'
+            elif state in ('first', 'item'):
+                if state == 'first' and buffer[pos] == ']':
+                    pos += 1
+                    state = 'done'
+                    continue
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # incomplete element, wait for more input
+                if end - pos > max_item_bytes:
+                    raise _entry_too_large(max_item_bytes)
+                pos = end
+                state = 'separator'
+                yield item
+            elif state == 'separator':
+                if buffer[pos] == ',':
+                    state = 'item'
+                elif buffer[pos] == ']':
+                    state = 'done'
+                else:
+                    raise SyncError("Malformed JSON array.")
+                pos += 1
+            else:
+                raise SyncError("Unexpected data after JSON array.")
+        if len(buffer) - pos > max_item_bytes:
+            raise _entry_too_large(max_item_bytes)
+
+    if state != 'done':
+        raise SyncError("Malformed or truncated JSON array.")
+
+
+def iter_ndjson(stream, chunk_size=DEFAULT_CHUNK_SIZE, max_item_bytes=DEFAULT_MAX_ITEM_BYTES):
+    """Yield one decoded object per non-empty line of at most `max_item_bytes`."""
+    pending = []  # pieces of the unfinished line, joined once it ends
+    pending_size = 0
+    for text in _iter_text(stream, chunk_size):
+        *lines, tail = text.split('\n')
+        if lines:
+            lines[0] = ''.join(pending) + lines[0]
+            pending, pending_size = [], 0
+        for line in lines:
+            if len(line) > max_item_bytes:
+                raise _entry_too_large(max_item_bytes)
+            if line.strip():
+                yield _decode_line(line)
+        pending.append(tail)
+        pending_size += len(tail)
+        if pending_size > max_item_bytes:
+            raise _entry_too_large(max_item_bytes)
+    line = ''.join(pending)
+    if line.strip():
+        yield _decode_line(line)
+
+
+def _decode_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        raise SyncError("Malformed NDJSON line.")
+
+
+def iter_contact_entries(stream, content_type, chunk_size=DEFAULT_CHUNK_SIZE, max_item_bytes=DEFAULT_MAX_ITEM_BYTES):
+    if stream is None:
+        return iter(())
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        return iter_ndjson(stream, chunk_size, max_item_bytes)
+    return iter_json_array(stream, chunk_size, max_item_bytes)
+
+
+# -------------------- Contact Sync --------------------
+UPSERT_SQL = """
+    INSERT INTO core_contact (user_id, contact_phone, contact_name, created_at)
+    SELECT %s, t.phone, t.name, now()
+    FROM unnest(%s::varchar[], %s::varchar[]) AS t(phone, name)
+    ON CONFLICT (user_id, contact_phone)
+    DO UPDATE SET contact_name = EXCLUDED.contact_name
+"""
+
+DELETE_SQL = """
+    DELETE FROM core_contact
+    WHERE user_id = %s AND contact_phone = ANY(%s::varchar[])
+"""
+
+
+def _entry_fields(entry):
+    """(name, raw phone) of an uploaded entry; either is None when missing or invalid."""
+    if not isinstance(entry, dict):
+        return None, None
+    name = entry.get('name')
+    phone = entry.get('phone_number')
+    name = name.strip() if isinstance(name, str) else None
+    if not name or len(name) > 100:
+        name = None
+    return name, phone if isinstance(phone, str) else None
+
+
+def clean_entries(entries):
+    """Validate a chunk of entries. Yields (offset, phone, name) for valid ones, None for invalid ones."""
+    fields = [_entry_fields(entry) for entry in entries]
+    phones, _ = Validator.normalize_phones([phone for _, phone in fields])
+    for offset, ((name, _), phone) in enumerate(zip(fields, phones)):
+        yield (offset, phone, name) if name and phone else (offset, None, None)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class ContactSync:
+    """Diffs an uploaded address book against a user's contacts and applies it in batches."""
+
+    def __init__(self, user, batch_size=1000, max_contacts=50000, prune=True):
+        self.user = user
+        self.batch_size = batch_size
+        self.max_contacts = max_contacts
+        self.prune = prune
+        self.report = {
+            "received": 0,
+            "inserted": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "deleted": 0,
+            "invalid_rows": [],
+            "batches": [],
+        }
+
+    def run(self, entries):
+        with transaction.atomic():
+            existing = dict(
+                Contact.objects
+                .filter(user=self.user)
+                .values_list('contact_phone', 'contact_name')
+                .iterator(chunk_size=self.batch_size)
+            )
+            original = set(existing)
+            seen = set()
+            changed = set()
+            pending = {}
+
+            received = 0
+            for chunk in _chunks(entries, self.batch_size):
+                if received + len(chunk) > self.max_contacts:
+                    raise SyncError(f"Too many contacts; the limit is {self.max_contacts}.")
+                for offset, phone, name in clean_entries(chunk):
+                    if phone is None:
+                        self.report["invalid_rows"].append(received + offset)
+                        continue
+                    if phone == self.user.phone_number:
+                        continue
+
+                    seen.add(phone)
+                    current = pending.get(phone, existing.get(phone))
+                    if current == name:
+                        continue
+                    pending[phone] = name
+                    changed.add(phone)
+                    if len(pending) >= self.batch_size:
+                        self._upsert(pending, existing)
+                        pending = {}
+                received += len(chunk)
+            self.report["received"] = received
+
+            if pending:
+                self._upsert(pending, existing)
+
+            self.report["inserted"] = len(changed - original)
+            self.report["updated"] = len(changed & original)
+            self.report["unchanged"] = len(seen & original) - self.report["updated"]
+            stale = [phone for phone in original if phone not in seen] if self.prune else []
+            for start in range(0, len(stale), self.batch_size):
+                self._delete(stale[start:start + self.batch_size])
+
+            upserted = {phone: existing[phone] for phone in changed}
+            transaction.on_commit(lambda: contacts_synced.send(
+                sender=ContactSync, user=self.user, upserted=upserted, deleted=stale,
+            ))
+
+        return self.report
+
+    def _upsert(self, pending, existing):
+        phones = list(pending)
+        names = [pending[phone] for phone in phones]
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(UPSERT_SQL, [self.user.pk, phones, names])
+        self._record("upsert", len(phones), started)
+        existing.update(pending)
+
+    def _delete(self, phones):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(DELETE_SQL, [self.user.pk, phones])
+        self._record("delete", len(phones), started)
+        self.report["deleted"] += len(phones)
+
+    def _record(self, operation, rows, started):
+        self.report["batches"].append({
+            "operation": operation,
+            "rows": rows,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+        })
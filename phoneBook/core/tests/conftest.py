@@ -0,0 +1,30 @@
+import pytest
+
+from core.admission import reset_admission_controller
+from core.authentication import reset_deny_list, reset_token_cache
+from core.autocomplete import reset_index
+from core.replicas import reset_replica_monitor
+from core.spam_cache import reset_spam_cache
+from core.spam_top import reset_spam_leaderboard
+from core.visibility import reset_visibility_cache
+
+PROCESS_SINGLETONS = (
+    reset_admission_controller,
+    reset_deny_list,
+    reset_index,
+    reset_replica_monitor,
+    reset_spam_cache,
+    reset_spam_leaderboard,
+    reset_token_cache,
+    reset_visibility_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_singletons():
+    """Start and end every test without the process-wide caches and indexes another test built."""
+    for reset in PROCESS_SINGLETONS:
+        reset()
+    yield
+    for reset in PROCESS_SINGLETONS:
+        reset()
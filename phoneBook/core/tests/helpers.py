@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, User
+
+
+def make_user(phone, name, email=None):
+    return User.objects.create_user(phone_number=phone, name=name, password="pass123", email=email)
+
+
+def auth_client(user):
+    token = AuthToken.objects.create(user=user, expires_at=timezone.now() + timedelta(days=1))
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.token}")
+    return client
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+
+import pytest
+from rest_framework.test import APIClient
+
+from core.admission import (
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    RATE_LIMITED,
+    DEFAULT_ADMISSION,
+    Gate,
+    TokenBuckets,
+    admission_config,
+    get_admission_controller,
+    reset_admission_controller,
+)
+from core.authentication import issue_token
+from core.metrics import registry
+from core.models import Contact, User
+from core.tests.helpers import auth_client, make_user
+
+
+@pytest.fixture
+def admission(settings):
+    """Override one endpoint class's limits for the test: admission(search={'RATE': 1.0, ...})."""
+    def configure(**overrides):
+        config = admission_config()
+        classes = {name: {**endpoint, **overrides.get(name, {})} for name, endpoint in config['CLASSES'].items()}
+        settings.ADMISSION = {**config, 'CLASSES': classes}
+        reset_admission_controller()
+        return get_admission_controller()
+
+    yield configure
+    reset_admission_controller()
+
+
+def test_settings_override_single_limits_of_the_default_classes(settings):
+    settings.ADMISSION = {'MAX_BUCKETS': 10, 'CLASSES': {'search': {'MAX_CONCURRENT': 2}, 'bulk': {'VIEWS': []}}}
+    config = admission_config()
+    assert config['ENABLED'] and config['MAX_BUCKETS'] == 10
+    assert config['CLASSES']['search'] == {**DEFAULT_ADMISSION['CLASSES']['search'], 'MAX_CONCURRENT': 2}
+    assert config['CLASSES']['lookup'] == DEFAULT_ADMISSION['CLASSES']['lookup']
+    assert config['CLASSES']['bulk'] == {'VIEWS': []}
+
+
+def test_gate_hands_a_released_slot_to_the_oldest_waiter():
+    gate = Gate(limit=1, timeout=5, max_waiting=1)
+    assert gate.acquire() is None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(gate.acquire()))
+    waiter.start()
+    while not gate.waiting:
+        pass
+    assert gate.acquire() == QUEUE_FULL
+
+    gate.release()
+    waiter.join()
+    assert results == [None]
+    assert gate.active == 1
+    gate.release()
+    assert gate.active == 0
+    assert gate.shed[QUEUE_FULL] == 1
+
+
+def test_gate_times_out_queued_requests():
+    gate = Gate(limit=1, timeout=0.01, max_waiting=4)
+    assert gate.acquire() is None
+    assert gate.acquire() == QUEUE_TIMEOUT
+    assert gate.waiting == 0
+    assert gate.shed[QUEUE_TIMEOUT] == 1
+
+
+def test_gate_admits_coroutines_released_from_other_threads():
+    gate = Gate(limit=1, timeout=5, max_waiting=4)
+    assert gate.acquire() is None
+
+    async def main():
+        waiting = asyncio.ensure_future(gate.aacquire())
+        while not gate.waiting:
+            await asyncio.sleep(0)
+        threading.Thread(target=gate.release).start()
+        return await waiting
+
+    assert asyncio.run(main()) is None
+    assert gate.active == 1 and gate.admitted == 2
+
+
+def test_token_buckets_refill_at_the_configured_rate():
+    buckets = TokenBuckets(rate=1.0, burst=2, max_keys=1)
+    assert buckets.take("a") == 0.0
+    assert buckets.take("a") == 0.0
+    assert 0.9 < buckets.take("a") <= 1.0
+    assert buckets.take("b") == 0.0
+    assert len(buckets) == 1
+
+
+@pytest.mark.django_db
+def test_overflow_gets_a_fast_429_or_503_with_retry_after(admission, settings):
+    settings.METRICS = {'PUBLIC': True}
+    registry.reset()
+    controller = admission(search={'RATE': 0.5, 'BURST': 1}, lookup={'MAX_CONCURRENT': 0, 'MAX_WAITING': 0})
+    user = User.objects.create_user(phone_number="+919000000001", name="Ravi", password="pass123")
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_token(user).token}")
+
+    assert client.get("/api/search/name/", {"q": "ra"}).status_code == 200
+    response = client.get("/api/search/name/", {"q": "ra"})
+    assert response.status_code == 429
+    assert response["Retry-After"] == "2"
+    assert response.json() == {"error": "Too many requests"}
+
+    response = client.get("/api/search/phone/", {"q": "+919000000001"})
+    assert response.status_code == 503
+    assert response["Retry-After"] == "1"
+
+    # Other endpoint classes are unaffected.
+    assert client.get("/api/profile/").status_code == 200
+    assert controller.classes['search'].gate.shed[RATE_LIMITED] == 1
+    assert controller.classes['search'].gate.active == 0
+
+    body = client.get("/metrics").content.decode()
+    assert 'phonebook_admission_shed_total{class="search",reason="rate_limited"} 1' in body
+    assert 'phonebook_admission_shed_total{class="lookup",reason="queue_full"} 1' in body
+    assert 'phonebook_responses_total{view="SearchByNameView",status="429"} 1' in body
+
+
+@pytest.mark.django_db
+def test_streaming_responses_hold_their_slot_until_the_body_is_sent(admission):
+    gate = admission(default={'MAX_CONCURRENT': 1, 'MAX_WAITING': 0}).classes['default'].gate
+    user = make_user("+919000000001", "Ravi")
+    Contact.objects.create(user=user, contact_phone="+919111111111", contact_name="Plumber")
+    client = auth_client(user)
+
+    export = client.get("/api/contacts/export/")
+    assert export.status_code == 200 and gate.active == 1
+    assert client.get("/api/contacts/export/").status_code == 503
+
+    assert b"Plumber" in b"".join(export.streaming_content)
+    assert gate.active == 0
+    assert client.get("/api/profile/").status_code == 200
@@ -0,0 +1,203 @@
+import pytest
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import (
+    LocalTokenCache,
+    SharedTokenCache,
+    aresolve_token,
+    get_deny_list,
+    get_token_cache,
+    reset_deny_list,
+    resolve_token
+)
+from core.models import AuthToken, RevokedToken, User
+
+
+def test_local_token_cache_evicts_least_recently_used():
+    cache = LocalTokenCache(ttl=300, max_entries=2)
+    expires_at = timezone.now() + timedelta(days=1)
+    cache.set("a", SimpleNamespace(pk=1), expires_at)
+    cache.set("b", SimpleNamespace(pk=2), expires_at)
+    assert cache.get("a").pk == 1
+
+    cache.set("c", SimpleNamespace(pk=3), expires_at)
+    assert cache.get("b") is None
+    assert cache.get("a").pk == 1
+    assert cache.get("c").pk == 3
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_local_token_cache_ttl_is_bounded_by_token_expiry():
+    cache = LocalTokenCache(ttl=300, max_entries=10)
+    cache.set("expired", SimpleNamespace(pk=1), timezone.now() - timedelta(seconds=1))
+    assert cache.get("expired") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_local_token_cache_invalidate_user():
+    cache = LocalTokenCache(ttl=300, max_entries=10)
+    expires_at = timezone.now() + timedelta(days=1)
+    cache.set("a", SimpleNamespace(pk=1), expires_at)
+    cache.set("b", SimpleNamespace(pk=1), expires_at)
+    cache.set("c", SimpleNamespace(pk=2), expires_at)
+    cache.invalidate_user(1)
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c").pk == 2
+
+
+def test_shared_token_cache_invalidate_user_reaches_every_token():
+    cache = SharedTokenCache(ttl=300, cache_alias='default')
+    expires_at = timezone.now() + timedelta(days=1)
+    cache.set("shared-a", SimpleNamespace(pk=1), expires_at)
+    cache.set("shared-b", SimpleNamespace(pk=1), expires_at)
+    cache.set("shared-c", SimpleNamespace(pk=2), expires_at)
+    cache.invalidate_user(1)
+    assert cache.get("shared-a") is None
+    assert cache.get("shared-b") is None
+    assert cache.get("shared-c").pk == 2
+
+    # A login after the invalidation is cached again; losing the generation fails closed.
+    cache.set("shared-a", SimpleNamespace(pk=1), expires_at)
+    assert cache.get("shared-a").pk == 1
+    cache.cache.delete(cache._generation_key(1))
+    assert cache.get("shared-a") is None
+
+
+def test_resolve_token_rejects_malformed_values():
+    assert resolve_token("not-a-uuid") is None
+
+
+@pytest.mark.django_db
+def test_hot_token_resolves_without_queries():
+    user = User.objects.create_user(phone_number="+919000000000", name="Cached", password="pass123")
+    token = AuthToken.objects.create(user=user, expires_at=timezone.now() + timedelta(days=1))
+
+    with CaptureQueriesContext(connection) as cold:
+        assert resolve_token(str(token.token)) == user
+    assert len(cold.captured_queries) == 1
+
+    with CaptureQueriesContext(connection) as hot:
+        assert resolve_token(str(token.token)) == user
+    assert len(hot.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_logout_invalidates_cached_token():
+    user = User.objects.create_user(phone_number="+919000000001", name="Leaving", password="pass123")
+    token = AuthToken.objects.create(user=user, expires_at=timezone.now() + timedelta(days=1))
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.token}")
+
+    assert client.get("/api/profile/").status_code == 200
+    assert client.post("/api/logout/").status_code == 200
+    assert get_token_cache().get(str(token.token)) is None
+    assert client.get("/api/profile/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_login_reuses_a_live_token_and_replaces_one_close_to_expiry(settings):
+    settings.AUTH_TOKENS = {'REUSE_MIN_REMAINING': 3600}
+    user = User.objects.create_user(phone_number="+919000000002", name="Returning", password="pass123")
+    client = APIClient()
+    credentials = {"phone_number": user.phone_number, "password": "pass123"}
+
+    first = client.post("/api/login/", credentials, format="json").data["token"]
+    assert client.post("/api/login/", credentials, format="json").data["token"] == first
+    assert AuthToken.objects.filter(user=user).count() == 1
+
+    AuthToken.objects.filter(token=first).update(expires_at=timezone.now() + timedelta(minutes=30))
+    assert client.post("/api/login/", credentials, format="json").data["token"] != first
+    assert AuthToken.objects.filter(user=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_purge_tokens_deletes_only_expired_tokens_in_batches():
+    user = User.objects.create_user(phone_number="+919000000003", name="Purged", password="pass123")
+    now = timezone.now()
+    AuthToken.objects.bulk_create(
+        [AuthToken(user=user, expires_at=now - timedelta(hours=i + 1)) for i in range(5)]
+        + [AuthToken(user=user, expires_at=now + timedelta(days=1))]
+    )
+
+    out = StringIO()
+    call_command("purge_tokens", "--batch-size", "2", stdout=out)
+    assert "Purged 5 expired rows of core_authtoken in 3 batches" in out.getvalue()
+    assert list(AuthToken.objects.filter(user=user).values_list("expires_at", flat=True)) == [
+        now + timedelta(days=1)
+    ]
+
+
+@pytest.fixture
+def signed_auth(settings):
+    settings.AUTH = {'MODE': 'jwt', 'DENY_LIST_REFRESH': 30}
+    reset_deny_list()
+    yield
+    reset_deny_list()
+
+
+def jwt_login(user):
+    response = APIClient().post("/api/login/", {"phone_number": user.phone_number, "password": "pass123"},
+                                format="json")
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.mark.django_db
+def test_signed_tokens_authenticate_without_queries(signed_auth):
+    user = User.objects.create_user(phone_number="+919000000004", name="Signed", password="pass123",
+                                    email="signed@example.com")
+    tokens = jwt_login(user)
+    assert not AuthToken.objects.filter(user=user).exists()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['token']}")
+
+    client.get("/api/profile/")  # loads the deny-list
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/api/profile/")
+        resolved = async_to_sync(aresolve_token)(tokens["token"])
+    assert response.data == {"name": "Signed", "phone_number": "+919000000004", "email": "signed@example.com"}
+    assert resolved.pk == user.pk
+    assert len(queries.captured_queries) == 0
+    assert resolve_token(tokens["refresh"]) is None
+    assert resolve_token(tokens["token"][:-2]) is None
+
+
+@pytest.mark.django_db
+def test_signed_logout_revokes_access_and_refresh_tokens(signed_auth):
+    user = User.objects.create_user(phone_number="+919000000005", name="Revoked", password="pass123")
+    tokens = jwt_login(user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['token']}")
+
+    refreshed = client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+    assert refreshed.status_code == 200
+    assert resolve_token(refreshed.data["token"]).pk == user.pk
+
+    assert client.post("/api/logout/", {"refresh": tokens["refresh"]}, format="json").status_code == 200
+    assert client.get("/api/profile/").status_code == 401
+    assert client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json").status_code == 401
+    assert RevokedToken.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_deny_list_picks_up_revocations_from_other_processes_on_refresh(signed_auth):
+    user = User.objects.create_user(phone_number="+919000000006", name="Elsewhere", password="pass123")
+    tokens = jwt_login(user)
+    assert resolve_token(tokens["token"]).pk == user.pk
+
+    access = AccessToken(tokens["token"])
+    RevokedToken.objects.create(jti=access["jti"], expires_at=timezone.now() + timedelta(minutes=5))
+    assert resolve_token(tokens["token"]) is not None
+    get_deny_list().refresh()
+    assert resolve_token(tokens["token"]) is None
@@ -0,0 +1,149 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.autocomplete import PrefixIndex, SortedPairs, get_index, loaded_index
+from core.models import Contact, User
+from core.spam_cache import get_spam_cache
+from core.sync import ContactSync
+from core.tests.helpers import auth_client, make_user
+
+AUTOCOMPLETE_URL = "/api/search/autocomplete/"
+
+
+def names(results):
+    return [r["name"] for r in results]
+
+
+def test_prefix_index_completes_word_starts_and_dedupes_by_phone():
+    index = PrefixIndex()
+    index.put(("user", 1), "Vikram Kumar", "+919000000001")
+    index.put(("user", 2), "Kumari Iyer", "+919000000002")
+    index.put(("contact", 1, "+919000000002"), "Kumari (work)", "+919000000002")
+    index.put(("contact", 1, "+919111111111"), "Kumar Cabs", "+919111111111")
+    index.put(("contact", 2, "+919111111111"), "Kumar Taxi", "+919111111111")
+
+    # Shorter completions first: "kumar" (end of "Vikram Kumar") sorts before "kumar cabs".
+    assert names(index.complete("kum", 10)) == ["Vikram Kumar", "Kumar Cabs", "Kumari Iyer"]
+    assert names(index.complete("KUMARI", 10)) == ["Kumari Iyer"]
+    assert names(index.complete("kum", 1)) == ["Vikram Kumar"]
+
+    index.remove(("contact", 1, "+919111111111"))
+    assert names(index.complete("kumar c", 10)) == []
+    assert names(index.complete("kumar t", 10)) == ["Kumar Taxi"]
+
+    index.put(("user", 1), "Vickram", "+919000000001")
+    assert names(index.complete("vi", 10)) == ["Vickram"]
+    assert len(index) == 7  # one key per word start
+
+
+def test_sorted_pairs_splits_and_drops_chunks(monkeypatch):
+    monkeypatch.setattr(SortedPairs, "LOAD", 4)
+    pairs = SortedPairs([(f"k{i:03d}", i) for i in range(0, 40, 2)])
+    for i in range(1, 40, 2):
+        pairs.insert(f"k{i:03d}", i)
+    pairs.insert("k005", "dup")
+    assert len(pairs) == 41
+    assert [value for _, value in pairs.iter_from("k038")] == [38, 39]
+    assert [value for _, value in pairs.iter_from("k005")][:3] == [5, "dup", 6]
+    assert max(len(keys) for keys in pairs._keys) <= 8
+
+    assert pairs.remove("k005", "dup") and not pairs.remove("k005", "dup")
+    for i in range(40):
+        assert pairs.remove(f"k{i:03d}", i)
+    assert len(pairs) == 0 and list(pairs.iter_from("")) == [] and pairs._keys == []
+
+
+def test_prefix_index_bounds_the_keys_a_completion_examines():
+    index = PrefixIndex(scan_factor=2)
+    owner = "+919000000001"
+    index.put(("user", 1), "Sam", owner)
+    for i in range(10):
+        # Contact names of a registered number are skipped at query time, but still scanned.
+        index.put(("contact", i + 2, owner), f"Sam {i}", owner)
+    index.put(("contact", 2, "+919111111111"), "Samz Taxi", "+919111111111")
+
+    assert names(index.complete("sam", 1)) == ["Sam"]
+    assert names(index.complete("sam", 5)) == ["Sam"]  # stopped after 10 keys, before "samz taxi"
+    assert names(index.complete("samz", 5)) == ["Samz Taxi"]
+
+
+@pytest.mark.django_db
+def test_autocomplete_endpoint_answers_without_queries():
+    client = auth_client(make_user("+919000000000", "Searcher"))
+    make_user("+919000000001", "Ananya Iyer")
+    owner = make_user("+919000000002", "Owner")
+    Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name="Anand Plumber")
+
+    client.get("/api/profile/")  # warm the token cache
+    get_index()
+    get_spam_cache().rebuild()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(AUTOCOMPLETE_URL, {"q": "ana"})
+    assert response.status_code == 200
+    assert len(queries.captured_queries) == 0
+    assert response.data == [
+        {"name": "Anand Plumber", "phone_number": "+919111111111", "is_registered_user": False,
+         "spam_report_count": 0},
+        {"name": "Ananya Iyer", "phone_number": "+919000000001", "is_registered_user": True,
+         "spam_report_count": 0},
+    ]
+    assert client.get(AUTOCOMPLETE_URL, {"q": "ana", "limit": "x"}).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_autocomplete_index_follows_writes():
+    user = make_user("+919000000001", "Rahul Kapoor")
+    index = get_index()
+    assert loaded_index() is index
+
+    user.name = "Rohan Kapoor"
+    user.save()
+    assert names(index.complete("r", 10)) == ["Rohan Kapoor"]
+
+    ContactSync(user).run([{"name": "Rita Sharma", "phone_number": "+919111111111"}])
+    assert names(index.complete("r", 10)) == ["Rita Sharma", "Rohan Kapoor"]
+
+    User.objects.get(pk=user.pk).delete()
+    assert index.complete("r", 10) == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_autocomplete_index_catches_up_on_other_workers_writes(monkeypatch):
+    monkeypatch.setattr("core.autocomplete.SETTLE_SECONDS", 0)
+    user = make_user("+919000000001", "Rahul Kapoor")
+    index = get_index()
+
+    # Queryset updates send no signals, like writes made by another worker.
+    User.objects.filter(pk=user.pk).update(name="Rohan Kapoor")
+    Contact.objects.bulk_create([Contact(user=user, contact_phone="+919111111111", contact_name="Rita Sharma")])
+    assert names(index.complete("r", 10)) == ["Rahul Kapoor"]
+
+    assert index.catch_up(max_changes=10)
+    assert names(index.complete("r", 10)) == ["Rita Sharma", "Rohan Kapoor"]
+    version = index.version
+    assert index.catch_up(max_changes=10) and index.version == version
+
+    Contact.objects.filter(user=user).delete()
+    User.objects.filter(pk=user.pk).update(name="Ravi Kapoor")
+    assert not index.catch_up(max_changes=1)  # too many changes: the caller rebuilds
+    assert index.catch_up(max_changes=10)
+    assert names(index.complete("r", 10)) == ["Ravi Kapoor"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_asgi_application_imports_inside_an_event_loop(settings, monkeypatch):
+    settings.AUTOCOMPLETE = {**settings.AUTOCOMPLETE, 'LOAD_ON_STARTUP': True}
+    make_user("+919000000001", "Rahul Kapoor")
+    monkeypatch.delitem(sys.modules, "phoneBook.asgi", raising=False)
+
+    async def serve():
+        # uvicorn and daphne import the application with the event loop running.
+        return importlib.import_module("phoneBook.asgi").application
+
+    assert asyncio.run(serve()) is not None
+    assert names(get_index().complete("rah", 10)) == ["Rahul Kapoor"]  # waits for the startup build
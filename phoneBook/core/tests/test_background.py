@@ -0,0 +1,65 @@
+import threading
+
+from core.background import Refresher
+
+
+class InlineThread:
+    """Runs the target when started, so the background work is done before start() returns."""
+
+    def __init__(self, target, daemon):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+def test_refresher_loads_inline_once_then_in_one_background_thread(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("core.background.time.monotonic", lambda: clock[0])
+    loads = []
+    started, release = threading.Event(), threading.Event()
+
+    def load():
+        loads.append(threading.current_thread())
+        if len(loads) > 1:
+            started.set()
+            release.wait(5)
+
+    refresher = Refresher(load, interval=10, description="Test load")
+    refresher.maybe_refresh()
+    refresher.maybe_refresh()
+    assert loads == [threading.current_thread()] and refresher.age() == 0
+
+    clock[0] += 11
+    refresher.maybe_refresh()
+    assert started.wait(5)
+    refresher.maybe_refresh()  # one reload at a time
+    release.set()
+    background = loads[1]
+    background.join(5)
+    assert len(loads) == 2 and background is not threading.current_thread() and background.daemon
+    assert refresher.loaded_at == clock[0]
+
+
+def test_refresher_logs_background_failures_and_retries_after_the_interval(monkeypatch, caplog):
+    clock = [100.0]
+    monkeypatch.setattr("core.background.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("core.background.threading.Thread", InlineThread)
+    calls = []
+
+    def load():
+        calls.append(clock[0])
+        if len(calls) == 2:
+            raise RuntimeError("database is down")
+
+    refresher = Refresher(load, interval=10, description="Test load")
+    refresher.maybe_refresh()
+    clock[0] += 11
+    refresher.maybe_refresh()
+    assert "Test load failed" in caplog.text and refresher.loaded_at == 100.0
+
+    refresher.maybe_refresh()  # too soon after the failed attempt
+    assert len(calls) == 2
+    clock[0] += 11
+    refresher.maybe_refresh()
+    assert len(calls) == 3 and refresher.loaded_at == clock[0]
@@ -0,0 +1,44 @@
+from core.benchmarks.endpoints import SCENARIOS, run_phone, uncovered_routes
+from core.benchmarks.stats import compare, percentile, summarize
+from core.validators import Validator
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [10.0, 20.0, 30.0, 40.0]
+    assert percentile(values, 0) == 10.0
+    assert percentile(values, 50) == 25.0
+    assert percentile(values, 100) == 40.0
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_reports_throughput_and_queries():
+    summary = summarize([1.0, 2.0, 3.0, 4.0], [1, 1, 2, 2], errors=1, elapsed_s=2.0)
+    assert summary["count"] == 4
+    assert summary["errors"] == 1
+    assert summary["rps"] == 2.0
+    assert summary["queries_per_request"] == 1.5
+    assert summary["p50_ms"] == 2.5
+
+
+def test_compare_flags_latency_throughput_and_query_regressions():
+    base = {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "rps": 100.0, "queries_per_request": 1.0}
+    baseline = {"routes": {"search/name/": base, "profile/": base}}
+    current = {"routes": {
+        "search/name/": {**base, "p95_ms": 30.0, "rps": 50.0, "queries_per_request": 3.0},
+        "profile/": {**base, "p50_ms": 10.5},
+    }}
+    rows, regressions = compare(baseline, current, threshold_pct=10)
+    assert len(rows) == 2
+    assert len(regressions) == 3
+    assert all(r.startswith("search/name/") for r in regressions)
+
+
+def test_every_route_has_a_benchmark_scenario():
+    assert uncovered_routes() == []
+    assert "search/name/" in SCENARIOS
+
+
+def test_run_phones_stay_valid_and_distinct_past_ten_thousand_requests():
+    phones = [run_phone('+9181', 99_999_999, i) for i in range(20000)]
+    assert len(set(phones)) == len(phones)
+    assert all(Validator.validate_phone(phone) for phone in phones)
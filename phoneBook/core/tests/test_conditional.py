@@ -0,0 +1,123 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.conditional import LATEST, read_versions
+from core.models import Contact, PhoneVersion, SpamReport
+from core.tests.helpers import auth_client, make_user
+
+SEARCH_PHONE_URL = "/api/search/phone/"
+SEARCH_NAME_URL = "/api/search/name/"
+
+
+def commit_versions():
+    # Version triggers are deferred to commit; tests run inside one transaction.
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+
+
+@pytest.mark.django_db
+def test_writes_bump_the_versions_of_the_numbers_they_change():
+    searcher = make_user("+919000000000", "Searcher")
+    target = make_user("+919000000001", "Target")
+    commit_versions()
+    before = read_versions([searcher.phone_number, target.phone_number, "+919111111111"], latest=True)
+    assert before[target.phone_number][0] > before[searcher.phone_number][0]
+    assert before[LATEST] == before[target.phone_number]
+    assert "+919111111111" not in before
+
+    Contact.objects.create(user=target, contact_phone="+919111111111", contact_name="Caller")
+    SpamReport.objects.create(reporter=searcher, target_phone=target.phone_number)
+    target.save()  # no visible field changed
+    commit_versions()
+    after = read_versions([searcher.phone_number, target.phone_number, "+919111111111"])
+    assert after[searcher.phone_number] == before[searcher.phone_number]
+    assert after[target.phone_number][0] > before[target.phone_number][0]
+    assert "+919111111111" in after
+
+
+@pytest.mark.django_db
+def test_phone_search_answers_304_after_one_version_check_until_something_changes():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    target = make_user("+919000000001", "Kabir Raj", email="kabir@example.com")
+    commit_versions()
+
+    first = client.get(SEARCH_PHONE_URL, {"q": target.phone_number})
+    assert first.status_code == 200
+    assert first["ETag"].startswith('"')
+    assert "Last-Modified" in first
+    assert "private" in first["Cache-Control"]
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = client.get(SEARCH_PHONE_URL, {"q": target.phone_number}, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert cached.status_code == 304
+    assert cached["ETag"] == first["ETag"]
+    assert len(queries.captured_queries) == 1
+    # Last-Modified is informational; only the ETag can answer 304.
+    assert client.get(SEARCH_PHONE_URL, {"q": target.phone_number},
+                      HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code == 200
+
+    # The target saving the searcher's number makes the email visible: the searcher's version moves.
+    Contact.objects.create(user=target, contact_phone=searcher.phone_number, contact_name="Searcher")
+    commit_versions()
+    changed = client.get(SEARCH_PHONE_URL, {"q": target.phone_number}, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert changed.status_code == 200
+    assert changed.json()[0]["email"] == "kabir@example.com"
+    assert changed["ETag"] != first["ETag"]
+
+
+@pytest.mark.django_db
+def test_a_second_write_within_the_same_second_is_not_answered_304():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    target = make_user("+919000000001", "Kabir Raj")
+    commit_versions()
+    first = client.get(SEARCH_PHONE_URL, {"q": target.phone_number})
+    first_written_at = PhoneVersion.objects.get(phone_number=target.phone_number).updated_at
+
+    target.name = "Kabir Rao"
+    target.save()
+    commit_versions()
+    # Same second as the first write: Last-Modified cannot tell the two apart.
+    PhoneVersion.objects.filter(phone_number=target.phone_number).update(updated_at=first_written_at)
+
+    changed = client.get(SEARCH_PHONE_URL, {"q": target.phone_number},
+                         HTTP_IF_NONE_MATCH=first["ETag"], HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+    assert changed["Last-Modified"] == first["Last-Modified"]
+    assert changed.status_code == 200
+    assert changed.json()[0]["name"] == "Kabir Rao"
+    assert client.get(SEARCH_PHONE_URL, {"q": target.phone_number},
+                      HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code == 200
+
+
+@pytest.mark.django_db
+def test_name_search_etag_changes_with_any_write_and_with_the_request():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    make_user("+919000000001", "Rahul Kapoor")
+    commit_versions()
+
+    first = client.get(SEARCH_NAME_URL, {"q": "Rahul"})
+    assert client.get(SEARCH_NAME_URL, {"q": "Rahul"}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+    assert client.get(SEARCH_NAME_URL, {"q": "Rahul", "mode": "fulltext"},
+                      HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+    make_user("+919000000002", "Rahul Verma")
+    commit_versions()
+    response = client.get(SEARCH_NAME_URL, {"q": "Rahul"}, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+@pytest.mark.django_db
+def test_profile_etag_needs_no_query():
+    user = make_user("+919000000000", "Profile")
+    client = auth_client(user)
+    first = client.get("/api/profile/")
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = client.get("/api/profile/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert cached.status_code == 304
+    assert len(queries.captured_queries) == 0
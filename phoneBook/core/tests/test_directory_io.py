@@ -0,0 +1,107 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APIClient
+
+from core.authentication import issue_token
+from core.models import Contact, SpamReport, SpamStats, User
+
+
+def make_directory():
+    ravi = User.objects.create_user(phone_number="+919000000001", name="Ravi", password="pass123",
+                                    email="ravi@example.com")
+    asha = User.objects.create_user(phone_number="+919000000002", name="Asha", password="pass123")
+    Contact.objects.create(user=ravi, contact_phone="+919000000002", contact_name="Asha, Office")
+    Contact.objects.create(user=ravi, contact_phone="+919111111111", contact_name='Plumber "Raju"')
+    Contact.objects.create(user=asha, contact_phone="+919000000001", contact_name="Ravi")
+    SpamReport.objects.create(reporter=ravi, target_phone="+919222222222")
+    SpamReport.objects.create(reporter=asha, target_phone="+919222222222")
+    return ravi, asha
+
+
+def snapshot():
+    return (
+        set(User.objects.values_list('phone_number', 'name', 'email', 'password', 'created_at')),
+        set(Contact.objects.values_list('user__phone_number', 'contact_phone', 'contact_name', 'created_at')),
+        set(SpamReport.objects.values_list('reporter__phone_number', 'target_phone', 'reported_at')),
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_directory_round_trips_through_export_and_import(fmt, tmp_path):
+    make_directory()
+    expected = snapshot()
+    call_command("export_directory", str(tmp_path), "--format", fmt, "--chunk-size", "2", stdout=StringIO())
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"contacts.{fmt}", f"spam_reports.{fmt}",
+                                                                f"users.{fmt}"]
+
+    User.objects.all().delete()
+    SpamStats.objects.all().delete()
+    out = StringIO()
+    call_command("import_directory", str(tmp_path), stdout=out)
+    assert "Imported users" in out.getvalue() and "3 read, 3 inserted" in out.getvalue()
+    assert snapshot() == expected
+    assert SpamStats.objects.get(target_phone="+919222222222").report_count == 2
+    assert User.objects.get(phone_number="+919000000001").check_password("pass123")
+    assert Contact.objects.filter(contact_name="Plumber \"Raju\"").values_list('contact_name_keys', flat=True)[0]
+
+    # Rerunning skips every row.
+    out = StringIO()
+    call_command("import_directory", str(tmp_path), stdout=out)
+    assert "0 inserted, 3 skipped" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_export_without_passwords_imports_unusable_passwords(tmp_path):
+    make_directory()
+    call_command("export_directory", str(tmp_path), "--datasets", "users", "--exclude-passwords",
+                 stdout=StringIO())
+    lines = (tmp_path / "users.ndjson").read_text().splitlines()
+    assert [json.loads(line)["password"] for line in lines] == [None, None]
+
+    User.objects.all().delete()
+    call_command("import_directory", str(tmp_path), stdout=StringIO())
+    assert not User.objects.get(phone_number="+919000000002").has_usable_password()
+
+
+@pytest.mark.django_db
+def test_import_rejects_malformed_files(tmp_path):
+    (tmp_path / "users.csv").write_text("phone,name\n+919000000001,Ravi\n")
+    with pytest.raises(CommandError, match="expected the CSV header"):
+        call_command("import_directory", str(tmp_path), stdout=StringIO())
+
+    (tmp_path / "users.csv").unlink()
+    (tmp_path / "users.ndjson").write_text('{"phone_number": "+919000000001", "name": "Ravi"}\n[1]\n')
+    with pytest.raises(CommandError, match="line 2 is not a JSON object"):
+        call_command("import_directory", str(tmp_path), stdout=StringIO())
+    assert not User.objects.exists()
+
+
+@pytest.mark.django_db
+def test_contacts_export_streams_what_sync_accepts():
+    ravi, _ = make_directory()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_token(ravi).token}")
+
+    response = client.get("/api/contacts/export/")
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/x-ndjson"
+    body = b"".join(response.streaming_content)
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"name": "Asha, Office", "phone_number": "+919000000002"},
+        {"name": 'Plumber "Raju"', "phone_number": "+919111111111"},
+    ]
+
+    response = client.get("/api/contacts/export/", {"output": "csv"})
+    assert b"".join(response.streaming_content).decode().splitlines() == [
+        "name,phone_number", '"Asha, Office",+919000000002', '"Plumber ""Raju""",+919111111111']
+    assert client.get("/api/contacts/export/", {"output": "xml"}).status_code == 400
+
+    # The export syncs back without changes.
+    response = client.post("/api/contacts/sync/", body, content_type="application/x-ndjson")
+    assert response.json()["unchanged"] == 2
@@ -0,0 +1,74 @@
+import pytest
+from rest_framework.test import APIClient
+
+from core.metrics import MetricsRegistry, registry
+
+
+def test_registry_renders_prometheus_histograms_and_counters():
+    metrics = MetricsRegistry()
+    metrics.observe("SearchByNameView", 200, 0.02, 3, 0.01, 512)
+    metrics.observe("SearchByNameView", 200, 0.2, 1, 0.005, 128)
+    metrics.observe("SearchByNameView", 401, 0.001, 0, 0.0, 20)
+
+    text = metrics.render()
+    assert "# TYPE phonebook_request_duration_seconds histogram" in text
+    assert 'phonebook_request_duration_seconds_bucket{view="SearchByNameView",le="0.025"} 2' in text
+    assert 'phonebook_request_duration_seconds_bucket{view="SearchByNameView",le="+Inf"} 3' in text
+    assert 'phonebook_request_duration_seconds_count{view="SearchByNameView"} 3' in text
+    assert 'phonebook_db_queries_total{view="SearchByNameView"} 4.0' in text
+    assert 'phonebook_response_bytes_total{view="SearchByNameView"} 660' in text
+    assert 'phonebook_responses_total{view="SearchByNameView",status="401"} 1' in text
+
+
+def test_registry_merges_per_thread_shards_and_retires_exited_threads():
+    import threading
+
+    metrics = MetricsRegistry()
+
+    def run_threads():
+        threads = [
+            threading.Thread(target=lambda: [metrics.observe("ProfileView", 200, 0.001, 1, 0.0, 10)
+                                             for _ in range(100)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    run_threads()
+    assert metrics.snapshot()["ProfileView"].latency.count == 400
+    # The exited threads' counts live on in the retired shard; their shards are gone.
+    assert metrics._shards == []
+    run_threads()
+    assert metrics.snapshot()["ProfileView"].latency.count == 800
+    assert metrics._shards == []
+
+
+def test_middleware_records_requests_by_view_and_serves_metrics(settings):
+    settings.METRICS = {'PUBLIC': True}
+    registry.reset()
+    client = APIClient()
+    assert client.get("/api/profile/").status_code == 401
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain")
+    body = response.content.decode()
+    assert 'phonebook_responses_total{view="ProfileView",status="401"} 1' in body
+    assert "phonebook_token_cache_hits_total" in body
+
+
+@pytest.mark.parametrize("config, headers, remote_addr, allowed", [
+    ({}, {}, "127.0.0.1", False),
+    ({'TOKEN': "scrape-secret"}, {}, "127.0.0.1", False),
+    ({'TOKEN': "scrape-secret"}, {"HTTP_AUTHORIZATION": "Bearer wrong"}, "127.0.0.1", False),
+    ({'TOKEN': "scrape-secret"}, {"HTTP_AUTHORIZATION": "Bearer scrape-secret"}, "127.0.0.1", True),
+    ({'ALLOWED_IPS': ["10.0.0.5"]}, {}, "10.0.0.5", True),
+    ({'ALLOWED_IPS': ["10.0.0.5"]}, {}, "10.0.0.6", False),
+])
+def test_metrics_are_served_only_to_allowed_scrapers(settings, config, headers, remote_addr, allowed):
+    settings.METRICS = config
+    response = APIClient().get("/metrics", REMOTE_ADDR=remote_addr, **headers)
+    assert response.status_code == (200 if allowed else 404)
+    assert (b"phonebook_" in response.content) is allowed
@@ -0,0 +1,92 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+
+from core.models import Contact, SpamReport, SpamStats
+from core.partitioning import (
+    COPYING,
+    PARTITIONED,
+    PLAIN,
+    copy_to_shadow,
+    create_shadow_table,
+    drop_retired_table,
+    partition_state,
+    swap_shadow_table,
+)
+from core.spam import DEFERRED, IMMEDIATE, get_aggregation_mode, set_aggregation_mode
+from core.tests.helpers import make_user
+
+
+def partitions(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_inherits WHERE inhparent = %s::regclass", [table])
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_contacts_are_copied_online_and_swapped():
+    users = [make_user(f"+91900000000{i}", f"User {i}") for i in range(3)]
+    for user in users:
+        for j in range(3):
+            Contact.objects.create(user=user, contact_phone=f"+9191111111{j:02d}", contact_name=f"Friend {j}")
+    doomed = Contact.objects.get(user=users[2], contact_phone="+919111111100")
+    renamed = Contact.objects.get(user=users[2], contact_phone="+919111111101")
+
+    create_shadow_table('core_contact', 4)
+    assert partition_state('core_contact') == COPYING
+    batches = copy_to_shadow('core_contact', 2)
+    assert next(batches) == 2
+
+    # Writes behind and ahead of the copy position reach the shadow through the mirror trigger.
+    Contact.objects.filter(user=users[0], contact_phone="+919111111100").update(contact_name="Renamed Early")
+    doomed.delete()
+    renamed.contact_name = "Ravi Sharma"
+    renamed.save()
+    added = Contact.objects.create(user=users[1], contact_phone="+919111111199", contact_name="New Friend")
+    assert sum(batches) == 5  # the renamed and added rows were already mirrored
+
+    expected = set(Contact.objects.values_list('id', 'user_id', 'contact_phone', 'contact_name'))
+    swap_shadow_table('core_contact')
+    assert partition_state('core_contact') == PARTITIONED
+    assert partitions('core_contact') == 4
+    assert set(Contact.objects.values_list('id', 'user_id', 'contact_phone', 'contact_name')) == expected
+    assert Contact.objects.get(pk=renamed.pk).contact_name_keys
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Contact.objects.create(user=users[0], contact_phone="+919111111101", contact_name="Duplicate")
+    later = Contact.objects.create(user=users[0], contact_phone="+919111111188", contact_name="Later Friend")
+    assert later.pk > added.pk
+
+    assert drop_retired_table('core_contact')
+    assert not drop_retired_table('core_contact')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_partitioned_spam_reports_keep_their_triggers():
+    reporters = [make_user(f"+91900000001{i}", f"Reporter {i}") for i in range(3)]
+    for reporter in reporters:
+        SpamReport.objects.create(reporter=reporter, target_phone="+919222222222")
+
+    call_command("partition_tables", "--table", "core_spamreport", "--partitions", "4", "--batch-size", "2",
+                 "--drop-old", stdout=StringIO())
+    assert partition_state('core_spamreport') == PARTITIONED
+    assert SpamReport.objects.count() == 3
+
+    SpamReport.objects.create(reporter=reporters[0], target_phone="+919333333333")
+    assert SpamStats.objects.get(target_phone="+919333333333").report_count == 1
+    with pytest.raises(IntegrityError), transaction.atomic():
+        SpamReport.objects.create(reporter=reporters[0], target_phone="+919222222222")
+
+    set_aggregation_mode(DEFERRED)
+    assert get_aggregation_mode() == DEFERRED
+    set_aggregation_mode(IMMEDIATE)
+    assert get_aggregation_mode() == IMMEDIATE
+    SpamReport.objects.create(reporter=reporters[1], target_phone="+919333333333")
+    assert SpamStats.objects.get(target_phone="+919333333333").report_count == 2
+
+    out = StringIO()
+    call_command("partition_tables", "--table", "core_spamreport", stdout=out)
+    assert "already partitioned" in out.getvalue()
+    assert partition_state('core_user') == PLAIN
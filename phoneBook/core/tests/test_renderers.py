@@ -0,0 +1,37 @@
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import encode_batch_results, encode_results
+from core.serializers import SearchResultSerializer
+
+ROWS = [
+    ("Rahul Kapoor", "+919000000001", True, 3, True, "rahul@example.com"),
+    ('Zoë "the boss" \\ Müller', "+919000000002", True, 0, False, None),
+    ("Line break\ttab", "+919000000003", False, 12, False, None),
+    ("", "+919000000004", False, 0, False, None),
+    ("Para\u2028graph", "+919000000005", True, 1, True, "p@example.com"),
+]
+
+
+def serializer_body(rows):
+    data = [dict(zip(SearchResultSerializer().fields, row)) for row in rows]
+    return JSONRenderer().render(SearchResultSerializer(data, many=True).data)
+
+
+def test_encoded_results_match_the_serializer_byte_for_byte():
+    assert encode_results(ROWS) == serializer_body(ROWS)
+    assert encode_results([]) == serializer_body([]) == b"[]"
+
+
+def test_encoded_batch_results_match_the_serializer_byte_for_byte():
+    items = [
+        ("+919000000001", "+919000000001", ROWS[:1]),
+        (9111111111, "+919111111111", ROWS[2:]),
+        ({"odd": "query"}, None, []),
+    ]
+    expected = JSONRenderer().render({"results": [
+        {"query": query, "phone_number": phone, "valid": phone is not None,
+         "results": SearchResultSerializer([dict(zip(SearchResultSerializer().fields, row)) for row in rows],
+                                           many=True).data}
+        for query, phone, rows in items
+    ]})
+    assert encode_batch_results(items) == expected
@@ -0,0 +1,111 @@
+import math
+
+import pytest
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from core import replicas
+from core.models import Contact, SpamReport, User
+from core.replicas import (
+    ReplicaMonitor,
+    ReplicaRouter,
+    choose_replica,
+    is_pinned,
+    pin_to_primary,
+    reads_from,
+    reset_replica_monitor,
+)
+
+
+@pytest.fixture
+def two_replicas():
+    """A monitor for two replicas whose lags were just measured: replica1 current, replica2 behind."""
+    monitor = ReplicaMonitor(('replica1', 'replica2'), max_lag=3.0, interval=60)
+    monitor._refresher.load = lambda: monitor._lags.update({'replica1': 0.5, 'replica2': 10.0})
+    monitor.measure()
+    replicas._monitor = monitor
+    cache.clear()
+    yield monitor
+    reset_replica_monitor()
+    cache.clear()
+
+
+def test_reads_go_to_a_replica_within_max_lag(two_replicas):
+    user = User(pk=1, phone_number="+919000000001", name="Ravi")
+    router = ReplicaRouter()
+
+    alias = choose_replica(user)
+    assert alias == 'replica1'
+    with reads_from(alias):
+        assert router.db_for_read(User) == 'replica1'
+        assert router.db_for_write(User) == DEFAULT_DB_ALIAS
+    assert router.db_for_read(User) is None
+
+    two_replicas._lags['replica1'] = math.inf
+    assert choose_replica(user) is None
+    assert two_replicas.reads == {DEFAULT_DB_ALIAS: 1, 'replica1': 1, 'replica2': 0}
+    assert router.allow_migrate('replica2', 'core') is False
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, 'core') is None
+
+
+def test_own_writes_pin_reads_to_the_primary(two_replicas, settings):
+    settings.REPLICAS = {**settings.REPLICAS, 'STICKY_SECONDS': 60}
+    user = User(pk=2, phone_number="+919000000002", name="Asha")
+    pin_to_primary(user.pk)
+    assert is_pinned(user.pk)
+    assert choose_replica(user) is None
+    assert choose_replica(User(pk=3)) == 'replica1'
+
+
+@pytest.mark.django_db
+def test_spam_reports_and_contact_writes_pin_their_author(two_replicas, django_capture_on_commit_callbacks):
+    reporter = User.objects.create_user(phone_number="+919000000003", name="Reporter", password="pass123")
+    owner = User.objects.create_user(phone_number="+919000000004", name="Owner", password="pass123")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+    assert is_pinned(reporter.pk)
+
+    assert not is_pinned(owner.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name="Plumber")
+    assert is_pinned(owner.pk)
+
+
+@pytest.mark.django_db
+def test_primary_reports_no_lag():
+    monitor = ReplicaMonitor((DEFAULT_DB_ALIAS,), max_lag=3.0, interval=60)
+    assert monitor.healthy() == [DEFAULT_DB_ALIAS]
+    assert monitor.lags() == {DEFAULT_DB_ALIAS: 0.0}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("receiver_status, expected_lag", [(None, math.inf), ("stopping", math.inf), ("streaming", 0.0)])
+def test_caught_up_standby_counts_as_current_only_while_streaming(receiver_status, expected_lag):
+    # Shadow the pg_catalog objects REPLICA_LAG_SQL reads with a standby that
+    # has replayed everything it received, and whose WAL receiver is in `receiver_status`.
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE SCHEMA fake_standby;
+            CREATE FUNCTION fake_standby.pg_is_in_recovery() RETURNS boolean AS 'SELECT true' LANGUAGE sql;
+            CREATE FUNCTION fake_standby.pg_last_wal_receive_lsn() RETURNS pg_lsn AS 'SELECT ''0/3000000''::pg_lsn'
+                LANGUAGE sql;
+            CREATE FUNCTION fake_standby.pg_last_wal_replay_lsn() RETURNS pg_lsn AS 'SELECT ''0/3000000''::pg_lsn'
+                LANGUAGE sql;
+            CREATE VIEW fake_standby.pg_stat_wal_receiver AS
+                SELECT status FROM (VALUES (%s::text)) AS receiver(status) WHERE status IS NOT NULL;
+            SET LOCAL search_path = fake_standby, public, pg_catalog;
+        """, [receiver_status])
+    monitor = ReplicaMonitor((DEFAULT_DB_ALIAS,), max_lag=3.0, interval=60)
+    assert monitor.healthy() == ([DEFAULT_DB_ALIAS] if expected_lag == 0 else [])
+    assert monitor.lags() == {DEFAULT_DB_ALIAS: expected_lag}
+
+
+def test_no_replicas_means_no_routing():
+    reset_replica_monitor()
+    try:
+        assert choose_replica(User(pk=1)) is None
+        pin_to_primary(1)
+        assert not is_pinned(1)
+    finally:
+        reset_replica_monitor()
@@ -0,0 +1,339 @@
+import pytest
+import threading
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+from django.core.exceptions import FieldError
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Contact, PhoneDirectory, SpamReport, User
+from core.tests.helpers import auth_client, make_user
+
+SEARCH_NAME_URL = "/api/search/name/"
+
+
+@pytest.mark.django_db
+def test_search_by_name_query_count_does_not_grow_with_results(settings):
+    # Long enough that the warmed token stays cached however slow the searches are.
+    settings.AUTH_TOKEN_CACHE = {**settings.AUTH_TOKEN_CACHE, 'TTL': 300}
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+
+    make_user("+919000000001", "Rahul Kapoor")
+    client.get("/api/profile/")  # warm the token cache so only search queries are counted
+    with CaptureQueriesContext(connection) as single:
+        response = client.get(SEARCH_NAME_URL, {"q": "Rahul"})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+    for i in range(2, 12):
+        user = make_user(f"+9190000000{i:02d}", f"Rahul {i}")
+        Contact.objects.create(user=user, contact_phone=searcher.phone_number, contact_name="Searcher")
+        SpamReport.objects.create(reporter=searcher, target_phone=user.phone_number)
+
+    with CaptureQueriesContext(connection) as many:
+        response = client.get(SEARCH_NAME_URL, {"q": "Rahul"})
+    assert response.status_code == 200
+    assert len(response.json()) == 11
+    assert all(r["show_email"] for r in response.json() if r["phone_number"] != "+919000000001")
+
+    with CaptureQueriesContext(connection) as repeat:
+        client.get(SEARCH_NAME_URL, {"q": "Rahul"})
+    # The version check and the page, plus one visibility lookup for the page's
+    # registered users until it is cached.
+    assert len(single.captured_queries) == 3
+    assert len(many.captured_queries) == 3
+    assert len(repeat.captured_queries) == 2
+
+
+@pytest.mark.django_db
+def test_search_by_name_ranks_prefix_matches_first_and_annotates_results():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+
+    # "Vickram" is a closer trigram match than the long prefix match.
+    fuzzy = make_user("+919000000001", "Vickram", email="fuzzy@example.com")
+    prefix = make_user("+919000000002", "Vikram Aditya Sharma Kumar", email="prefix@example.com")
+    make_user("+919000000003", "Neha Raj")
+    Contact.objects.create(user=prefix, contact_phone=searcher.phone_number, contact_name="Searcher")
+    SpamReport.objects.create(reporter=searcher, target_phone=fuzzy.phone_number)
+
+    response = client.get(SEARCH_NAME_URL, {"q": "Vikram"})
+    assert response.status_code == 200
+    assert [r["phone_number"] for r in response.json()] == [prefix.phone_number, fuzzy.phone_number]
+
+    prefix_row, fuzzy_row = response.json()
+    assert prefix_row["show_email"] is True
+    assert prefix_row["email"] == "prefix@example.com"
+    assert prefix_row["spam_report_count"] == 0
+    assert fuzzy_row["show_email"] is False
+    assert fuzzy_row["email"] is None
+    assert fuzzy_row["spam_report_count"] == 1
+
+
+def next_cursor(response):
+    link = response.get("Link")
+    if not link:
+        return None
+    return parse_qs(urlparse(link[1:link.index(">")]).query)["cursor"][0]
+
+
+@pytest.mark.django_db
+def test_search_by_name_merges_unregistered_contact_names_once_per_phone():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    registered = make_user("+919000000001", "Pizza Hut", email="hut@example.com")
+    owner = make_user("+919000000002", "Owner")
+    other = make_user("+919000000003", "Other Owner")
+    Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name="Pizza Place")
+    Contact.objects.create(user=other, contact_phone="+919111111111", contact_name="Pizza")
+    Contact.objects.create(user=owner, contact_phone=registered.phone_number, contact_name="Pizza Guy")
+    SpamReport.objects.create(reporter=searcher, target_phone="+919111111111")
+
+    response = client.get(SEARCH_NAME_URL, {"q": "Pizza"})
+    assert response.status_code == 200
+    assert [(r["name"], r["phone_number"], r["is_registered_user"]) for r in response.json()] == [
+        ("Pizza", "+919111111111", False),
+        ("Pizza Hut", "+919000000001", True),
+    ]
+    assert response.json()[0]["spam_report_count"] == 1
+    assert response.json()[0]["email"] is None
+
+
+@pytest.mark.django_db
+def test_search_by_name_pages_with_a_stable_cursor(settings):
+    settings.NAME_SEARCH = {"PAGE_SIZE": 2, "MAX_PAGE_SIZE": 3}
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    for i in range(1, 6):
+        make_user(f"+91900000000{i}", "Arjun")
+    Contact.objects.create(user=searcher, contact_phone="+919111111111", contact_name="Arjun")
+    make_user("+919000000009", "Arjun Kumar Iyer")
+
+    seen = []
+    params = {"q": "Arjun"}
+    while True:
+        response = client.get(SEARCH_NAME_URL, params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        seen.extend(r["phone_number"] for r in response.json())
+        cursor = next_cursor(response)
+        if cursor is None:
+            break
+        params = {"q": "Arjun", "cursor": cursor}
+
+    # Exact matches tie on score and fall back to phone order; the longer name ranks last.
+    assert seen == [f"+91900000000{i}" for i in range(1, 6)] + ["+919111111111", "+919000000009"]
+
+    response = client.get(SEARCH_NAME_URL, {"q": "Arjun", "page_size": 50})
+    assert len(response.json()) == 3
+    assert client.get(SEARCH_NAME_URL, {"q": "Arjun", "page_size": 0}).status_code == 400
+    assert client.get(SEARCH_NAME_URL, {"q": "Arjun", "cursor": "garbage"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_search_by_name_treats_like_wildcards_literally():
+    client = auth_client(make_user("+919000000000", "Searcher"))
+    make_user("+919000000001", "Aman Singh")
+    response = client.get(SEARCH_NAME_URL, {"q": "%"})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.django_db
+def test_search_keys_are_maintained_on_write():
+    user = make_user("+919000000001", "Vickram Singh")
+    user.refresh_from_db()
+    assert user.name_keys == ["sng", "vkrm"]
+
+    User.objects.filter(pk=user.pk).update(name="Dhivya")
+    user.refresh_from_db()
+    assert user.name_keys == ["dv"]
+    assert user.name_vector == "'dhivya':1"
+
+    contact = Contact.objects.create(user=user, contact_phone="+919111111111", contact_name="Mohammed Khan")
+    contact.refresh_from_db()
+    assert contact.contact_name_keys == ["kn", "mhmd"]
+
+
+@pytest.mark.django_db
+def test_search_by_name_phonetic_and_fulltext_modes():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    make_user("+919000000001", "Vickram Singh")
+    make_user("+919000000002", "Dhivya Iyer")
+    owner = make_user("+919000000003", "Owner")
+    Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name="Muhammad Khan")
+
+    def phones(params):
+        response = client.get(SEARCH_NAME_URL, params)
+        assert response.status_code == 200
+        return [r["phone_number"] for r in response.json()]
+
+    assert phones({"q": "Vikram", "mode": "phonetic"}) == ["+919000000001"]
+    assert phones({"q": "Divya", "mode": "phonetic"}) == ["+919000000002"]
+    assert phones({"q": "Mohammed", "mode": "phonetic"}) == ["+919111111111"]
+    assert phones({"q": "?!", "mode": "phonetic"}) == []
+    assert phones({"q": "singh vickram", "mode": "fulltext"}) == ["+919000000001"]
+    assert phones({"q": "Vikram", "mode": "fulltext"}) == []
+    assert client.get(SEARCH_NAME_URL, {"q": "Vikram", "mode": "soundex"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_backfill_search_keys_fills_rows_written_before_the_triggers():
+    users = [make_user(f"+91900000000{i}", f"Neha {i}") for i in range(5)]
+    User.objects.update(name_keys=None, name_vector=None)
+
+    call_command("backfill_search_keys", "--table", "core_user", "--batch-size", "2", stdout=StringIO())
+
+    assert not User.objects.filter(name_keys__isnull=True).exists()
+    assert User.objects.get(pk=users[0].pk).name_keys == ["nh"]
+
+
+SEARCH_PHONE_URL = "/api/search/phone/"
+
+
+@pytest.mark.django_db
+def test_search_by_phone_registered_user_is_one_directory_read():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    target = make_user("+919000000001", "Kabir Raj", email="kabir@example.com")
+    Contact.objects.create(user=target, contact_phone=searcher.phone_number, contact_name="Searcher")
+    SpamReport.objects.create(reporter=searcher, target_phone=target.phone_number)
+
+    client.get("/api/profile/")  # warm the token cache
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(SEARCH_PHONE_URL, {"q": "9000000001"})
+    assert response.status_code == 200
+    assert len(queries.captured_queries) == 2  # version check + directory read
+    assert response.json() == [{
+        "name": "Kabir Raj",
+        "phone_number": "+919000000001",
+        "is_registered_user": True,
+        "spam_report_count": 1,
+        "show_email": True,
+        "email": "kabir@example.com",
+    }]
+
+
+@pytest.mark.django_db
+def test_search_by_phone_unregistered_number_lists_contact_names():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    for i, name in enumerate(["Pizza Place", "Pizza Place", "Dominos"], start=1):
+        owner = make_user(f"+9190000001{i:02d}", f"Owner {i}")
+        Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name=name)
+
+    response = client.get(SEARCH_PHONE_URL, {"q": "+919111111111"})
+    assert response.status_code == 200
+    assert [r["name"] for r in response.json()] == ["Pizza Place", "Dominos"]
+    assert all(not r["is_registered_user"] and r["email"] is None for r in response.json())
+
+    assert client.get(SEARCH_PHONE_URL, {"q": "+919222222222"}).json() == []
+
+
+@pytest.mark.django_db
+def test_phone_directory_follows_multi_row_contact_statements():
+    owners = [make_user(f"+9190000001{i:02d}", f"Owner {i}") for i in range(3)]
+    Contact.objects.bulk_create([
+        Contact(user=owner, contact_phone=phone, contact_name=name)
+        for owner in owners
+        for phone, name in (("+919111111111", "Pizza Place"), ("+919222222222", "Gym"))
+    ])
+    assert PhoneDirectory.objects.get(pk="+919111111111").contact_names == ["Pizza Place"]
+
+    Contact.objects.filter(user=owners[0], contact_phone="+919111111111").update(contact_name="Dominos")
+    assert PhoneDirectory.objects.get(pk="+919111111111").contact_names == ["Pizza Place", "Dominos"]
+    Contact.objects.filter(contact_phone="+919222222222").delete()
+    assert not PhoneDirectory.objects.filter(pk="+919222222222").exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_phone_directory_keeps_names_from_concurrent_writers():
+    first, second = make_user("+919000000101", "First"), make_user("+919000000102", "Second")
+    inserted, release = threading.Event(), threading.Event()
+
+    def add_contact(owner, name, hold):
+        try:
+            with transaction.atomic():
+                Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name=name)
+                if hold:
+                    inserted.set()
+                    release.wait(5)
+        finally:
+            connections.close_all()
+
+    holder = threading.Thread(target=add_contact, args=(first, "Pizza Place", True))
+    holder.start()
+    assert inserted.wait(5)
+    # Blocks on the directory row until the holder commits, then sees its name.
+    waiter = threading.Thread(target=add_contact, args=(second, "Dominos", False))
+    waiter.start()
+    waiter.join(0.5)
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert sorted(PhoneDirectory.objects.get(pk="+919111111111").contact_names) == ["Dominos", "Pizza Place"]
+
+
+SEARCH_PHONE_BATCH_URL = "/api/search/phone/batch/"
+
+
+def test_any_lookup_binds_values_as_one_array():
+    sql, params = User.objects.filter(phone_number__any=["+911", "+912"]).query.sql_with_params()
+    assert '"core_user"."phone_number" = ANY(%s)' in sql
+    assert params == (["+911", "+912"],)
+    with pytest.raises(FieldError):
+        User.objects.filter(id__any=[1, 2])
+
+
+@pytest.mark.django_db
+def test_batch_search_by_phone_returns_results_in_input_order():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    registered = make_user("+919000000001", "Neha Sharma", email="neha@example.com")
+    Contact.objects.create(user=searcher, contact_phone="+919111111111", contact_name="Cab Service")
+    SpamReport.objects.create(reporter=searcher, target_phone="+919111111111")
+
+    client.get("/api/profile/")  # warm the token cache
+    numbers = ["9111111111", "not-a-number", "+919000000001", "+919222222222", "+919111111111"]
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(SEARCH_PHONE_BATCH_URL, {"numbers": numbers}, format="json")
+    assert response.status_code == 200
+    assert len(queries.captured_queries) == 3  # directory rows + searcher version + email visibility
+
+    results = response.json()["results"]
+    assert [r["query"] for r in results] == numbers
+    assert [r["valid"] for r in results] == [True, False, True, True, True]
+    assert results[0]["results"][0]["name"] == "Cab Service"
+    assert results[0]["results"][0]["spam_report_count"] == 1
+    assert results[1]["results"] == []
+    assert results[2]["results"][0]["name"] == registered.name
+    assert results[2]["results"][0]["email"] is None
+    assert results[3]["results"] == []
+    assert results[4]["results"] == results[0]["results"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_search_by_phone_sees_contacts_saved_by_other_processes():
+    searcher = make_user("+919000000000", "Searcher")
+    client = auth_client(searcher)
+    owner = make_user("+919000000001", "Neha Sharma", email="neha@example.com")
+
+    def email():
+        response = client.post(SEARCH_PHONE_BATCH_URL, {"numbers": [owner.phone_number]}, format="json")
+        return response.json()["results"][0]["results"][0]["email"]
+
+    assert email() is None
+    # bulk_create sends no signals, so only the searcher's phone version tells this process.
+    Contact.objects.bulk_create([Contact(user=owner, contact_phone=searcher.phone_number, contact_name="Searcher")])
+    assert email() == owner.email
+
+
+@pytest.mark.django_db
+def test_batch_search_by_phone_enforces_limit(settings):
+    settings.BATCH_LOOKUP = {"MAX_NUMBERS": 2}
+    client = auth_client(make_user("+919000000000", "Searcher"))
+    response = client.post(SEARCH_PHONE_BATCH_URL, {"numbers": ["+911", "+912", "+913"]}, format="json")
+    assert response.status_code == 400
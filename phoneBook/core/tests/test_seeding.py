@@ -0,0 +1,70 @@
+import re
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.models import Contact, PhoneDirectory, PhoneVersion, SpamReport, SpamStats, User
+from core.seeding import SeedPlan, _trigger_states, seeded_phone, shard_rows
+
+PHONE = re.compile(r"^\+91[6-9]\d{9}$")
+
+
+def plan(**overrides):
+    options = dict(seed=7, users=60, contacts_per_user=8, reports_per_user=1, password="x",
+                   anchor=datetime(2026, 1, 1, tzinfo=timezone.utc), shard_size=25)
+    return SeedPlan(**{**options, **overrides})
+
+
+def generated_totals(seed_plan):
+    shards = [shard_rows(seed_plan, shard) for shard in range(seed_plan.shards)]
+    return tuple(sum(len(rows[i]) for rows in shards) for i in range(3))
+
+
+def test_shards_are_deterministic_and_phones_unique():
+    seed_plan = plan()
+    assert seed_plan.shards == 3
+    assert shard_rows(seed_plan, 1) == shard_rows(seed_plan, 1)
+    assert shard_rows(plan(seed=8), 1) != shard_rows(seed_plan, 1)
+
+    phones = [seeded_phone(7, index) for index in range(seed_plan.users + seed_plan.unregistered)]
+    assert len(set(phones)) == len(phones)
+    assert all(PHONE.match(phone) and not phone.startswith("+9180") for phone in phones)
+
+    users, contacts, reports = shard_rows(seed_plan, 0)
+    assert [row[0] for row in users] == phones[:25]
+    assert all(phone != phones[owner] for owner, phone, _, _ in contacts)
+    assert len({(reporter, phone) for reporter, phone, _ in reports}) == len(reports)
+
+
+@pytest.mark.django_db
+def test_seed_loads_in_process_and_refuses_to_reload():
+    triggers = _trigger_states()
+    out = StringIO()
+    call_command("seed", "--users", "60", "--contacts-per-user", "8", "--reports-per-user", "1", "--seed", "7",
+                 "--shard-size", "25", "--workers", "1", "--password", "seeded", stdout=out)
+    users, contacts, reports = generated_totals(plan())
+    assert (User.objects.count(), Contact.objects.count(), SpamReport.objects.count()) == (users, contacts, reports)
+    assert f"Seeded {users + contacts + reports} rows in 3 shards" in out.getvalue()
+
+    # The derived tables were rebuilt and their triggers restored.
+    assert sum(SpamStats.objects.values_list('report_count', flat=True)) == reports
+    assert PhoneDirectory.objects.filter(user__isnull=False).count() == users
+    assert PhoneVersion.objects.count() == PhoneDirectory.objects.count()
+    assert _trigger_states() == triggers
+    assert Contact.objects.exclude(contact_name_keys=None).count() == contacts
+    assert User.objects.get(phone_number=seeded_phone(7, 0)).check_password("seeded")
+
+    with pytest.raises(CommandError, match="already loaded"):
+        call_command("seed", "--users", "60", "--seed", "7", "--workers", "1", stdout=StringIO())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_seed_across_worker_processes_matches_the_plan():
+    call_command("seed", "--users", "60", "--contacts-per-user", "8", "--reports-per-user", "1", "--seed", "7",
+                 "--shard-size", "25", "--workers", "3", stdout=StringIO())
+    users, contacts, reports = generated_totals(plan())
+    assert (User.objects.count(), Contact.objects.count(), SpamReport.objects.count()) == (users, contacts, reports)
+    assert set(User.objects.values_list('phone_number', flat=True)) == {seeded_phone(7, i) for i in range(60)}
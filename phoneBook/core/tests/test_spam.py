@@ -0,0 +1,178 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.authentication import issue_token
+from core.models import PendingSpamReport, PhoneDirectory, SpamHourlyCount, SpamReport, SpamStats, User
+from core.spam import (
+    DEFERRED,
+    IMMEDIATE,
+    aggregation_status,
+    fold_pending_reports,
+    get_aggregation_mode,
+    prune_hourly_counts,
+    reconcile_spam_stats,
+    set_aggregation_mode,
+    top_spammers,
+    window_report_counts,
+)
+from core.spam_top import get_spam_leaderboard
+
+
+def make_reporters(count, start=0):
+    return [
+        User.objects.create_user(phone_number=f"+9190000000{i:02d}", name=f"Reporter {i}", password="pass123")
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.mark.django_db
+def test_deferred_mode_queues_reports_until_folded():
+    reporters = make_reporters(3)
+    assert get_aggregation_mode() == IMMEDIATE
+
+    set_aggregation_mode(DEFERRED)
+    assert get_aggregation_mode() == DEFERRED
+    for reporter in reporters:
+        SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+    SpamReport.objects.create(reporter=reporters[0], target_phone="+919222222222")
+
+    assert not SpamStats.objects.exists()
+    status = aggregation_status()
+    assert status["pending_reports"] == 4
+    assert status["staleness_bound_seconds"] > 0
+
+    assert fold_pending_reports(batch_size=3) == (3, 1)
+    assert fold_pending_reports(batch_size=3) == (1, 1)
+    assert not PendingSpamReport.objects.exists()
+    assert SpamStats.objects.get(target_phone="+919111111111").report_count == 3
+    assert SpamStats.objects.get(target_phone="+919222222222").report_count == 1
+    assert PhoneDirectory.objects.get(phone_number="+919111111111").spam_report_count == 3
+
+
+@pytest.mark.django_db
+def test_switching_back_to_immediate_drains_the_queue():
+    reporter, = make_reporters(1)
+    set_aggregation_mode(DEFERRED)
+    SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+
+    set_aggregation_mode(IMMEDIATE)
+    assert SpamStats.objects.get(target_phone="+919111111111").report_count == 1
+
+    SpamReport.objects.create(reporter=make_reporters(1, start=1)[0], target_phone="+919111111111")
+    assert SpamStats.objects.get(target_phone="+919111111111").report_count == 2
+    assert not PendingSpamReport.objects.exists()
+
+
+@pytest.mark.django_db
+def test_reconcile_rebuilds_counts_from_reports():
+    reporters = make_reporters(2)
+    for reporter in reporters:
+        SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+    SpamStats.objects.filter(target_phone="+919111111111").update(report_count=40)
+    SpamStats.objects.create(target_phone="+919333333333", report_count=5)
+
+    assert reconcile_spam_stats() == (1, 1)
+    assert SpamStats.objects.get(target_phone="+919111111111").report_count == 2
+    assert not SpamStats.objects.filter(target_phone="+919333333333").exists()
+
+
+@pytest.mark.django_db
+def test_aggregate_spam_command_runs_once():
+    reporter, = make_reporters(1)
+    set_aggregation_mode(DEFERRED)
+    SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+    call_command("aggregate_spam", "--once")
+    assert SpamStats.objects.get(target_phone="+919111111111").report_count == 1
+
+
+def report_spread(reporters):
+    """+919111111111: three reports three days ago; +919222222222: one now; +919333333333: two now, deferred."""
+    three_days_ago = timezone.now() - timedelta(days=3)
+    for reporter in reporters[:3]:
+        SpamReport.objects.create(reporter=reporter, target_phone="+919111111111", reported_at=three_days_ago)
+    SpamReport.objects.create(reporter=reporters[0], target_phone="+919222222222")
+    set_aggregation_mode(DEFERRED)
+    for reporter in reporters[:2]:
+        SpamReport.objects.create(reporter=reporter, target_phone="+919333333333")
+    set_aggregation_mode(IMMEDIATE)
+
+
+@pytest.mark.django_db
+def test_scores_decay_and_window_counts_are_maintained_on_ingest():
+    report_spread(make_reporters(3))
+
+    top = [(phone, round(score, 3), count) for phone, score, count, _ in top_spammers(10)]
+    assert top == [("+919333333333", 2.0, 2), ("+919222222222", 1.0, 1), ("+919111111111", 0.375, 3)]
+    phones = ["+919111111111", "+919222222222", "+919333333333"]
+    assert window_report_counts(phones, 24) == {"+919222222222": 1, "+919333333333": 2}
+    assert window_report_counts(phones, 96) == {"+919111111111": 3, "+919222222222": 1, "+919333333333": 2}
+
+    assert sum(prune_hourly_counts(retention_hours=48, batch_size=10)) == 1
+    assert SpamHourlyCount.objects.count() == 2
+
+    # Reconcile finds the incrementally kept scores correct and restores retained hours.
+    assert reconcile_spam_stats() == (0, 0)
+    assert SpamHourlyCount.objects.count() == 3
+    assert [row[0] for row in top_spammers(10)] == ["+919333333333", "+919222222222", "+919111111111"]
+
+
+@pytest.mark.django_db
+def test_spam_top_serves_the_precomputed_leaderboard():
+    reporters = make_reporters(3)
+    report_spread(reporters)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_token(reporters[0]).token}")
+
+    response = client.get("/api/spam/top/", {"limit": 2})
+    assert response.status_code == 200
+    assert response.data["window_hours"] == 24
+    assert [(r["phone_number"], r["spam_score"], r["recent_report_count"]) for r in response.data["results"]] == [
+        ("+919333333333", 2.0, 2), ("+919222222222", 1.0, 1)]
+
+    # New reports show up when the leaderboard is next recomputed, not per request.
+    for reporter in reporters:
+        SpamReport.objects.create(reporter=reporter, target_phone="+919444444444")
+    assert client.get("/api/spam/top/", {"limit": 1}).data["results"][0]["phone_number"] == "+919333333333"
+    get_spam_leaderboard().refresh()
+    assert client.get("/api/spam/top/", {"limit": 1}).data["results"][0]["phone_number"] == "+919444444444"
+
+    assert client.get("/api/spam/top/", {"limit": "x"}).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_spam_scoring_migration_scores_reports_made_before_it():
+    before, scoring = [("core", "0012_partition_mirror")], [("core", "0013_spam_scoring")]
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes("core")
+    executor.migrate(before)
+    try:
+        OldUser = executor.loader.project_state(before).apps.get_model("core", "User")
+        reporters = [OldUser.objects.create(phone_number=f"+91900000000{i}", name=f"Reporter {i}") for i in range(3)]
+        with connection.cursor() as cursor:
+            for i, reporter in enumerate(reporters[:2]):
+                cursor.execute(
+                    "INSERT INTO core_spamreport (reporter_id, target_phone, reported_at)"
+                    " VALUES (%s, '+919111111111', now() - make_interval(hours => %s))",
+                    [reporter.pk, i + 1],
+                )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(scoring)
+    finally:
+        executor = MigrationExecutor(connection)
+        executor.migrate(latest)
+
+    [(phone, score, report_count, _)] = top_spammers(10)
+    assert phone == "+919111111111" and report_count == 2
+    assert window_report_counts([phone], 24) == {phone: 2}
+
+    # The next report adds to the migrated history rather than replacing it.
+    SpamReport.objects.create(reporter=User.objects.get(pk=reporters[2].pk), target_phone=phone)
+    [(_, new_score, report_count, _)] = top_spammers(10)
+    assert report_count == 3 and new_score == pytest.approx(score + 1, rel=1e-6)
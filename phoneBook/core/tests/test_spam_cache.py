@@ -0,0 +1,78 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import SpamReport
+from core.spam_cache import BloomFilter, SpamCountCache, get_spam_cache
+from core.tests.helpers import make_user
+
+
+def test_bloom_filter_has_no_false_negatives_and_a_bounded_false_positive_rate():
+    bloom = BloomFilter(1000, 0.01)
+    members = [f"+91900000{i:04d}" for i in range(1000)]
+    for phone in members:
+        bloom.add(phone)
+    assert all(phone in bloom for phone in members)
+    false_positives = sum(f"+91800000{i:04d}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.django_db
+def test_spam_cache_skips_queries_for_unreported_and_cached_numbers():
+    reporter = make_user("+919000000000", "Reporter")
+    SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+    cache = SpamCountCache(ttl=60, max_entries=10, rebuild_interval=300, false_positive_rate=0.01)
+    cache.rebuild()
+
+    with CaptureQueriesContext(connection) as first:
+        assert cache.counts(["+919111111111", "+919222222222"]) == {"+919111111111": 1, "+919222222222": 0}
+    with CaptureQueriesContext(connection) as second:
+        assert cache.count("+919111111111") == 1
+        assert cache.count("+919333333333") == 0
+    assert len(first.captured_queries) == 1
+    assert len(second.captured_queries) == 0
+    assert cache.stats()["hit_ratio"] == 0.75
+
+
+@pytest.mark.django_db(transaction=True)
+def test_new_reports_invalidate_cached_counts():
+    cache = get_spam_cache()
+    first = make_user("+919000000001", "First")
+    second = make_user("+919000000002", "Second")
+    assert cache.count("+919111111111") == 0
+
+    SpamReport.objects.create(reporter=first, target_phone="+919111111111")
+    assert cache.count("+919111111111") == 1
+    SpamReport.objects.create(reporter=second, target_phone="+919111111111")
+    assert cache.count("+919111111111") == 2
+
+
+class DeferredThread:
+    """Records the background build instead of starting it, so the test decides when it finishes."""
+    started = []
+
+    def __init__(self, target, daemon):
+        self.target = target
+
+    def start(self):
+        self.started.append(self.target)
+
+
+@pytest.mark.django_db
+def test_first_lookups_query_the_database_while_the_filter_builds_in_the_background(monkeypatch):
+    monkeypatch.setattr("core.background.threading.Thread", DeferredThread)
+    monkeypatch.setattr(DeferredThread, "started", [])
+    reporter = make_user("+919000000000", "Reporter")
+    SpamReport.objects.create(reporter=reporter, target_phone="+919111111111")
+    cache = SpamCountCache(ttl=60, max_entries=10, rebuild_interval=300, false_positive_rate=0.01)
+
+    with CaptureQueriesContext(connection) as first:
+        assert cache.counts(["+919111111111", "+919222222222"]) == {"+919111111111": 1, "+919222222222": 0}
+    assert len(first.captured_queries) == 1  # the looked-up numbers only, not a scan of SpamStats
+    assert len(DeferredThread.started) == 1
+
+    cache.rebuild()  # what the background thread runs
+    with CaptureQueriesContext(connection) as later:
+        assert cache.count("+919333333333") == 0
+    assert len(later.captured_queries) == 0
+    assert len(DeferredThread.started) == 1
@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+
+from core.models import Contact
+from core.sync import SyncError, iter_json_array, iter_ndjson
+from core.tests.helpers import auth_client, make_user
+
+SYNC_URL = "/api/contacts/sync/"
+
+
+def test_iter_json_array_handles_elements_split_across_chunks():
+    items = [{"name": f"Contact {i}", "phone_number": f"+91900000{i:04d}"} for i in range(50)]
+    body = json.dumps(items, indent=2).encode()
+    assert list(iter_json_array(io.BytesIO(body), chunk_size=7)) == items
+
+
+def test_iter_json_array_handles_multibyte_characters_split_across_chunks():
+    items = [{"name": "Zoë Müller", "phone_number": "+919000000001"}]
+    body = json.dumps(items, ensure_ascii=False).encode()
+    assert list(iter_json_array(io.BytesIO(body), chunk_size=1)) == items
+
+
+@pytest.mark.parametrize("body", [b'{"name": "x"}', b'[{"name": "x"}', b'[{"name": "x"} {"name": "y"}]'])
+def test_iter_json_array_rejects_malformed_bodies(body):
+    with pytest.raises(SyncError):
+        list(iter_json_array(io.BytesIO(body), chunk_size=4))
+
+
+@pytest.mark.parametrize("parse", [iter_json_array, iter_ndjson])
+def test_parsers_reject_oversized_entries(parse):
+    huge = {"name": "x" * 500, "phone_number": "+919000000001"}
+    body = (json.dumps([huge]) if parse is iter_json_array else json.dumps(huge)).encode()
+    with pytest.raises(SyncError, match="longer than 100 bytes"):
+        list(parse(io.BytesIO(body), chunk_size=16, max_item_bytes=100))
+    with pytest.raises(SyncError, match="longer than 100 bytes"):
+        list(parse(io.BytesIO(body), chunk_size=4096, max_item_bytes=100))
+    assert list(parse(io.BytesIO(body), chunk_size=16, max_item_bytes=1000)) == [huge]
+
+
+def test_iter_json_array_does_not_buffer_whitespace():
+    body = b"[" + b" " * 100000 + b'{"name": "a"}' + b" " * 100000 + b"]"
+    assert list(iter_json_array(io.BytesIO(body), chunk_size=64, max_item_bytes=100)) == [{"name": "a"}]
+
+
+def test_iter_ndjson_skips_blank_lines():
+    body = b'{"name": "a"}\n\n{"name": "b"}'
+    assert list(iter_ndjson(io.BytesIO(body), chunk_size=3)) == [{"name": "a"}, {"name": "b"}]
+
+
+@pytest.mark.django_db
+def test_contact_sync_applies_inserts_updates_and_deletes():
+    user = make_user("+919000000000", "Owner")
+    client = auth_client(user)
+    Contact.objects.create(user=user, contact_phone="+919000000001", contact_name="Old Name")
+    Contact.objects.create(user=user, contact_phone="+919000000002", contact_name="Unchanged")
+    Contact.objects.create(user=user, contact_phone="+919000000003", contact_name="Removed")
+
+    body = "\n".join(json.dumps(entry) for entry in [
+        {"name": "New Name", "phone_number": "9000000001"},
+        {"name": "Unchanged", "phone_number": "+919000000002"},
+        {"name": "Added", "phone_number": "919000000004"},
+        {"name": "Broken", "phone_number": "12345"},
+    ])
+    response = client.generic("POST", SYNC_URL, body, content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    assert response.data["inserted"] == 1
+    assert response.data["updated"] == 1
+    assert response.data["unchanged"] == 1
+    assert response.data["deleted"] == 1
+    assert response.data["invalid_rows"] == [3]
+    assert {b["operation"] for b in response.data["batches"]} == {"upsert", "delete"}
+    assert dict(Contact.objects.filter(user=user).values_list("contact_phone", "contact_name")) == {
+        "+919000000001": "New Name",
+        "+919000000002": "Unchanged",
+        "+919000000004": "Added",
+    }
+
+
+@pytest.mark.django_db
+def test_contact_sync_rejects_an_oversized_entry(settings):
+    settings.CONTACT_SYNC = {**settings.CONTACT_SYNC, 'MAX_ITEM_BYTES': 100}
+    client = auth_client(make_user("+919000000000", "Owner"))
+    body = json.dumps([{"name": "x" * 500, "phone_number": "+919000000001"}])
+    response = client.generic("POST", SYNC_URL, body, content_type="application/json")
+    assert response.status_code == 400
+    assert "longer than 100 bytes" in response.data["error"]
+    assert not Contact.objects.exists()
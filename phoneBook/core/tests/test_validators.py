@@ -0,0 +1,24 @@
+from core.benchmarks.phones import per_item, sample_numbers
+from core.validators import PhoneNormalizer, Validator
+
+
+def test_normalize_phones_matches_the_per_item_validator():
+    numbers = sample_numbers(2000) + ["+919999999999\n", "91abcdefghij", "", "+", "0091 9876543210"]
+    normalized, errors = Validator.normalize_phones(numbers)
+    assert normalized == per_item(numbers)
+    assert errors == [i for i, phone in enumerate(normalized) if phone is None]
+
+
+def test_normalize_phones_reports_non_strings_as_errors():
+    normalized, errors = Validator.normalize_phones(["9876543210", None, 98765, "+91 98765 43210"])
+    assert normalized == ["+919876543210", None, None, "+919876543210"]
+    assert errors == [1, 2]
+
+
+def test_multi_country_normalizer_uses_the_prefix_table():
+    normalizer = PhoneNormalizer(countries=None)
+    normalized, errors = normalizer.normalize([
+        "+1 415 555 0123", "+4915112345678", "+491511234567", "+971501234567", "+9715012345678", "9876543210",
+    ])
+    assert normalized == ["+14155550123", "+4915112345678", "+491511234567", "+971501234567", None, "+919876543210"]
+    assert errors == [4]
@@ -0,0 +1,58 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Contact
+from core.sync import ContactSync
+from core.tests.helpers import make_user
+from core.visibility import EmailVisibilityCache, get_visibility_cache
+
+
+@pytest.mark.django_db
+def test_visibility_cache_resolves_a_page_in_one_query_and_then_from_memory():
+    searcher = make_user("+919000000000", "Searcher")
+    owners = [make_user(f"+91900000001{i}", f"Owner {i}") for i in range(4)]
+    for owner in owners[:2]:
+        Contact.objects.create(user=owner, contact_phone=searcher.phone_number, contact_name="Searcher")
+    ids = [owner.pk for owner in owners]
+    cache = EmailVisibilityCache(ttl=60, max_searchers=10)
+
+    with CaptureQueriesContext(connection) as cold:
+        assert cache.visible_owners(searcher.phone_number, ids) == {owners[0].pk, owners[1].pk}
+    with CaptureQueriesContext(connection) as warm:
+        assert cache.visible_owners(searcher.phone_number, ids[1:3]) == {owners[1].pk}
+    assert len(cold.captured_queries) == 1
+    assert len(warm.captured_queries) == 0
+    assert cache.stats()["hit_ratio"] == 2 / 6
+
+
+@pytest.mark.django_db
+def test_visibility_cache_expires_and_evicts_searchers():
+    owner = make_user("+919000000001", "Owner")
+    Contact.objects.create(user=owner, contact_phone="+919111111111", contact_name="Friend")
+    cache = EmailVisibilityCache(ttl=0, max_searchers=1)
+
+    assert cache.visible_owners("+919111111111", [owner.pk]) == {owner.pk}
+    cache.visible_owners("+919222222222", [owner.pk])
+    assert cache.stats()["searchers"] == 1
+    with CaptureQueriesContext(connection) as queries:
+        cache.visible_owners("+919222222222", [owner.pk])
+    assert len(queries.captured_queries) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_contact_writes_invalidate_the_saved_numbers_answers():
+    cache = get_visibility_cache()
+    searcher = make_user("+919000000000", "Searcher")
+    owner = make_user("+919000000001", "Owner")
+    assert cache.visible_owners(searcher.phone_number, [owner.pk]) == set()
+
+    contact = Contact.objects.create(user=owner, contact_phone=searcher.phone_number, contact_name="Searcher")
+    assert cache.visible_owners(searcher.phone_number, [owner.pk]) == {owner.pk}
+    contact.delete()
+    assert cache.visible_owners(searcher.phone_number, [owner.pk]) == set()
+
+    ContactSync(owner, batch_size=10, max_contacts=10, prune=False).run(
+        [{"phone_number": searcher.phone_number, "name": "Searcher"}]
+    )
+    assert cache.visible_owners(searcher.phone_number, [owner.pk]) == {owner.pk}
@@ -1,12 +1,29 @@
-from core.views import RegisterView, LoginView, ProfileView, SpamMarkView
-from core.views import SearchByNameView, SearchByPhoneView
+from core.views import RegisterView, LoginView, LogoutView, ProfileView, SpamMarkView, SpamStatsStatusView
+from core.views import SpamTopView
+from core.views import SearchByNameView, SearchByPhoneView, BatchSearchByPhoneView, ContactSyncView
+from core.views import ContactExportView
+from core.views import AutocompleteView, TokenRefreshView
+from core.async_views import AsyncProfileView, AsyncSearchByNameView, AsyncSearchByPhoneView
+from django.conf import settings
 from django.urls import path
 
+# Under ASGI the read-heavy lookups run as native async views.
+if settings.ASYNC_VIEWS:
+    ProfileView, SearchByNameView, SearchByPhoneView = AsyncProfileView, AsyncSearchByNameView, AsyncSearchByPhoneView
+
 urlpatterns = [
     path('register/', RegisterView.as_view(), name="register"),
     path('login/', LoginView.as_view()),
+    path('logout/', LogoutView.as_view()),
+    path('token/refresh/', TokenRefreshView.as_view()),
     path('profile/', ProfileView.as_view()),
     path('spam/mark/', SpamMarkView.as_view()),
+    path('spam/stats/status/', SpamStatsStatusView.as_view()),
+    path('spam/top/', SpamTopView.as_view()),
+    path('contacts/sync/', ContactSyncView.as_view()),
+    path('contacts/export/', ContactExportView.as_view()),
     path('search/name/', SearchByNameView.as_view()),
+    path('search/autocomplete/', AutocompleteView.as_view()),
     path('search/phone/', SearchByPhoneView.as_view()),
+    path('search/phone/batch/', BatchSearchByPhoneView.as_view()),
 ]
@@ -4,6 +4,68 @@ import re
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email as django_validate_email
 
+# E.164 country calling code -> allowed national significant number lengths.
+# Calling codes are prefix-free, so one alternation matches at most one entry.
+COUNTRY_PREFIXES = {
+    '1': (10,), '7': (10,), '20': (10,), '27': (9,), '33': (9,), '34': (9,), '39': (9, 10),
+    '44': (10,), '49': (10, 11), '52': (10,), '55': (10, 11), '61': (9,), '62': (9, 10, 11),
+    '63': (10,), '65': (8,), '66': (9,), '81': (10,), '82': (9, 10), '86': (11,), '91': (10,),
+    '92': (10,), '94': (9,), '880': (10,), '966': (9,), '971': (9,), '977': (10,),
+}
+
+
+class PhoneNormalizer:
+    """Normalizes and validates many phone numbers in one pass.
+
+    The accepted countries are compiled into a single E.164 pattern up front.
+    Numbers without a leading '+' are read as national numbers of
+    `default_country`, with or without its calling code. With the default
+    arguments the result for each number is exactly
+    `Validator.normalize_phone` followed by `Validator.validate_phone`.
+    """
+
+    def __init__(self, countries=('91',), default_country='91'):
+        countries = countries or tuple(COUNTRY_PREFIXES)
+        alternatives = []
+        for code in sorted(countries):
+            lengths = COUNTRY_PREFIXES[code]
+            alternatives.extend(rf'{code}\d{{{length}}}' for length in lengths)
+        self.pattern = re.compile(r'\+(?:' + '|'.join(alternatives) + ')')
+        self.default_country = default_country
+        self.national_length = COUNTRY_PREFIXES[default_country][0]
+
+    def normalize(self, values):
+        """Return (normalized, error_indices); normalized[i] is None for every index in error_indices."""
+        fullmatch = self.pattern.fullmatch
+        code = self.default_country
+        with_code = '+' + code
+        national_length = self.national_length
+        prefixed_length = len(code) + national_length
+        normalized = []
+        errors = []
+        append = normalized.append
+        for index, value in enumerate(values):
+            if value.__class__ is not str:
+                append(None)
+                errors.append(index)
+                continue
+            phone = value.strip().replace(' ', '')
+            if phone[:1] != '+':
+                length = len(phone)
+                if length == national_length and phone.isdigit():
+                    phone = with_code + phone
+                elif length == prefixed_length and phone.startswith(code):
+                    phone = '+' + phone
+            if fullmatch(phone):
+                append(phone)
+            else:
+                append(None)
+                errors.append(index)
+        return normalized, errors
+
+
+_default_normalizer = PhoneNormalizer()
+
 
 class Validator:
     PHONE_REGEX = re.compile(r'^\+91\d{10}$')
@@ -22,6 +84,11 @@ class Validator:
                 return "+91" + phone
         return phone
 
+    @staticmethod
+    def normalize_phones(phones, normalizer=None):
+        """Batch normalize_phone + validate_phone: (normalized or None per item, error indices)."""
+        return (normalizer or _default_normalizer).normalize(phones)
+
     @staticmethod
     def validate_email_format(email: str) -> bool:
         try:
@@ -1,30 +1,60 @@
-import re
-
-from core.models import SpamReport, AuthToken, User, SpamStats, Contact
+from core.authentication import (
+    SIGNED,
+    auth_mode,
+    resolve_token,
+    revoke_signed_tokens,
+    signed_access_token,
+    verify_signed_token
+)
+from core.autocomplete import autocomplete_config, get_index
+from core.conditional import (
+    LATEST,
+    UNCHANGED,
+    make_etag,
+    not_modified,
+    read_versions,
+    version_validators,
+    with_validators
+)
+from core.directory_io import CSV, NDJSON, directory_io_config, iter_contact_export
+from core.metrics import may_read_metrics, registry
+from core.models import SpamReport, AuthToken, User, Contact, PhoneDirectory
+from core.replicas import choose_replica, reads_from
+from core.renderers import SearchResultRenderer, encode_batch_results, encode_results
+from core.search import FUZZY, MATCH_MODES, InvalidCursor, search_names
 from core.serializers import (
     RegistrationSerializer,
     LoginSerializer,
-    SearchResultSerializer,
     SpamReportSerializer
 )
+from core.spam import aggregation_status
+from core.spam_cache import get_spam_cache
+from core.spam_top import get_spam_leaderboard
+from core.sync import ContactSync, SyncError, iter_contact_entries
 from core.validators import Validator
-from django.contrib.postgres.search import TrigramSimilarity
+from core.visibility import get_visibility_cache
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 
-def get_authenticated_user(request):
+def get_bearer_token(request):
     auth = request.headers.get('Authorization')
     if not auth or not auth.startswith('Bearer '):
         return None
-    token_value = auth.split(' ')[1]
-    try:
-        token = AuthToken.objects.get(token=token_value, expires_at__gt=timezone.now())
-        return token.user
-    except AuthToken.DoesNotExist:
+    return auth.split(' ')[1]
+
+
+def get_authenticated_user(request):
+    token_value = get_bearer_token(request)
+    if not token_value:
         return None
+    return resolve_token(token_value)
 
 
 class RegisterView(APIView):
@@ -57,17 +87,64 @@ class LoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
 
 
+class LogoutView(APIView):
+    def post(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if auth_mode() == SIGNED:
+            # The access token, and the refresh token if the client sends it, are
+            # denied until they expire.
+            tokens = [verify_signed_token(AccessToken, get_bearer_token(request))]
+            refresh_value = request.data.get('refresh') if isinstance(request.data, dict) else None
+            refresh = verify_signed_token(RefreshToken, refresh_value)
+            if refresh is not None and refresh['user_id'] == user.pk:
+                tokens.append(refresh)
+            revoke_signed_tokens(tokens)
+            return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
+
+        # Deleting the row invalidates the cached token through core.signals.
+        AuthToken.objects.filter(token=get_bearer_token(request), user=user).delete()
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
+
+
+class TokenRefreshView(APIView):
+    def post(self, request):
+        if auth_mode() != SIGNED:
+            return Response({"error": "Signed tokens are not enabled."}, status=status.HTTP_400_BAD_REQUEST)
+
+        value = request.data.get('refresh') if isinstance(request.data, dict) else None
+        refresh = verify_signed_token(RefreshToken, value)
+        # The user is loaded here, not per request, so a new access token carries current profile claims.
+        user = User.objects.filter(pk=refresh['user_id']).first() if refresh is not None else None
+        if user is None:
+            return Response({"error": "Invalid or expired refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response({"token": str(signed_access_token(user))}, status=status.HTTP_200_OK)
+
+
+def profile_etag(user):
+    # The profile is served from the authenticated user without a query, so its
+    # ETag is derived from the same fields rather than from a version lookup.
+    return make_etag('profile', user.pk, user.name, user.phone_number, user.email)
+
+
 class ProfileView(APIView):
     def get(self, request):
         user = get_authenticated_user(request)
         if not user:
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        return Response({
-            "name": user.name,
-            "phone_number": user.phone_number,
-            "email": user.email
-        })
+        etag = profile_etag(user)
+        response = not_modified(request, etag)
+        if response is None:
+            response = Response({
+                "name": user.name,
+                "phone_number": user.phone_number,
+                "email": user.email
+            })
+        return with_validators(response, etag)
 
 
 class SpamMarkView(APIView):
@@ -98,7 +175,123 @@ class SpamMarkView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class SpamStatsStatusView(APIView):
+    def get(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(aggregation_status())
+
+
+class SpamTopView(APIView):
+    def get(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        leaderboard = get_spam_leaderboard()
+        try:
+            limit = min(int(request.query_params.get('limit', leaderboard.size)), leaderboard.size)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return Response({"error": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Served from the precomputed leaderboard; no query unless it is cold.
+        results = leaderboard.top(limit)
+        return Response({
+            "computed_at": leaderboard.computed_at,
+            "window_hours": leaderboard.window_hours,
+            "results": results,
+        })
+
+
+class ContactSyncView(APIView):
+    SYNC_MODES = ('replace', 'merge')
+
+    def post(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        mode = request.query_params.get('mode', 'replace')
+        if mode not in self.SYNC_MODES:
+            return Response({"error": "Invalid mode. Use 'replace' or 'merge'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # The body is parsed incrementally from the request stream; request.data is never touched.
+        entries = iter_contact_entries(request.stream, request.content_type,
+                                       max_item_bytes=settings.CONTACT_SYNC['MAX_ITEM_BYTES'])
+        sync = ContactSync(
+            user,
+            batch_size=settings.CONTACT_SYNC['BATCH_SIZE'],
+            max_contacts=settings.CONTACT_SYNC['MAX_CONTACTS'],
+            prune=mode == 'replace',
+        )
+        try:
+            report = sync.run(entries)
+        except SyncError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class ContactExportView(APIView):
+    CONTENT_TYPES = {NDJSON: 'application/x-ndjson', CSV: 'text/csv'}
+
+    def get(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Not `format`: DRF reserves it for picking a renderer.
+        output = request.query_params.get('output', NDJSON)
+        if output not in self.CONTENT_TYPES:
+            return Response({"error": "Invalid output. Use 'ndjson' or 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Streamed from a server-side cursor; the body is never held in memory.
+        response = StreamingHttpResponse(
+            iter_contact_export(user, output, directory_io_config()['CHUNK_SIZE']),
+            content_type=self.CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="contacts.{output}"'
+        return response
+
+
+def name_search_result(row):
+    """Result tuple (see core.renderers.RESULT_FIELDS) for a search_names row."""
+    email_visible = row['is_contact']
+    return (row['name'], row['phone_number'], row['is_registered_user'], row['spam_report_count'],
+            email_visible, row['email'] if email_visible else None)
+
+
+def name_search_page_size(params):
+    """Requested page size capped at NAME_SEARCH['MAX_PAGE_SIZE']; None if malformed."""
+    config = settings.NAME_SEARCH
+    try:
+        page_size = int(params.get('page_size', config['PAGE_SIZE']))
+    except ValueError:
+        return None
+    return min(page_size, config['MAX_PAGE_SIZE']) if page_size > 0 else None
+
+
+def name_search_validators(user, params, versions):
+    """Any change can alter a name search, so it is keyed on the latest version overall."""
+    return version_validators(versions, [LATEST, user.phone_number], 'search/name', user.pk,
+                              params.get('q', '').strip(), params.get('mode', FUZZY),
+                              params.get('page_size', ''), params.get('cursor', ''))
+
+
+def next_page_link(request, cursor):
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+
+
 class SearchByNameView(APIView):
+    renderer_classes = [SearchResultRenderer]
+
     def get(self, request):
         user = get_authenticated_user(request)
         if not user:
@@ -108,37 +301,109 @@ class SearchByNameView(APIView):
         if not query:
             return Response({"error": "Missing search query"}, status=status.HTTP_400_BAD_REQUEST)
 
-        starts_with = User.objects.filter(name__istartswith=query)
-        contains_fuzzy = (
-            User.objects
-            .annotate(similarity=TrigramSimilarity('name', query))
-            .filter(similarity__gt=0.3)
-            .exclude(id__in=starts_with.values_list('id', flat=True))
-            .order_by('-similarity')
-        )
+        page_size = name_search_page_size(request.query_params)
+        if page_size is None:
+            return Response({"error": "page_size must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-        all_results = list(starts_with) + list(contains_fuzzy)
-        data = []
-
-        for result in all_results:
-            spam_stats = SpamStats.objects.filter(target_phone=result.phone_number).first()
-            report_count = spam_stats.report_count if spam_stats else 0
-            is_contact = Contact.objects.filter(user=result, contact_phone=user.phone_number).exists()
-            email_visible = is_contact
-
-            data.append({
-                "name": result.name,
-                "phone_number": result.phone_number,
-                "is_registered_user": True,
-                "spam_report_count": report_count,
-                "email": result.email if email_visible else None,
-                "show_email": email_visible
-            })
+        mode = request.query_params.get('mode', FUZZY)
+        if mode not in MATCH_MODES:
+            return Response({"error": f"mode must be one of: {', '.join(MATCH_MODES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with reads_from(choose_replica(user)):
+            versions = read_versions([user.phone_number], latest=True)
+            etag, last_modified = name_search_validators(user, request.query_params, versions)
+            response = not_modified(request, etag)
+            if response is not None:
+                return with_validators(response, etag, last_modified)
+
+            try:
+                rows, cursor = search_names(user, query, page_size, request.query_params.get('cursor'), mode,
+                                            versions.get(user.phone_number, UNCHANGED)[0])
+            except InvalidCursor as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = Response(encode_results([name_search_result(row) for row in rows]))
+        if cursor:
+            response['Link'] = next_page_link(request, cursor)
+        return with_validators(response, etag, last_modified)
+
+
+class AutocompleteView(APIView):
+    def get(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix:
+            return Response({"error": "Missing search query"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(SearchResultSerializer(data, many=True).data)
+        max_results = autocomplete_config()['MAX_RESULTS']
+        try:
+            limit = min(int(request.query_params.get('limit', max_results)), max_results)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return Response({"error": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Answered from the in-process index and spam cache; on a warm token, numbers
+        # that were never reported need no database query.
+        results = get_index().complete(prefix, limit)
+        spam_counts = get_spam_cache().counts([r["phone_number"] for r in results])
+        for result in results:
+            result["spam_report_count"] = spam_counts[result["phone_number"]]
+        return Response(results)
+
+
+DIRECTORY_FIELDS = ('phone_number', 'user_id', 'user__name', 'user__email', 'spam_report_count', 'contact_names')
+
+
+def directory_entries(searcher, phones, visibility=True):
+    """PhoneDirectory rows for `phones` as DIRECTORY_FIELDS tuples.
+
+    With `visibility`, each tuple ends with the searcher's email visibility,
+    computed in the same query.
+    """
+    entries = PhoneDirectory.objects.filter(phone_number__any=phones)
+    if visibility:
+        in_contacts = Contact.objects.filter(user=OuterRef('user_id'), contact_phone=searcher.phone_number)
+        return entries.annotate(is_contact=Exists(in_contacts)).values_list(*DIRECTORY_FIELDS, 'is_contact')
+    return entries.values_list(*DIRECTORY_FIELDS)
+
+
+def visible_owners(searcher, entries):
+    """User ids among directory `entries` fetched with visibility=False whose email the searcher may see.
+
+    The cached answers are keyed on the searcher's phone version, as in name
+    search, so contacts saved through another process apply at once.
+    """
+    searcher_version = read_versions([searcher.phone_number]).get(searcher.phone_number, UNCHANGED)[0]
+    return get_visibility_cache().visible_owners(
+        searcher.phone_number, [entry[1] for entry in entries if entry[1] is not None], searcher_version
+    )
+
+
+def directory_results(entry, email_visible):
+    """Result tuples (see core.renderers.RESULT_FIELDS) for a directory entry, or [] for an unknown number."""
+    if entry is None:
+        return []
+
+    phone, user_id, name, email, spam_report_count, contact_names = entry[:6]
+    if user_id is not None:
+        return [(name, phone, True, spam_report_count, email_visible, email if email_visible else None)]
+
+    return [(contact_name, phone, False, spam_report_count, False, None) for contact_name in contact_names]
+
+
+def phone_search_validators(user, phone, versions):
+    # The searcher's own number is included: contacts saving it decide email visibility.
+    return version_validators(versions, [phone, user.phone_number], 'search/phone', user.pk, phone)
 
 
 class SearchByPhoneView(APIView):
+    renderer_classes = [SearchResultRenderer]
+
     def get(self, request):
         user = get_authenticated_user(request)
         if not user:
@@ -153,39 +418,54 @@ class SearchByPhoneView(APIView):
             return Response({"error": "Invalid phone number format. Use +91XXXXXXXXXX."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        results = []
+        with reads_from(choose_replica(user)):
+            versions = read_versions([phone, user.phone_number])
+            etag, last_modified = phone_search_validators(user, phone, versions)
+            response = not_modified(request, etag)
+            if response is None:
+                entry = directory_entries(user, [phone]).first()
+                response = Response(encode_results(directory_results(entry, entry is not None and entry[-1])))
+        return with_validators(response, etag, last_modified)
 
-        registered_user = User.objects.filter(phone_number=phone).first()
-        if registered_user:
-            spam_stats = SpamStats.objects.filter(target_phone=phone).first()
-            report_count = spam_stats.report_count if spam_stats else 0
 
-            is_contact = Contact.objects.filter(user=registered_user, contact_phone=user.phone_number).exists()
-            email_visible = is_contact
+class BatchSearchByPhoneView(APIView):
+    renderer_classes = [SearchResultRenderer]
 
-            results.append({
-                "name": registered_user.name,
-                "phone_number": registered_user.phone_number,
-                "is_registered_user": True,
-                "spam_report_count": report_count,
-                "email": registered_user.email if email_visible else None,
-                "show_email": email_visible
-            })
+    def post(self, request):
+        user = get_authenticated_user(request)
+        if not user:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        numbers = request.data.get('numbers') if isinstance(request.data, dict) else None
+        if not isinstance(numbers, list) or not numbers:
+            return Response({"error": "Provide a non-empty 'numbers' list."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        max_numbers = settings.BATCH_LOOKUP['MAX_NUMBERS']
+        if len(numbers) > max_numbers:
+            return Response({"error": f"Too many numbers; the limit is {max_numbers} per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-            return Response(SearchResultSerializer(results, many=True).data)
+        normalized, _ = Validator.normalize_phones(numbers)
 
-        contacts = Contact.objects.filter(contact_phone=phone)
-        for c in contacts:
-            spam_stats = SpamStats.objects.filter(target_phone=phone).first()
-            report_count = spam_stats.report_count if spam_stats else 0
+        valid_phones = {phone for phone in normalized if phone}
+        entries = {}
+        if valid_phones:
+            entries = {entry[0]: entry for entry in directory_entries(user, valid_phones, visibility=False)}
+        visible = visible_owners(user, entries.values())
 
-            results.append({
-                "name": c.contact_name,
-                "phone_number": c.contact_phone,
-                "is_registered_user": False,
-                "spam_report_count": report_count,
-                "email": None,
-                "show_email": False
-            })
+        items = []
+        for number, phone in zip(numbers, normalized):
+            entry = entries.get(phone)
+            email_visible = entry is not None and entry[1] in visible
+            items.append((number, phone, directory_results(entry, email_visible)))
 
-        return Response(SearchResultSerializer(results, many=True).data)
+        return Response(encode_batch_results(items))
+
+
+class MetricsView(APIView):
+    def get(self, request):
+        # Per-view latency and route names are not for everyone; pretend the endpoint is absent.
+        if not may_read_metrics(request):
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,116 @@
+# core/visibility.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from core.metrics import registry
+from core.replicas import read_connection
+from django.conf import settings
+
+DEFAULT_EMAIL_VISIBILITY = {
+    'TTL': 30,
+    'MAX_SEARCHERS': 10000,
+}
+
+# Index-only scan on idx_contact_phone_user (contact_phone, user_id).
+VISIBLE_OWNERS_SQL = """
+    SELECT user_id FROM core_contact
+    WHERE contact_phone = %s AND user_id = ANY(%s)
+"""
+
+
+def resolve_visible_owners(searcher_phone, user_ids):
+    """Subset of `user_ids` whose owners have `searcher_phone` in their contacts, in one query."""
+    if not user_ids:
+        return set()
+    with read_connection().cursor() as cursor:
+        cursor.execute(VISIBLE_OWNERS_SQL, [searcher_phone, list(user_ids)])
+        return {row[0] for row in cursor.fetchall()}
+
+
+class EmailVisibilityCache:
+    """Per-searcher answers of resolve_visible_owners, kept for TTL seconds.
+
+    A registered user's email is shown to a searcher only if that user has the
+    searcher's number saved. Entries are keyed by the searcher's phone and
+    dropped when a contact with that phone is saved, deleted or synced in this
+    process; other processes converge within TTL, or at once when the caller
+    passes the searcher's PhoneVersion.
+    """
+
+    def __init__(self, ttl, max_searchers):
+        self.ttl = ttl
+        self.max_searchers = max_searchers
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # searcher phone -> (expires_at, version, {user_id: visible})
+        self._lock = threading.Lock()
+
+    def visible_owners(self, searcher_phone, user_ids, version=None):
+        user_ids = set(user_ids)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(searcher_phone)
+            if entry is None or entry[0] <= now or (version is not None and entry[1] != version):
+                entry = (now + self.ttl, version, {})
+                self._entries[searcher_phone] = entry
+            self._entries.move_to_end(searcher_phone)
+            known = entry[2]
+            unknown = user_ids - known.keys()
+            self.hits += len(user_ids) - len(unknown)
+            self.misses += len(unknown)
+
+        if unknown:
+            visible = resolve_visible_owners(searcher_phone, unknown)
+            with self._lock:
+                known.update((user_id, user_id in visible) for user_id in unknown)
+                while len(self._entries) > self.max_searchers:
+                    self._entries.popitem(last=False)
+        return {user_id for user_id in user_ids if known[user_id]}
+
+    def invalidate(self, searcher_phone):
+        with self._lock:
+            self._entries.pop(searcher_phone, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "searchers": len(self._entries),
+        }
+
+
+_visibility_cache = None
+
+
+def get_visibility_cache():
+    global _visibility_cache
+    if _visibility_cache is None:
+        config = {**DEFAULT_EMAIL_VISIBILITY, **getattr(settings, 'EMAIL_VISIBILITY', {})}
+        _visibility_cache = EmailVisibilityCache(config['TTL'], config['MAX_SEARCHERS'])
+    return _visibility_cache
+
+
+def reset_visibility_cache():
+    global _visibility_cache
+    _visibility_cache = None
+
+
+def collect_metrics():
+    if _visibility_cache is None:
+        return
+    stats = _visibility_cache.stats()
+    yield ('phonebook_email_visibility_hits_total', 'counter', "Email visibility answers served from the cache.",
+           [({}, stats['hits'])])
+    yield ('phonebook_email_visibility_misses_total', 'counter', "Email visibility answers read from the database.",
+           [({}, stats['misses'])])
+
+
+registry.register_collector(collect_metrics)
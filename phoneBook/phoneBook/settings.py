@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.AdmissionControlMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -133,4 +137,190 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
-CORS_ALLOW_ALL_ORIGINS = True  # or use CORS_ALLOWED_ORIGINS
\ No newline at end of file
+
+CORS_ALLOW_ALL_ORIGINS = True  # or use CORS_ALLOWED_ORIGINS
+
+# Token -> user resolution cache used by core.authentication.resolve_token.
+# BACKEND is 'local' (per-process LRU), 'shared' (the CACHE_ALIAS Django cache) or None.
+AUTH_TOKEN_CACHE = {
+    'BACKEND': 'local',
+    'MAX_ENTRIES': 10000,
+    # Seconds, never beyond the token's expires_at. With 'local', other workers
+    # keep accepting a logged-out token for up to TTL seconds; 'shared' (over a
+    # cache all workers use) revokes everywhere at once.
+    'TTL': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+# Login tokens (core.authentication.issue_token). A login reuses the user's
+# newest token while it has REUSE_MIN_REMAINING seconds left, so repeated
+# logins do not grow core_authtoken; `manage.py purge_tokens` (cron) deletes
+# expired rows in PURGE_BATCH_SIZE batches.
+AUTH_TOKENS = {
+    'LIFETIME': 7 * 24 * 3600,  # seconds
+    'REUSE': True,
+    'REUSE_MIN_REMAINING': 24 * 3600,
+    'PURGE_BATCH_SIZE': 5000,
+}
+
+# Request authentication (core.authentication). MODE 'token' looks up the
+# opaque AuthToken per request (behind AUTH_TOKEN_CACHE); 'jwt' issues signed
+# access/refresh tokens at login and verifies them in-process. Revoked signed
+# tokens are reloaded from core_revokedtoken every DENY_LIST_REFRESH seconds.
+AUTH = {
+    'MODE': os.environ.get('PHONEBOOK_AUTH_MODE', 'token'),
+    'DENY_LIST_REFRESH': 30,
+}
+
+# Signed token lifetimes; access tokens also bound how long a deleted user's
+# token or changed profile claims can still be served.
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'SIGNING_KEY': SECRET_KEY,
+    'ALGORITHM': 'HS256',
+    'UPDATE_LAST_LOGIN': False,
+}
+
+# Address-book upload limits for core.views.ContactSyncView.
+CONTACT_SYNC = {
+    'BATCH_SIZE': 1000,
+    'MAX_CONTACTS': 50000,
+    'MAX_ITEM_BYTES': 4096,  # longest single contact entry; longer ones fail the sync with 400
+}
+
+# Rows fetched per server-side cursor round trip (and per streamed chunk) by
+# contacts/export/ and `manage.py export_directory` (core.directory_io).
+DIRECTORY_IO = {
+    'CHUNK_SIZE': 5000,
+}
+
+# Per-request limits for core.views.BatchSearchByPhoneView.
+BATCH_LOOKUP = {
+    'MAX_NUMBERS': 2000,
+}
+
+# Keyset pagination for core.views.SearchByNameView; the next page is linked
+# from the `Link: <...>; rel="next"` response header.
+NAME_SEARCH = {
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+}
+
+# In-process prefix index behind core.views.AutocompleteView. Each worker
+# builds it at startup (phoneBook/wsgi.py, phoneBook/asgi.py; first use if
+# LOAD_ON_STARTUP is off) and applies its own writes through signals. Every
+# REFRESH_INTERVAL seconds it re-reads the numbers other workers changed (by
+# phone version), rebuilding only if more than MAX_CHANGES did. A completion
+# examines at most limit * SCAN_FACTOR keys.
+AUTOCOMPLETE = {
+    'MAX_RESULTS': 10,
+    'INDEX_CONTACTS': True,
+    'REFRESH_INTERVAL': 5,
+    'MAX_CHANGES': 5000,
+    'SCAN_FACTOR': 20,
+    'LOAD_ON_STARTUP': True,
+}
+
+# Per-process spam count cache (core.spam_cache): an LRU of known counts plus a
+# Bloom filter of reported numbers rebuilt every REBUILD_INTERVAL seconds.
+SPAM_CACHE = {
+    'MAX_ENTRIES': 50000,
+    'TTL': 60,  # seconds a cached count may lag reports made by other workers
+    'REBUILD_INTERVAL': 300,
+    'FALSE_POSITIVE_RATE': 0.01,
+}
+
+# Write-behind spam aggregation (core.spam). Switch modes with
+# `manage.py spam_aggregation_mode deferred|immediate`; in deferred mode run
+# `manage.py aggregate_spam` to fold queued reports every INTERVAL seconds.
+SPAM_AGGREGATION = {
+    'INTERVAL': 5,
+    'BATCH_SIZE': 10000,
+}
+
+# Time-windowed spam counts and the spam/top/ leaderboard (core.spam,
+# core.spam_top). Reports are bucketed per UTC hour as they are aggregated;
+# `manage.py prune_spam_counts` drops buckets older than RETENTION_HOURS.
+# The leaderboard holds the TOP_SIZE highest decayed scores (24-hour
+# half-life) with their WINDOW_HOURS counts, recomputed every TOP_REFRESH seconds.
+SPAM_SCORING = {
+    'WINDOW_HOURS': 24,
+    'RETENTION_HOURS': 168,
+    'TOP_SIZE': 100,
+    'TOP_REFRESH': 30,
+}
+
+# Serve profile/, search/name/ and search/phone/ with the async views in
+# core.async_views. Enable when running under ASGI (e.g. `uvicorn phoneBook.asgi:application`).
+ASYNC_VIEWS = os.environ.get('PHONEBOOK_ASYNC_VIEWS') == '1'
+
+# Optional server-side connection pool (Django's psycopg 3 pool; needs
+# `pip install "psycopg[binary,pool]"`). Recommended with ASGI, where
+# connections are not persisted between requests.
+if os.environ.get('PHONEBOOK_DB_POOL') == '1':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('PHONEBOOK_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('PHONEBOOK_DB_POOL_MAX', 20)),
+        },
+    }
+
+# Read replicas for name and phone search (core.replicas). Each "host:port" in
+# PHONEBOOK_REPLICAS becomes a `replica<N>` alias with default's database and
+# credentials. Tests read replicas through `default` (TEST MIRROR).
+for _n, _address in enumerate(filter(None, os.environ.get('PHONEBOOK_REPLICAS', '').split(',')), start=1):
+    _host, _, _port = _address.strip().partition(':')
+    DATABASES[f'replica{_n}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# A replica serves reads while its lag, checked every LAG_CHECK_INTERVAL
+# seconds, is at most MAX_LAG. After a spam report or contact write the user
+# reads from the primary for STICKY_SECONDS (kept in the CACHE_ALIAS cache;
+# use a shared cache with several workers).
+REPLICAS = {
+    'MAX_LAG': 3.0,  # seconds
+    'LAG_CHECK_INTERVAL': 2.0,
+    'STICKY_SECONDS': 10,
+    'CACHE_ALIAS': 'default',
+}
+
+# Per-searcher cache of "which registered users have this searcher as a contact",
+# used to decide email visibility in name search and batch lookup. Contact
+# writes in this process invalidate it; other processes converge within TTL seconds.
+EMAIL_VISIBILITY = {
+    'TTL': 30,
+    'MAX_SEARCHERS': 10000,
+}
+
+# `manage.py partition_tables` hash-partitions core_contact (by user) and
+# core_spamreport (by reported number) online; see core.partitioning.
+PARTITIONING = {
+    'PARTITIONS': 16,
+    'BATCH_SIZE': 5000,
+    'LOCK_TIMEOUT': '5s',
+}
+
+# /metrics (core.views.MetricsView) is off by default. Prometheus scrapes it
+# with `authorization: {credentials: <PHONEBOOK_METRICS_TOKEN>}`; ALLOWED_IPS
+# and PUBLIC are the other ways in (see core.metrics.DEFAULT_METRICS).
+METRICS = {
+    'TOKEN': os.environ.get('PHONEBOOK_METRICS_TOKEN') or None,
+}
+
+# Admission control (core.middleware.AdmissionControlMiddleware), per process.
+# Each endpoint class admits MAX_CONCURRENT requests; up to MAX_WAITING more
+# wait QUEUE_TIMEOUT seconds for a slot, the rest get 503. RATE/BURST is a
+# per-bearer-token bucket; an empty bucket gets 429. Views not listed fall
+# into 'default', so logins and profile reads never queue behind searches.
+# The classes and limits are core.admission.DEFAULT_ADMISSION; list only
+# overrides here, e.g. 'CLASSES': {'search': {'MAX_CONCURRENT': 4}}.
+ADMISSION = {
+    'ENABLED': True,
+}
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'phoneBook.settings')
 
 application = get_wsgi_application()
+
+from core.autocomplete import load_on_startup  # noqa: E402
+
+load_on_startup()